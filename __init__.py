@@ -1,9 +1,22 @@
 """
 Jarvis AI - An intelligent assistant powered by LLMs
 """
+import importlib
 
 __version__ = "1.0.0"
 __author__ = "trey"
 
-from .jarvis_core import JarvisCore
-from .langchain_jarvis import create_langchain_instance
\ No newline at end of file
+# Resolved on first access so importing the package stays cheap
+# (langchain_openai alone takes seconds to import).
+_EXPORTS = {
+    "JarvisCore": ".core.jarvis_core",
+    "create_langchain_instance": ".langchain_jarvis",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
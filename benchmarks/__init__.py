@@ -0,0 +1 @@
+"""Offline latency/throughput benchmarks (run with: python -m benchmarks.run)."""
@@ -0,0 +1,151 @@
+"""
+Load generation and statistics shared by the benchmark scenarios.
+
+`run_load` drives a blocking call from a fixed number of threads and
+`run_async_load` drives a coroutine from a fixed number of tasks; both
+return the same summary (latency percentiles, throughput, errors), which
+`compare` checks against a saved baseline.
+"""
+import asyncio
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    rank = min(len(samples), max(1, math.ceil(p / 100.0 * len(samples))))
+    return samples[rank - 1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def summarize(latencies: List[float], errors: int, wall: float, concurrency: int) -> Dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "concurrency": concurrency,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(count / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(1000 * sum(latencies) / count, 3) if count else 0.0,
+            "p50": round(1000 * percentile(latencies, 50), 3),
+            "p95": round(1000 * percentile(latencies, 95), 3),
+            "p99": round(1000 * percentile(latencies, 99), 3),
+            "max": round(1000 * latencies[-1], 3) if count else 0.0,
+        },
+    }
+
+
+def run_load(call: Callable[[int], bool], requests: int, concurrency: int,
+             warmup: int = 0) -> Dict:
+    """Make `requests` calls of `call(i)` from `concurrency` threads.
+
+    `call` returns False (or raises) for a failed request; failures are
+    timed like successes and counted in `errors`.
+    """
+    for i in range(warmup):
+        call(-1 - i)
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            try:
+                ok = call(i)
+            except Exception as e:
+                print(f"❌ request {i} failed: {e}", file=sys.stderr)
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+async def run_async_load(call: Callable[[int], Awaitable[bool]], requests: int,
+                         concurrency: int) -> Dict:
+    """Async counterpart of run_load: `concurrency` tasks awaiting `call(i)`"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception as e:
+                print(f"❌ request {i} failed: {e}", file=sys.stderr)
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.25, slack_ms: float = 2.0,
+            error_slack: float = 0.02) -> List[str]:
+    """Regressions of `current` against `baseline`, one message per failed check
+
+    Latency percentiles and peak RSS may grow by `tolerance` (plus
+    `slack_ms` for latencies, absorbing timer noise on fast paths),
+    throughput may drop by `tolerance`, and the error rate may rise by
+    `error_slack`.
+    """
+    failures = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("p50", "p95", "p99"):
+            now, then = result["latency_ms"][key], base["latency_ms"][key]
+            limit = then * (1 + tolerance) + slack_ms
+            if now > limit:
+                failures.append(f"{name}: {key} {now:.1f} ms > {limit:.1f} ms (baseline {then:.1f} ms)")
+        floor = base["throughput_rps"] * (1 - tolerance)
+        if result["throughput_rps"] < floor:
+            failures.append(f"{name}: throughput {result['throughput_rps']:.1f}/s < {floor:.1f}/s "
+                            f"(baseline {base['throughput_rps']:.1f}/s)")
+        if result["error_rate"] > base["error_rate"] + error_slack:
+            failures.append(f"{name}: error rate {result['error_rate']:.1%} "
+                            f"(baseline {base['error_rate']:.1%})")
+        if result.get("peak_rss_mb") and base.get("peak_rss_mb"):
+            limit = base["peak_rss_mb"] * (1 + tolerance)
+            if result["peak_rss_mb"] > limit:
+                failures.append(f"{name}: peak RSS {result['peak_rss_mb']:.1f} MiB > {limit:.1f} MiB "
+                                f"(baseline {base['peak_rss_mb']:.1f} MiB)")
+    return failures
@@ -0,0 +1,128 @@
+"""
+Offline latency/throughput benchmarks.
+
+Every scenario runs in its own interpreter, so process-wide singletons
+(router, workers, caches) start cold and peak RSS is per scenario:
+
+    python -m benchmarks.run                                  # all scenarios
+    python -m benchmarks.run chat_openai memory_recall --concurrency 16
+    python -m benchmarks.run --output bench.json --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+
+Results are printed as JSON (or written to --output); with --baseline the
+run exits 1 when any scenario regressed.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.harness import compare, peak_rss_mb
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+OPTION_DEFAULTS = {
+    "requests": 200,
+    "concurrency": 8,
+    "sessions": 16,
+    "rows": 2000,
+    "latency": 0.02,
+    "token_delay": 0.001,
+    "error_rate": 0.0,
+    "shards": 1,
+}
+
+
+def run_scenario(name: str, options: dict) -> dict:
+    """Run one scenario in a child interpreter and return its result"""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--child", name, "--options", json.dumps(options)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines() or ["no output"]
+        return {"failed": lines[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def child(name: str, options: dict):
+    from benchmarks.scenarios import SCENARIOS
+
+    result = SCENARIOS[name](options)
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def main():
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"default: all of {', '.join(SCENARIOS)}")
+    for option, default in OPTION_DEFAULTS.items():
+        parser.add_argument(f"--{option.replace('_', '-')}", type=type(default), default=default)
+    parser.add_argument("--output", metavar="PATH", help="write the JSON report here")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the report as a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if worse than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown over the baseline (fraction)")
+    parser.add_argument("--slack-ms", type=float, default=2.0,
+                        help="absolute latency increase always allowed (absorbs timer noise)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, json.loads(args.options))
+        return
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    options = {option: getattr(args, option) for option in OPTION_DEFAULTS}
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "options": options},
+        "scenarios": {},
+    }
+    for name in args.scenarios or SCENARIOS:
+        print(f"⏱️  {name} ...", file=sys.stderr, flush=True)
+        result = report["scenarios"][name] = run_scenario(name, options)
+        if "failed" in result:
+            print(f"  ❌ {result['failed']}", file=sys.stderr)
+        else:
+            latency = result["latency_ms"]
+            print(f"  p50 {latency['p50']:.1f} ms · p95 {latency['p95']:.1f} ms · "
+                  f"p99 {latency['p99']:.1f} ms · {result['throughput_rps']:.1f} req/s · "
+                  f"{result['errors']} errors · peak RSS {result['peak_rss_mb'] or 0:.0f} MiB",
+                  file=sys.stderr)
+
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text, end="")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text)
+        print(f"💾 Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline["meta"]["options"] != options:
+            print("⚠️  Baseline was recorded with different options; results may not compare",
+                  file=sys.stderr)
+        measured = {name: result for name, result in report["scenarios"].items() if "failed" not in result}
+        failures = compare(measured, baseline["scenarios"], args.tolerance, args.slack_ms)
+        crashed = [name for name, result in report["scenarios"].items()
+                   if "failed" in result and "failed" not in baseline["scenarios"].get(name, {"failed": 1})]
+        for name in crashed:
+            failures.append(f"{name}: failed ({report['scenarios'][name]['failed']})")
+        for failure in failures:
+            print(f"❌ {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        print("✅ No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark scenarios.
+
+Each scenario runs in a fresh interpreter (see benchmarks/run.py) against
+local stand-ins only: `StubServer` for OpenAI and LM Studio, and
+`utils/fake_llama_chat.py` as the resident llama worker. A throwaway
+config file and data directory keep the real ones untouched.
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict
+
+from benchmarks.harness import run_async_load, run_load
+from config_store import CONFIG_PATH_ENV
+from utils.stub_server import StubServer
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+FAKE_LLAMA = PROJECT_ROOT / "utils" / "fake_llama_chat.py"
+REPLY = "Certainly, sir. All systems are running within normal parameters today."
+
+@contextmanager
+def backends(options: Dict):
+    """Stub servers plus a config pointing every backend at them"""
+    workdir = Path(tempfile.mkdtemp(prefix="jarvis-bench-"))
+    stubs = {
+        name: StubServer(latency=options["latency"], token_delay=options["token_delay"],
+                         error_rate=options["error_rate"], reply=REPLY).start()
+        for name in ("openai", "lmstudio")
+    }
+    config = {
+        "openai_api_key": "sk-benchmark",
+        "llama_model_path": "fake.gguf",
+        "llama_worker_cmd": [sys.executable, str(FAKE_LLAMA), "--serve", "-m", "fake.gguf",
+                             "--token-delay", str(options["token_delay"])],
+        "lmstudio_url": stubs["lmstudio"].url,
+        "lmstudio_model": "stub-model",
+        "response_cache": False,
+    }
+    config_path = workdir / "config.json"
+    config_path.write_text(json.dumps(config))
+    os.environ[CONFIG_PATH_ENV] = str(config_path)
+
+    import chat
+    chat.openai.api_base = stubs["openai"].url + "/v1"
+    try:
+        yield workdir
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _chat_scenario(model: str, stream: bool = False):
+    def run(options: Dict) -> Dict:
+        with backends(options):
+            import chat
+
+            def call(i):
+                prompt = f"Status report {i}"
+                session_id = f"bench-{i % options['sessions']}"
+                if stream:
+                    reply = chat.chat_stream(prompt, model, use_cache=False, session_id=session_id)
+                    for _ in reply:
+                        pass
+                    return chat._is_cacheable(reply.text)
+                return chat._is_cacheable(chat.chat(prompt, model, use_cache=False,
+                                                    session_id=session_id))
+            return run_load(call, options["requests"], options["concurrency"], warmup=1)
+    return run
+
+
+def _memory_scenario(operation: str):
+    def run(options: Dict) -> Dict:
+        from core.jarvis_core import JarvisMemory
+
+        workdir = Path(tempfile.mkdtemp(prefix="jarvis-bench-"))
+        memory = JarvisMemory.open(workdir, shards=options["shards"])
+        sessions = options["sessions"]
+
+        async def seed():
+            for i in range(options["rows"]):
+                await memory.store_interaction(f"What is the status of reactor {i}?", REPLY,
+                                               f"bench-{i % sessions}", {"n": i})
+            memory.flush()
+
+        async def store(i):
+            await memory.store_interaction(f"Status report {i}", REPLY, f"bench-{i % sessions}")
+            return True
+
+        async def recall(i):
+            return bool(await memory.get_recent_context(f"bench-{i % sessions}", limit=5))
+
+        async def search(i):
+            return bool(await memory.search_context(f"reactor {i % options['rows']}",
+                                                    f"bench-{i % sessions}"))
+
+        async def history(i):
+            rows = 0
+            async for _ in memory.iter_history(f"bench-{i % sessions}", page_size=20):
+                rows += 1
+                if rows >= 20:
+                    break
+            return rows > 0
+
+        async def main():
+            if operation != "store":
+                await seed()
+            call = {"store": store, "recall": recall, "search": search, "history": history}[operation]
+            result = await run_async_load(call, options["requests"], options["concurrency"])
+            memory.flush()
+            return result
+
+        try:
+            return asyncio.run(main())
+        finally:
+            memory.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+    return run
+
+
+def streamlit_input(options: Dict) -> Dict:
+    """Full reruns of streamlit_jarvis.py for text input, one app session per thread"""
+    from streamlit.testing.v1 import AppTest
+
+    with backends(options) as workdir:
+        # A copy of the script keeps its data/memory directory in the scratch dir.
+        script = workdir / "streamlit_jarvis.py"
+        shutil.copy(PROJECT_ROOT / "streamlit_jarvis.py", script)
+        sessions = threading.local()
+
+        def call(i):
+            app = getattr(sessions, "app", None)
+            if app is None:
+                app = sessions.app = AppTest.from_file(str(script), default_timeout=60)
+                app.run()
+            app.text_input(key="text_input").input(f"Status report {i}").run()
+            return not app.exception
+        return run_load(call, options["requests"], options["concurrency"])
+
+
+SCENARIOS: Dict[str, Callable[[Dict], Dict]] = {
+    "chat_openai": _chat_scenario("openai"),
+    "chat_openai_stream": _chat_scenario("openai", stream=True),
+    "chat_lmstudio": _chat_scenario("lmstudio"),
+    "chat_llama": _chat_scenario("llama"),
+    "chat_auto": _chat_scenario("auto"),
+    "memory_store": _memory_scenario("store"),
+    "memory_recall": _memory_scenario("recall"),
+    "memory_search": _memory_scenario("search"),
+    "memory_history": _memory_scenario("history"),
+    "streamlit_input": streamlit_input,
+}
@@ -1,40 +1,209 @@
-import openai
 import os
-import json
-import subprocess
 import sys
+import time
+import asyncio
+import threading
 from pathlib import Path
+from llama_worker import DEFAULT_SYSTEM_PROMPT, LlamaWorkerError, build_prompt, get_worker
+from local_scheduler import get_batch_scheduler
+from context_builder import get_context_builder
+from response_cache import get_response_cache
+from utils.backend_client import get_client
+from config_store import get_config_store
+from router import BackendRouter, RouterError
+from utils import metrics
+from utils.lazy import lazy_import
+
+# Imported on first use: the openai SDK alone takes ~0.4s to import.
+openai = lazy_import("openai")
+
+DEFAULT_LMSTUDIO_URL = "http://127.0.0.1:1234"
+DEFAULT_LMSTUDIO_MODEL = "llama-2-7b-chat"
+DEFAULT_TEMPERATURE = 0.7
+# Prompt token budgets per backend (gpt-3.5-turbo has 4k context, local models 2k).
+CONTEXT_TOKEN_BUDGETS = {"openai": 3000, "lmstudio": 1200, "llama": 1200}
+# Backends the "auto" model routes between.
+ROUTED_BACKENDS = ("openai", "llama", "lmstudio")
+ERROR_REPLY_PREFIXES = (
+    "Sorry, I encountered an error",
+    "OpenAI API key not configured",
+    "Llama model path not configured",
+    "Unknown model:",
+)
+
+metrics.describe("jarvis_response_cache_total", "Response cache lookups by result")
+metrics.describe("jarvis_tokens", "Tokens per request by backend and direction", metrics.COUNT_BUCKETS)
+metrics.describe("jarvis_stream_first_token_seconds", "Time to the first streamed chunk")
 
 def get_config():
-    """Load configuration from config.json"""
-    try:
-        config_path = os.path.join(os.path.dirname(__file__), "config.json")
-        with open(config_path, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading config: {e}")
-        return {}
+    """Current configuration from config.json (cached, reloaded when the file changes)"""
+    return get_config_store().get()
+
+class ResponseStats:
+    """Timing of one streamed response.
+
+    Each streamed delta is counted as one token, which is how both OpenAI and
+    LM Studio emit chunks.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.tokens = 0
+
+    def record(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        generation_time = self.finished_at - self.first_token_at
+        if generation_time <= 0:
+            return None
+        return (self.tokens - 1) / generation_time if self.tokens > 1 else None
+
+    def as_dict(self):
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "tokens": self.tokens,
+            "total_time": (self.finished_at or time.perf_counter()) - self.started,
+        }
+
+    def summary(self):
+        ttft = self.time_to_first_token
+        tps = self.tokens_per_second
+        parts = [f"first token {ttft:.2f}s" if ttft is not None else "no tokens"]
+        if tps is not None:
+            parts.append(f"{tps:.1f} tok/s")
+        return " · ".join(parts)
+
+
+class ErrorReply(str):
+    """A reply chunk that reports a failure instead of model output"""
+
+
+class ChatStream:
+    """Iterable of response text chunks that records timing as it is consumed.
+
+    Iterate it synchronously (`for chunk in stream`) or from a coroutine
+    (`async for chunk in stream`); `text` and `stats` are filled in as
+    chunks arrive. `error` holds the error message when the backend failed,
+    even if some of the reply had already streamed.
+    """
+    def __init__(self, chunks, on_complete=None, backend="unknown"):
+        self._chunks = iter(chunks)
+        self._on_complete = on_complete
+        self.backend = backend
+        self.parts = []
+        self.error = None
+        self.stats = ResponseStats()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if isinstance(chunk, ErrorReply):
+                self.error = str(chunk)
+            if chunk:
+                self.stats.record()
+                self.parts.append(chunk)
+                yield chunk
+        self.stats.finish()
+        if metrics.enabled():
+            self._record_metrics()
+        if self._on_complete is not None:
+            self._on_complete(self)
+
+    def close(self):
+        """Stop the backend early (e.g. release the llama worker); safe to call twice"""
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+    def _record_metrics(self):
+        if self.stats.time_to_first_token is not None:
+            metrics.observe("jarvis_stream_first_token_seconds", self.stats.time_to_first_token,
+                            backend=self.backend)
+        metrics.observe("jarvis_tokens", self.stats.tokens, backend=self.backend, direction="out")
+        metrics.current_span().set(tokens_out=self.stats.tokens)
+
+    async def __aiter__(self):
+        chunks = iter(self)
+        while True:
+            chunk = await asyncio.to_thread(metrics.bind(next), chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+def _with_prompt(prompt, chat_history=None, backend="openai", session_id="default",
+                 system_prompt=DEFAULT_SYSTEM_PROMPT):
+    """Token-budgeted messages for `backend`: system prompt, summary, recent turns, prompt."""
+    if not chat_history:
+        chat_history = [
+            {"role": "system", "content": system_prompt}
+        ]
+
+    _append_prompt(prompt, chat_history)
 
-def get_openai_response(prompt, api_key, chat_history=None):
+    builder = get_context_builder()
+    with metrics.span("context.build", backend=backend) as span:
+        messages = builder.build(
+            chat_history,
+            conversation_id=f"{backend}:{session_id}",
+            budget=CONTEXT_TOKEN_BUDGETS[backend],
+            system_prompt=system_prompt,
+        )
+        if metrics.enabled():
+            tokens = builder.total_tokens(messages)
+            span.set(tokens_in=tokens)
+            metrics.observe("jarvis_tokens", tokens, backend=backend, direction="in")
+    return messages
+
+def _append_prompt(prompt, chat_history):
+    if chat_history[-1].get("role") != "user" or chat_history[-1].get("content") != prompt:
+        chat_history.append({"role": "user", "content": prompt})
+
+def _record_prompt(prompt, model, chat_history):
+    """On a cache hit, update `chat_history` as the model call would have"""
+    # The openai and lmstudio calls append the prompt to the caller's list.
+    if chat_history and model.lower() in ("openai", "lmstudio"):
+        _append_prompt(prompt, chat_history)
+
+def forget_session(session_id):
+    """Drop the rolling summaries kept for `session_id` (e.g. when its history is cleared)"""
+    builder = get_context_builder()
+    for backend in CONTEXT_TOKEN_BUDGETS:
+        builder.forget(f"{backend}:{session_id}")
+
+def get_openai_response(prompt, api_key, chat_history=None, session_id="default"):
     """Get a response from OpenAI's model."""
     try:
         openai.api_key = api_key
         
-        if not chat_history:
-            chat_history = [
-                {"role": "system", "content": "You are Jarvis, an AI assistant. Respond as if you were Tony Stark's AI."}
-            ]
-        
-        if chat_history[-1].get("role") != "user" or chat_history[-1].get("content") != prompt:
-            chat_history.append({"role": "user", "content": prompt})
-        
-        recent_history = chat_history[-10:] if len(chat_history) > 10 else chat_history
+        recent_history = _with_prompt(prompt, chat_history, "openai", session_id)
         
         response = openai.ChatCompletion.create(
             model="gpt-3.5-turbo",
             messages=recent_history,
             max_tokens=800,
-            temperature=0.7,
+            temperature=DEFAULT_TEMPERATURE,
         )
         
         message_content = response.choices[0].message["content"].strip()
@@ -44,63 +213,287 @@ def get_openai_response(prompt, api_key, chat_history=None):
         print(f"Error getting OpenAI response: {e}")
         return f"Sorry, I encountered an error: {str(e)}"
 
-def get_llama_response(prompt, model_path, system_prompt=None):
-    """Get a response from the local Llama model."""
+def stream_openai_response(prompt, api_key, chat_history=None, session_id="default"):
+    """Yield a response from OpenAI's model chunk by chunk as it is generated."""
     try:
-        if not system_prompt:
-            system_prompt = "You are Jarvis, an AI assistant. Respond as if you were Tony Stark's AI."
-        
-        full_prompt = f"{system_prompt}\n\nUser: {prompt}\n\nJarvis:"
-        
-        cmd = [
-            "llama-chat",  # Adjust path if needed
-            "-m", model_path,
-            "-n", "2048",
-            "-p", full_prompt,
-            "--temp", "0.7",
-            "--repeat_penalty", "1.1"
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
+        openai.api_key = api_key
+
+        response = openai.ChatCompletion.create(
+            model="gpt-3.5-turbo",
+            messages=_with_prompt(prompt, chat_history, "openai", session_id),
+            max_tokens=800,
+            temperature=DEFAULT_TEMPERATURE,
+            stream=True,
         )
-        
-        response_text = result.stdout.strip()
-        
-        if "Jarvis:" in response_text:
-            response_text = response_text.split("Jarvis:")[1].strip()
-        
-        return response_text
+
+        for chunk in response:
+            content = chunk.choices[0].delta.get("content")
+            if content:
+                yield content
+
+    except Exception as e:
+        print(f"Error streaming OpenAI response: {e}")
+        yield ErrorReply(f"Sorry, I encountered an error: {str(e)}")
+
+def get_lmstudio_response(prompt, base_url, model_name=DEFAULT_LMSTUDIO_MODEL, chat_history=None,
+                          session_id="default", batched=False):
+    """Get a response from the LM Studio (OpenAI-compatible) local server.
+
+    With `batched`, concurrent prompts are micro-batched into shared
+    /v1/completions requests (see local_scheduler).
+    """
+    try:
+        messages = _with_prompt(prompt, chat_history, "lmstudio", session_id)
+        if batched:
+            history = [[m["role"], m["content"]] for m in messages[1:-1]]
+            return get_batch_scheduler(base_url, model_name).generate(
+                build_prompt(prompt, messages[0]["content"], history),
+                session_id=session_id,
+                max_tokens=800,
+                temperature=DEFAULT_TEMPERATURE,
+                stop=["User:"],
+            )
+        return get_client(base_url).complete(
+            messages,
+            model=model_name,
+            max_tokens=800,
+            temperature=DEFAULT_TEMPERATURE,
+        )
+
+    except Exception as e:
+        print(f"Error getting LM Studio response: {e}")
+        return f"Sorry, I encountered an error: {str(e)}"
+
+def stream_lmstudio_response(prompt, base_url, model_name=DEFAULT_LMSTUDIO_MODEL, chat_history=None,
+                             session_id="default"):
+    """Yield a response from the LM Studio local server as server-sent events arrive."""
+    try:
+        yield from get_client(base_url).stream_chat_completion(
+            _with_prompt(prompt, chat_history, "lmstudio", session_id),
+            model=model_name,
+            max_tokens=800,
+            temperature=DEFAULT_TEMPERATURE,
+        )
+
+    except Exception as e:
+        print(f"Error streaming LM Studio response: {e}")
+        yield ErrorReply(f"Sorry, I encountered an error: {str(e)}")
+
+def _llama_history(prompt, chat_history, session_id, system_prompt):
+    """Budgeted history turns for the worker prompt (system prompt and prompt excluded)"""
+    if not chat_history:
+        return []
+    messages = _with_prompt(prompt, list(chat_history), "llama", session_id, system_prompt)
+    return [[m["role"], m["content"]] for m in messages[1:-1]]
+
+def get_llama_response(prompt, model_path, system_prompt=None, worker_command=None,
+                       chat_history=None, session_id="default"):
+    """Get a response from the local Llama model (via the resident worker)."""
+    try:
+        system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        worker = get_worker(model_path, worker_command)
+        response_text = worker.generate(
+            prompt,
+            system_prompt=system_prompt,
+            history=_llama_history(prompt, chat_history, session_id, system_prompt),
+            max_tokens=2048,
+            temperature=DEFAULT_TEMPERATURE,
+            repeat_penalty=1.1,
+        )
+        return response_text.strip()
     
-    except subprocess.CalledProcessError as e:
+    except LlamaWorkerError as e:
         print(f"Error running Llama model: {e}")
-        print(f"Stderr: {e.stderr}")
         return f"Sorry, I encountered an error with the Llama model: {str(e)}"
     except Exception as e:
         print(f"Error getting Llama response: {e}")
         return f"Sorry, I encountered an error: {str(e)}"
 
-def chat(prompt, model="openai", chat_history=None):
-    """Unified chat interface that routes to the appropriate model."""
-    config = get_config()
-    
-    if model.lower() == "openai":
+def stream_llama_response(prompt, model_path, system_prompt=None, worker_command=None,
+                          chat_history=None, session_id="default"):
+    """Yield a response from the local Llama model as the worker generates it."""
+    try:
+        system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        worker = get_worker(model_path, worker_command)
+        yield from worker.stream(
+            prompt,
+            system_prompt=system_prompt,
+            history=_llama_history(prompt, chat_history, session_id, system_prompt),
+            max_tokens=2048,
+            temperature=DEFAULT_TEMPERATURE,
+            repeat_penalty=1.1,
+        )
+    except Exception as e:
+        print(f"Error streaming Llama response: {e}")
+        yield ErrorReply(f"Sorry, I encountered an error with the Llama model: {str(e)}")
+
+def _lmstudio_settings(config):
+    base_url = config.get("lmstudio_url") or os.getenv("LM_STUDIO_URL", DEFAULT_LMSTUDIO_URL)
+    model_name = config.get("lmstudio_model") or os.getenv("MODEL_NAME", DEFAULT_LMSTUDIO_MODEL)
+    return base_url, model_name
+
+class BackendFailure(Exception):
+    """A backend answered with one of the error replies"""
+
+def _routed_backend(name):
+    def call(prompt, chat_history, session_id):
+        response = _chat_uncached(prompt, name, chat_history, get_config(), session_id)
+        if not _is_cacheable(response):
+            raise BackendFailure(response)
+        return response
+    return call
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """Process-wide router, so latency history and breaker state persist"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = BackendRouter({name: _routed_backend(name) for name in ROUTED_BACKENDS})
+        return _router
+
+def _configured_backends(config):
+    names = []
+    if config.get("openai_api_key"):
+        names.append("openai")
+    if config.get("llama_model_path"):
+        names.append("llama")
+    names.append("lmstudio")
+    return names
+
+def get_routed_response(prompt, chat_history=None, config=None, session_id="default"):
+    """Reply from whichever configured backend the router picks (model="auto")."""
+    config = config if config is not None else get_config()
+    if chat_history is not None and (
+            not chat_history or chat_history[-1].get("role") != "user"
+            or chat_history[-1].get("content") != prompt):
+        chat_history.append({"role": "user", "content": prompt})
+    try:
+        _, response = get_router().route(prompt, chat_history, session_id,
+                                         names=_configured_backends(config))
+        return response
+    except RouterError as e:
+        print(f"Error routing chat request: {e}")
+        return f"Sorry, I encountered an error: {str(e)}"
+
+def _chat_uncached(prompt, model, chat_history, config, session_id="default"):
+    if model.lower() == "auto":
+        return get_routed_response(prompt, chat_history, config, session_id)
+
+    elif model.lower() == "openai":
         api_key = config.get("openai_api_key")
         if not api_key:
             return "OpenAI API key not configured. Please check your config.json file."
-        return get_openai_response(prompt, api_key, chat_history)
+        return get_openai_response(prompt, api_key, chat_history, session_id)
         
     elif model.lower() == "llama":
         model_path = config.get("llama_model_path")
         if not model_path:
             return "Llama model path not configured. Please check your config.json file."
-        return get_llama_response(prompt, model_path)
+        return get_llama_response(prompt, model_path, worker_command=config.get("llama_worker_cmd"),
+                                  chat_history=chat_history, session_id=session_id)
+
+    elif model.lower() == "lmstudio":
+        base_url, model_name = _lmstudio_settings(config)
+        return get_lmstudio_response(prompt, base_url, model_name, chat_history, session_id,
+                                     batched=config.get("local_batching", False))
     
     else:
-        return f"Unknown model: {model}. Please use 'openai' or 'llama'."
+        return f"Unknown model: {model}. Please use 'openai', 'llama', 'lmstudio' or 'auto'."
+
+def _response_cache(config, use_cache):
+    if use_cache is False or (use_cache is None and not config.get("response_cache", True)):
+        return None
+    return get_response_cache()
+
+def _cache_key(cache, prompt, model, chat_history):
+    return cache.key(model, prompt, chat_history, DEFAULT_TEMPERATURE)
+
+def _is_cacheable(response):
+    return bool(response) and not response.startswith(ERROR_REPLY_PREFIXES)
+
+def chat(prompt, model="openai", chat_history=None, use_cache=None, session_id="default"):
+    """Unified chat interface that routes to the appropriate model.
+
+    Replies are served from the shared response cache when possible; pass
+    use_cache=False to always ask the model (or set "response_cache": false
+    in config.json). `session_id` keys the rolling summary of older turns.
+    """
+    with metrics.span("chat.turn", model=model) as turn:
+        with metrics.span("config.load"):
+            config = get_config()
+        cache = _response_cache(config, use_cache)
+        if cache is not None:
+            with metrics.span("cache.lookup"):
+                key = _cache_key(cache, prompt, model, chat_history)
+                cached = cache.get(key)
+            metrics.incr("jarvis_response_cache_total", result="miss" if cached is None else "hit")
+            if cached is not None:
+                turn.set(cached=True)
+                _record_prompt(prompt, model, chat_history)
+                return cached
+        started = time.perf_counter()
+        with metrics.span("model.call", backend=model):
+            response = _chat_uncached(prompt, model, chat_history, config, session_id)
+        if metrics.enabled():
+            tokens = get_context_builder().count_tokens(response)
+            turn.set(tokens_out=tokens)
+            metrics.observe("jarvis_tokens", tokens, backend=model, direction="out")
+        if cache is not None and _is_cacheable(response):
+            cache.put(key, response, time.perf_counter() - started)
+        return response
+
+def _stream_chunks(prompt, model, chat_history, config, session_id="default"):
+    if model.lower() == "openai":
+        api_key = config.get("openai_api_key")
+        if not api_key:
+            return iter([ErrorReply("OpenAI API key not configured. Please check your config.json file.")])
+        return stream_openai_response(prompt, api_key, chat_history, session_id)
+
+    elif model.lower() == "llama":
+        model_path = config.get("llama_model_path")
+        if not model_path:
+            return iter([ErrorReply("Llama model path not configured. Please check your config.json file.")])
+        return stream_llama_response(prompt, model_path, worker_command=config.get("llama_worker_cmd"),
+                                     chat_history=chat_history, session_id=session_id)
+
+    elif model.lower() == "lmstudio":
+        base_url, model_name = _lmstudio_settings(config)
+        return stream_lmstudio_response(prompt, base_url, model_name, chat_history, session_id)
+
+    # Backends without token streaming arrive as a single chunk.
+    response = _chat_uncached(prompt, model, chat_history, config, session_id)
+    return iter([response if _is_cacheable(response) else ErrorReply(response)])
+
+def chat_stream(prompt, model="openai", chat_history=None, use_cache=None, session_id="default"):
+    """Streaming variant of chat(): returns a ChatStream of text chunks.
+
+    Works with `for` and `async for`; after iteration `stream.text` holds
+    the full reply and `stream.stats` its time-to-first-token and tokens/sec.
+    A cache hit arrives as a single chunk.
+    """
+    config = get_config()
+    cache = _response_cache(config, use_cache)
+    if cache is None:
+        return ChatStream(_stream_chunks(prompt, model, chat_history, config, session_id),
+                          backend=model)
+
+    key = _cache_key(cache, prompt, model, chat_history)
+    cached = cache.get(key)
+    metrics.incr("jarvis_response_cache_total", result="miss" if cached is None else "hit")
+    if cached is not None:
+        _record_prompt(prompt, model, chat_history)
+        return ChatStream(iter([cached]), backend="cache")
+
+    def remember(stream):
+        # A stream that failed part-way ends in an error chunk after real text.
+        if stream.error is None and _is_cacheable(stream.text):
+            cache.put(key, stream.text, stream.stats.as_dict()["total_time"])
+
+    return ChatStream(_stream_chunks(prompt, model, chat_history, config, session_id),
+                      on_complete=remember, backend=model)
 
 if __name__ == "__main__":
     # Test OpenAI
@@ -0,0 +1,169 @@
+"""
+Process-wide cache of config.json (and .env).
+
+The file is parsed once. Later reads come from memory; a cheap stat() of
+the file (at most once per `check_interval` seconds) detects edits made by
+other processes and triggers a reload. Saves are validated, written
+atomically and announced to subscribers.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
+# Points the process at another config file (benchmarks, tests, scratch setups).
+CONFIG_PATH_ENV = "JARVIS_CONFIG"
+
+# Known keys and their expected JSON types; unknown keys are kept as-is.
+CONFIG_SCHEMA = {
+    "openai_api_key": str,
+    "llama_model_path": str,
+    "llama_worker_cmd": list,
+    "lmstudio_url": str,
+    "lmstudio_model": str,
+    "response_cache": bool,
+    "local_batching": bool,
+}
+
+
+class ConfigError(ValueError):
+    """config.json is unreadable or does not match the schema"""
+
+
+def validate_config(config) -> Dict:
+    if not isinstance(config, dict):
+        raise ConfigError("config.json must contain a JSON object")
+    for key, expected in CONFIG_SCHEMA.items():
+        if key in config and config[key] is not None and not isinstance(config[key], expected):
+            raise ConfigError(f"config key '{key}' must be of type {expected.__name__}")
+    return config
+
+
+class ConfigStore:
+    """Parsed config.json, revalidated by mtime instead of re-read per call."""
+    def __init__(self, path: Path = DEFAULT_CONFIG_PATH, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._config: Dict = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._subscribers: List[Callable[[Dict], None]] = []
+        self._lock = threading.RLock()
+        self._load()
+
+    def _stat_signature(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> bool:
+        """Re-read the file if it changed; returns True when the config changed"""
+        signature = self._stat_signature()
+        self._checked_at = time.monotonic()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        if signature is None:
+            new_config = {}
+        else:
+            try:
+                with open(self.path, "r") as f:
+                    new_config = validate_config(json.load(f))
+            except (OSError, ValueError) as e:
+                # Keep serving the last good config rather than an empty one.
+                print(f"Error loading config: {e}")
+                return False
+        if new_config == self._config:
+            return False
+        self._config = new_config
+        return True
+
+    def get(self) -> Dict:
+        """Current config; only stats the file once per check_interval"""
+        changed = False
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                changed = self._load()
+            config = dict(self._config)
+        if changed:
+            self._notify(config)
+        return config
+
+    def reload(self) -> Dict:
+        """Revalidate against the file immediately"""
+        with self._lock:
+            changed = self._load()
+            config = dict(self._config)
+        if changed:
+            self._notify(config)
+        return config
+
+    def save(self, config: Dict):
+        """Validate and atomically replace config.json"""
+        validate_config(config)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".config-", suffix=".json")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(config, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._config = dict(config)
+            self._signature = self._stat_signature()
+            self._checked_at = time.monotonic()
+            snapshot = dict(self._config)
+        self._notify(snapshot)
+
+    def subscribe(self, callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """Call `callback(config)` after every change; returns an unsubscribe function"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _notify(self, config: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(dict(config))
+            except Exception as e:
+                print(f"Error in config subscriber: {e}")
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+_env_loaded = False
+
+
+def get_config_store() -> ConfigStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore(Path(os.environ.get(CONFIG_PATH_ENV) or DEFAULT_CONFIG_PATH))
+        return _store
+
+
+def load_env():
+    """Load .env into os.environ once per process"""
+    global _env_loaded
+    with _store_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
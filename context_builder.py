@@ -0,0 +1,197 @@
+"""
+Token-budgeted prompt assembly.
+
+`ContextBuilder.build` always keeps the system prompt and the new user
+message, packs as many of the most recent turns as fit in the token
+budget, and folds everything older into a rolling summary. The summary is
+cached per conversation and only extended with the turns that newly fell
+out of the window, never regenerated from scratch, even when the history
+passed in is itself a sliding window.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+MESSAGE_OVERHEAD = 4  # role/separator tokens the chat format adds per message
+ANCHOR_MESSAGES = 3  # newest folded messages used to find the fold point again
+
+
+def _offline_token_count(text: str) -> int:
+    """Rough tokenizer: words and punctuation, long words split every 4 characters"""
+    return sum(max(1, (len(piece) + 3) // 4) for piece in re.findall(r"\w+|[^\w\s]", text))
+
+
+def default_tokenizer() -> Callable[[str], int]:
+    """tiktoken's cl100k encoding when installed, otherwise the offline estimate"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        return _offline_token_count
+
+
+def extractive_summarizer(previous: str, messages: List[Dict]) -> str:
+    """Offline summarizer: append the first sentence of each folded message"""
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        content = " ".join(message.get("content", "").split())
+        sentence = re.split(r"(?<=[.!?])\s", content, maxsplit=1)[0]
+        words = sentence.split()
+        if len(words) > 30:
+            sentence = " ".join(words[:30]) + " ..."
+        speaker = "User" if message.get("role") == "user" else "Jarvis"
+        lines.append(f"- {speaker}: {sentence}")
+    return "\n".join(lines)
+
+
+def _fingerprint(message: Dict) -> str:
+    content = f"{message.get('role')}\0{message.get('content', '')}"
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _fold_point(anchor: Tuple[str, ...], turns: List[Dict]) -> int:
+    """How many leading `turns` are already folded into the summary ending at `anchor`.
+
+    The fold point is found by content, not position, so it survives the
+    window sliding (older turns trimmed or paged back in, or only the last
+    N turns passed). When the anchor isn't in `turns` at all, every turn
+    is taken to be newer than the summary.
+    """
+    if not anchor:
+        return 0
+    prints = [_fingerprint(message) for message in turns]
+    for end in range(len(prints), 0, -1):
+        overlap = min(end, len(anchor))
+        if tuple(prints[end - overlap:end]) == anchor[-overlap:]:
+            return end
+    return 0
+
+
+class _Summary:
+    __slots__ = ("anchor", "text")
+
+    def __init__(self):
+        self.anchor: Tuple[str, ...] = ()  # fingerprints of the newest folded messages
+        self.text = ""
+
+
+class ContextBuilder:
+    """Packs chat history into a token budget behind a rolling summary.
+
+    `tokenizer` maps text to a token count; `summarizer(previous, messages)`
+    returns the summary extended with `messages` (an LLM call can be
+    plugged in here; it runs outside the builder's lock). The summary itself
+    is capped at `summary_budget` tokens by dropping its oldest lines.
+    Summaries of the `max_conversations` most recently used conversations
+    are kept.
+    """
+    def __init__(self, budget: int = 3000, summary_budget: int = 300,
+                 tokenizer: Optional[Callable[[str], int]] = None,
+                 summarizer: Callable[[str, List[Dict]], str] = extractive_summarizer,
+                 max_conversations: int = 1024):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.count_tokens = lru_cache(maxsize=8192)(tokenizer or default_tokenizer())
+        self.summarizer = summarizer
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def message_tokens(self, message: Dict) -> int:
+        return self.count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD
+
+    def _trim_summary(self, text: str) -> str:
+        lines = text.splitlines()
+        while lines and self.count_tokens("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _summary_for(self, conversation_id: str) -> _Summary:
+        summary = self._summaries.get(conversation_id)
+        if summary is None:
+            summary = self._summaries[conversation_id] = _Summary()
+            while len(self._summaries) > self.max_conversations:
+                self._summaries.popitem(last=False)
+        else:
+            self._summaries.move_to_end(conversation_id)
+        return summary
+
+    def build(self, messages: List[Dict], conversation_id: str = "default",
+              budget: Optional[int] = None, system_prompt: Optional[str] = None) -> List[Dict]:
+        """Messages to send: system prompt, summary, recent turns, new user message.
+
+        `messages` is the full history ending with the new user message; a
+        leading system message is pinned (or `system_prompt` is used).
+        """
+        budget = budget or self.budget
+        messages = list(messages)
+        system = None
+        if messages and messages[0].get("role") == "system":
+            system = messages.pop(0)
+        elif system_prompt:
+            system = {"role": "system", "content": system_prompt}
+        if not messages:
+            return [system] if system else []
+        current = messages[-1]
+        turns = messages[:-1]
+
+        with self._lock:
+            summary = self._summary_for(conversation_id)
+            anchor, text = summary.anchor, summary.text
+        folded = _fold_point(anchor, turns)
+
+        used = self.message_tokens(current)
+        if system:
+            used += self.message_tokens(system)
+        reserved = self.summary_budget + MESSAGE_OVERHEAD
+
+        # Newest turns first, never reaching back into what was already folded.
+        start = len(turns)
+        while start > folded:
+            cost = self.message_tokens(turns[start - 1])
+            if used + cost + reserved > budget:
+                break
+            used += cost
+            start -= 1
+
+        if start > folded:
+            text = self._trim_summary(self.summarizer(text, turns[folded:start]))
+            with self._lock:
+                # A concurrent build of this conversation may have folded first; keep its result.
+                if summary.anchor == anchor:
+                    summary.text = text
+                    newest = turns[max(0, start - ANCHOR_MESSAGES):start]
+                    summary.anchor = tuple(_fingerprint(message) for message in newest)
+
+        built = [system] if system else []
+        if text:
+            built.append({"role": "system", "content": SUMMARY_PREFIX + text})
+        built.extend(turns[start:])
+        built.append(current)
+        return built
+
+    def forget(self, conversation_id: str):
+        """Drop a conversation's summary (when its history is cleared or edited)"""
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+
+    def total_tokens(self, messages: List[Dict]) -> int:
+        return sum(self.message_tokens(m) for m in messages)
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_context_builder() -> ContextBuilder:
+    """Process-wide builder, so rolling summaries persist across turns"""
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = ContextBuilder()
+        return _builder
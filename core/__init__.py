@@ -1,7 +1,24 @@
 """
 Jarvis AI Core Module
 """
-from .jarvis_core import JarvisCore
-from .memory_system import JarvisMemory
+import importlib
 
-__all__ = ['JarvisCore', 'JarvisMemory']
\ No newline at end of file
+_EXPORTS = {
+    'JarvisCore': '.jarvis_core',
+    'JarvisMemory': '.memory_system',
+    'SQLiteEngine': '.storage',
+    'RetentionPolicy': '.retention',
+    'ShardedMemory': '.sharding',
+}
+
+__all__ = ['JarvisCore', 'JarvisMemory', 'SQLiteEngine', 'RetentionPolicy', 'ShardedMemory']
+
+
+def __getattr__(name):
+    # Submodules load on first access, so `from core.storage import ...`
+    # does not pull in the HTTP client and memory layers.
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
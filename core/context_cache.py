@@ -0,0 +1,124 @@
+import copy
+import itertools
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+ENTRY_OVERHEAD = 200  # rough per-entry cost of the dict and its keys, in bytes
+
+
+def _entry_size(entry: Dict) -> int:
+    return (ENTRY_OVERHEAD + len(entry["user_input"]) + len(entry["response"])
+            + len(json.dumps(entry["context"])))
+
+
+class _Session:
+    __slots__ = ("entries", "complete", "nbytes", "last_seq")
+
+    def __init__(self, window: int):
+        self.entries: deque = deque(maxlen=window)
+        self.complete = False  # True when every stored row of the session is cached
+        self.nbytes = 0
+        self.last_seq = 0
+
+
+class ContextCache:
+    """Write-through cache of each session's most recent interactions.
+
+    Every session keeps a ring buffer of its last `window` interactions,
+    newest first. Sessions are evicted least-recently-used once the
+    estimated size of all cached entries exceeds `max_bytes`.
+    """
+    def __init__(self, window: int = 20, max_bytes: int = 32 * 1024 * 1024):
+        self.window = window
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._nbytes = 0
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, limit: int) -> Optional[List[Dict]]:
+        """Cached newest-first entries, or None when the database must be asked"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or (limit > len(session.entries) and not session.complete):
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return [dict(entry, context=copy.deepcopy(entry["context"]))
+                    for entry in itertools.islice(session.entries, limit)]
+
+    def token(self) -> int:
+        """Snapshot to pass to `fill` so a racing `append` is never overwritten"""
+        return next(self._seq)
+
+    def fill(self, session_id: str, entries: List[Dict], complete: bool, token: int):
+        """Load newest-first rows fetched from the database after a miss"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if session.last_seq > token:
+                    return
+                self._nbytes -= session.nbytes
+            session = _Session(self.window)
+            session.complete = complete and len(entries) <= self.window
+            for entry in entries[:self.window]:
+                entry = dict(entry, context=copy.deepcopy(entry["context"]))  # callers keep `entries`
+                session.entries.append(entry)
+                session.nbytes += _entry_size(entry)
+            session.last_seq = token
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._nbytes += session.nbytes
+            self._evict()
+
+    def append(self, session_id: str, entry: Dict):
+        """Write-through: record an interaction as it is stored"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.window)
+            if len(session.entries) == session.entries.maxlen:
+                dropped = _entry_size(session.entries[-1])
+                session.nbytes -= dropped
+                self._nbytes -= dropped
+                session.complete = False
+            session.entries.appendleft(entry)
+            size = _entry_size(entry)
+            session.nbytes += size
+            self._nbytes += size
+            session.last_seq = next(self._seq)
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and len(self._sessions) > 1:
+            _, session = self._sessions.popitem(last=False)
+            self._nbytes -= session.nbytes
+            self.evictions += 1
+
+    def invalidate(self, session_id: Optional[str] = None):
+        """Drop one session, or everything when no session is given"""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+                self._nbytes = 0
+            elif session_id in self._sessions:
+                self._nbytes -= self._sessions.pop(session_id).nbytes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "sessions": len(self._sessions),
+                "bytes": self._nbytes,
+            }
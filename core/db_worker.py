@@ -0,0 +1,94 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+from utils import metrics
+
+_STOP = object()
+
+metrics.describe("jarvis_db_seconds", "Time spent running each database call, by worker")
+metrics.describe("jarvis_db_queue_depth", "Calls waiting in a database worker queue")
+
+
+class DBWorker:
+    """Dedicated thread(s) that run blocking database calls from a bounded queue.
+
+    Coroutines never touch SQLite directly: they enqueue a call and either
+    await its future (`run`) or move on once it is queued (`enqueue`). When
+    the queue is full, enqueueing waits off the event loop, which gives
+    writers backpressure without stalling other sessions.
+    """
+    def __init__(self, name: str = "jarvis-db", threads: int = 1, maxsize: int = 1024):
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        for i in range(max(1, threads)):
+            thread = threading.Thread(target=self._loop, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                future, fn, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                started = time.perf_counter()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                metrics.observe("jarvis_db_seconds", time.perf_counter() - started, worker=self.name)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue a call from synchronous code, blocking while the queue is full"""
+        if self._closed:
+            raise RuntimeError(f"{self.name} worker is shut down")
+        future: Future = Future()
+        self._queue.put((future, metrics.bind(fn), args, kwargs))
+        return future
+
+    async def enqueue(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue a call without blocking the event loop; returns once queued"""
+        if self._closed:
+            raise RuntimeError(f"{self.name} worker is shut down")
+        future: Future = Future()
+        item = (future, metrics.bind(fn), args, kwargs)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, item)
+        metrics.gauge("jarvis_db_queue_depth", self._queue.qsize(), worker=self.name)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Queue a call and await its result"""
+        future = await self.enqueue(fn, *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every queued call has run"""
+        self._queue.join()
+
+    def shutdown(self, wait: bool = True):
+        """Finish queued calls and stop the worker threads"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
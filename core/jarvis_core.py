@@ -1,59 +1,545 @@
 from pathlib import Path
-import sqlite3
+import asyncio
 import json
+import os
+import re
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, List, Optional
+
+from utils import metrics
+from utils.backend_client import AsyncBackendClient, BackendError, get_client
+
+from .context_cache import ContextCache
+from .db_worker import DBWorker
+from .retention import RetentionManager, RetentionPolicy, archived_rows, create_archive_tables
+from .storage import SQLiteEngine
+
+metrics.describe("jarvis_context_cache_total", "Recent-context lookups served by the cache, by result")
+
+SCHEMA_VERSION = 3
+MAX_ROWID = 2 ** 63 - 1
+DB_NAME = "jarvis_memory.db"
 
 class JarvisMemory:
-    """Memory system for Jarvis AI"""
-    def __init__(self, base_path: Path):
+    """Memory system for Jarvis AI
+
+    All database work runs on dedicated worker threads: writes go through a
+    single writer queue (fire-and-forget, bounded by `queue_size`) and reads
+    are awaited on a small reader pool, so the event loop never blocks on disk.
+    With a `retention` policy, aged turns are archived in the background
+    (see core/retention.py) and read back transparently. `JarvisMemory.open`
+    returns a session-sharded store instead when one is configured
+    (see core/sharding.py).
+    """
+    def __init__(self, base_path: Path, durability: str = "turn",
+                 batch_size: int = 64, flush_interval: float = 0.05, readers: int = 4,
+                 queue_size: int = 1024, semantic: bool = False, embedding_dim: int = 256,
+                 cache_window: int = 20, cache_bytes: int = 32 * 1024 * 1024,
+                 retention: Optional[RetentionPolicy] = None, db_name: str = DB_NAME):
         self.memory_path = base_path / "data" / "memory"
         self.memory_path.mkdir(parents=True, exist_ok=True)
-        self.db_path = self.memory_path / "jarvis_memory.db"
-        self._init_db()
-
-    def _init_db(self):
-        """Initialize SQLite database"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    user_input TEXT,
-                    response TEXT,
-                    context TEXT,
-                    session_id TEXT
-                )
-            """)
-
-    async def store_interaction(self, user_input: str, response: str, 
+        self.db_path = self.memory_path / db_name
+        self.engine = SQLiteEngine(
+            self.db_path,
+            readers=readers,
+            durability=durability,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        self.init_schema(self.engine)
+        self.vectors = None
+        if semantic:
+            from .vector_index import HashingEmbedder, VectorIndex
+            self.embedder = HashingEmbedder(embedding_dim)
+            self.vectors = VectorIndex(self.db_path, embedding_dim)
+        self.cache = ContextCache(cache_window, cache_bytes) if cache_window > 0 else None
+        self._writes = DBWorker("jarvis-db-writer", threads=1, maxsize=queue_size)
+        self._reads = DBWorker("jarvis-db-reader", threads=readers, maxsize=queue_size)
+        self._last_write: Dict[str, Future] = {}
+        self._last_write_lock = threading.Lock()
+        if self.vectors is not None:
+            self._writes.submit(self._backfill_embeddings)
+        self.retention = RetentionManager(self.engine, retention).start() if retention else None
+
+    @classmethod
+    def open(cls, base_path: Path, shards: Optional[int] = None, **options):
+        """The memory store for `base_path`: single-file, or sharded by session
+
+        The shard count comes from `shards`, else JARVIS_MEMORY_SHARDS, else
+        the layout already on disk (data/memory/shards.json).
+        """
+        from .sharding import SHARDS_ENV, ShardedMemory, finish_reshard, read_layout
+        memory_path = base_path / "data" / "memory"
+        if finish_reshard(memory_path):
+            print(f"🔀 Finished an interrupted reshard of {memory_path}")
+        layout = read_layout(memory_path)
+        if shards is None:
+            shards = int(os.environ.get(SHARDS_ENV) or 0) or (layout["shards"] if layout else 1)
+        if shards > 1:
+            return ShardedMemory(base_path, shards, **options)
+        if layout:
+            raise ValueError(f"{base_path / 'data' / 'memory'} is sharded ({layout['shards']} files); "
+                             f"reshard with `python -m core.sharding {base_path} --shards 1`")
+        return cls(base_path, **options)
+
+    @classmethod
+    def init_schema(cls, engine: SQLiteEngine):
+        """Create the tables and bring an older database up to SCHEMA_VERSION"""
+        engine.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                user_input TEXT,
+                response TEXT,
+                context TEXT,
+                session_id TEXT,
+                ts INTEGER
+            );
+        """)
+        with engine.transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                cls._migrate_v1(conn)
+            if version < 2:
+                cls._migrate_v2(conn)
+            if version < 3:
+                create_archive_tables(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @staticmethod
+    def _migrate_v1(conn):
+        """Add the epoch `ts` column and the (session_id, id) / ts indexes"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+        if "ts" not in columns:
+            conn.execute("ALTER TABLE conversations ADD COLUMN ts INTEGER")
+        # Legacy rows hold local-time ISO-8601 strings; convert to epoch millis.
+        conn.execute("""
+            UPDATE conversations
+            SET ts = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+            WHERE ts IS NULL
+        """)
+        conn.execute("""CREATE INDEX IF NOT EXISTS idx_conversations_session
+                        ON conversations (session_id, id)""")
+        conn.execute("""CREATE INDEX IF NOT EXISTS idx_conversations_ts
+                        ON conversations (ts)""")
+
+    @staticmethod
+    def _migrate_v2(conn):
+        """Add the FTS5 index over user_input/response, kept in sync by triggers"""
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+                user_input, response,
+                content='conversations', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+                INSERT INTO conversations_fts (rowid, user_input, response)
+                VALUES (new.id, new.user_input, new.response);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+                INSERT INTO conversations_fts (conversations_fts, rowid, user_input, response)
+                VALUES ('delete', old.id, old.user_input, old.response);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS conversations_fts_au
+            AFTER UPDATE OF user_input, response ON conversations BEGIN
+                INSERT INTO conversations_fts (conversations_fts, rowid, user_input, response)
+                VALUES ('delete', old.id, old.user_input, old.response);
+                INSERT INTO conversations_fts (rowid, user_input, response)
+                VALUES (new.id, new.user_input, new.response);
+            END
+        """)
+        conn.execute("INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')")
+
+    async def store_interaction(self, user_input: str, response: str,
                               session_id: str, context: Optional[Dict] = None):
-        """Store a conversation interaction"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """INSERT INTO conversations 
-                   (timestamp, user_input, response, context, session_id) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                (datetime.now().isoformat(), user_input, response, 
-                 json.dumps(context or {}), session_id)
+        """Store a conversation interaction (returns once queued)"""
+        now = datetime.now()
+        context_json = json.dumps(context or {})
+        if self.cache is not None:
+            # Cached before the write lands (read-your-writes); dropped again if it fails.
+            self.cache.append(session_id, {
+                "timestamp": now.isoformat(),
+                "user_input": user_input,
+                "response": response,
+                "context": json.loads(context_json)
+            })
+        try:
+            future = await self._writes.enqueue(
+                self._write_interaction,
+                (now.isoformat(), user_input, response,
+                 context_json, session_id, int(now.timestamp() * 1000))
             )
+        except BaseException:
+            self._forget_cached(session_id)
+            raise
+        with self._last_write_lock:
+            self._last_write[session_id] = future
+        future.add_done_callback(lambda f: self._write_done(session_id, f))
+
+    def _write_interaction(self, row: tuple):
+        session_id = row[4]
+        on_commit = None
+        if self.vectors is not None:
+            vector = self.embedder.embed(f"{row[1]}\n{row[2]}")
+            on_commit = lambda rowid: self.vectors.add(rowid, session_id, vector)
+
+        def on_error(error):
+            print(f"Error storing interaction: {error}")
+            self._forget_cached(session_id)
+
+        self.engine.write(
+            """INSERT INTO conversations
+               (timestamp, user_input, response, context, session_id, ts)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            row,
+            on_commit=on_commit,
+            on_error=on_error
+        )
+
+    def _forget_cached(self, session_id: str):
+        """Drop a session's cached turns after one of its writes failed"""
+        if self.cache is not None:
+            self.cache.invalidate(session_id)
+
+    def _backfill_embeddings(self, page_rows: int = 1000):
+        """Embed rows that have no vector yet
+
+        That covers rows stored before semantic memory was enabled, and
+        rows whose vector was lost (a crash between commit and append, or
+        a writer without semantic=True), wherever they fall in the id order.
+        """
+        import numpy as np
+        indexed = self.vectors.row_ids()
+        with self.engine.reader() as conn:
+            cursor = conn.execute("SELECT id FROM conversations ORDER BY id")
+            while True:
+                page = np.array([row[0] for row in cursor.fetchmany(page_rows)], dtype=np.int64)
+                if not len(page):
+                    break
+                missing = page[~np.isin(page, indexed, assume_unique=True)]
+                if not len(missing):
+                    continue
+                rows = conn.execute(
+                    f"""SELECT id, session_id, user_input, response FROM conversations
+                        WHERE id IN ({",".join("?" * len(missing))}) ORDER BY id""",
+                    missing.tolist()
+                ).fetchall()
+                for rowid, session_id, user_input, response in rows:
+                    self.vectors.add(rowid, session_id or "", self.embedder.embed(f"{user_input}\n{response}"))
+
+    def _write_done(self, session_id: str, future: Future):
+        with self._last_write_lock:
+            if self._last_write.get(session_id) is future:
+                del self._last_write[session_id]
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error storing interaction: {future.exception()}")
+            self._forget_cached(session_id)
+
+    async def _await_session_writes(self, session_id: str):
+        """Read-your-writes: wait for this session's queued interaction to land"""
+        pending = self._last_write.get(session_id)
+        if pending is not None and not pending.done():
+            await asyncio.wrap_future(pending)
 
     async def get_recent_context(self, session_id: str, limit: int = 5) -> List[Dict]:
         """Retrieve recent conversations for context"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                """SELECT timestamp, user_input, response, context 
-                   FROM conversations 
-                   WHERE session_id = ? 
-                   ORDER BY timestamp DESC LIMIT ?""",
+        if self.cache is None:
+            await self._await_session_writes(session_id)
+            return await self._reads.run(self._fetch_recent_context, session_id, limit)
+
+        cached = self.cache.get(session_id, limit)
+        metrics.incr("jarvis_context_cache_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+        token = self.cache.token()
+        fetch = max(limit, self.cache.window)
+        await self._await_session_writes(session_id)
+        rows = await self._reads.run(self._fetch_recent_context, session_id, fetch)
+        self.cache.fill(session_id, rows, len(rows) < fetch, token)
+        return rows[:limit]
+
+    def _fetch_recent_context(self, session_id: str, limit: int) -> List[Dict]:
+        with self.engine.reader() as conn:
+            rows = conn.execute(
+                """SELECT timestamp, user_input, response, context, id
+                   FROM conversations
+                   WHERE session_id = ?
+                   ORDER BY id DESC LIMIT ?""",
                 (session_id, limit)
-            )
-            return [
+            ).fetchall()
+            recent = [
                 {
                     "timestamp": row[0],
                     "user_input": row[1],
                     "response": row[2],
                     "context": json.loads(row[3])
                 }
-                for row in cursor.fetchall()
-            ]
\ No newline at end of file
+                for row in rows
+            ]
+            if len(rows) < limit:
+                for row in archived_rows(conn, session_id, rows[-1][4] if rows else None,
+                                         limit - len(rows)):
+                    recent.append({key: row[key] for key in ("timestamp", "user_input", "response", "context")})
+        return recent
+
+    async def iter_history(self, session_id: str, before_id: Optional[int] = None,
+                           page_size: int = 100) -> AsyncIterator[Dict]:
+        """Stream a session's history newest-first, one keyset page at a time
+
+        Pass the last seen `id` as `before_id` to resume where a previous
+        iteration stopped.
+        """
+        await self._await_session_writes(session_id)
+        while True:
+            page = await self._reads.run(
+                self._fetch_history_page, session_id, before_id, page_size
+            )
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            before_id = page[-1]["id"]
+
+    def _fetch_history_page(self, session_id: str, before_id: Optional[int],
+                            page_size: int) -> List[Dict]:
+        with self.engine.reader() as conn:
+            rows = conn.execute(
+                """SELECT id, timestamp, ts, user_input, response, context
+                   FROM conversations
+                   WHERE session_id = ? AND id < ?
+                   ORDER BY id DESC LIMIT ?""",
+                (session_id, before_id if before_id is not None else MAX_ROWID, page_size)
+            ).fetchall()
+            page = [
+                {
+                    "id": row[0],
+                    "timestamp": row[1],
+                    "ts": row[2],
+                    "user_input": row[3],
+                    "response": row[4],
+                    "context": json.loads(row[5])
+                }
+                for row in rows
+            ]
+            if len(page) < page_size:
+                # The hot rows ran out; older ones may be in the archive.
+                page += archived_rows(conn, session_id, page[-1]["id"] if page else before_id,
+                                      page_size - len(page))
+        return page
+
+    async def recent_activity(self, limit: int = 20, since: Optional[int] = None) -> List[Dict]:
+        """Newest interactions across all sessions (hot tier), optionally after `since` ms"""
+        await self._writes.run(lambda: None)
+        return await self._reads.run(self._fetch_recent_activity, limit, since)
+
+    def _fetch_recent_activity(self, limit: int, since: Optional[int]) -> List[Dict]:
+        rows = self.engine.read(
+            """SELECT id, session_id, timestamp, ts, user_input, response, context
+               FROM conversations
+               WHERE ts >= ?
+               ORDER BY ts DESC, id DESC LIMIT ?""",
+            (since if since is not None else 0, limit)
+        )
+        return [
+            {
+                "id": row[0],
+                "session_id": row[1],
+                "timestamp": row[2],
+                "ts": row[3],
+                "user_input": row[4],
+                "response": row[5],
+                "context": json.loads(row[6])
+            }
+            for row in rows
+        ]
+
+    async def search_context(self, query: str, session_id: Optional[str] = None,
+                             limit: int = 5) -> List[Dict]:
+        """Keyword recall: BM25-ranked past interactions with highlighted snippets"""
+        match = _fts_query(query)
+        if not match:
+            return []
+        if session_id is not None:
+            await self._await_session_writes(session_id)
+        else:
+            await self._writes.run(lambda: None)
+        return await self._reads.run(self._fetch_search, match, session_id, limit)
+
+    def _fetch_search(self, match: str, session_id: Optional[str], limit: int) -> List[Dict]:
+        rows = self.engine.read(
+            """SELECT c.id, c.session_id, c.timestamp, c.user_input, c.response,
+                      bm25(conversations_fts),
+                      snippet(conversations_fts, -1, '[', ']', '...', 16)
+               FROM conversations_fts
+               JOIN conversations c ON c.id = conversations_fts.rowid
+               WHERE conversations_fts MATCH ?
+                 AND (? IS NULL OR c.session_id = ?)
+               ORDER BY bm25(conversations_fts) LIMIT ?""",
+            (match, session_id, session_id, limit)
+        )
+        return [
+            {
+                "id": row[0],
+                "session_id": row[1],
+                "timestamp": row[2],
+                "user_input": row[3],
+                "response": row[4],
+                "score": -row[5],
+                "snippet": row[6]
+            }
+            for row in rows
+        ]
+
+    async def semantic_search(self, query: str, session_id: Optional[str] = None,
+                              limit: int = 5) -> List[Dict]:
+        """Recall interactions by embedding similarity (requires semantic=True)"""
+        if self.vectors is None:
+            raise RuntimeError("Semantic memory is disabled; create JarvisMemory(semantic=True)")
+        if session_id is not None:
+            await self._await_session_writes(session_id)
+        else:
+            await self._writes.run(lambda: None)
+        return await self._reads.run(self._fetch_semantic, query, session_id, limit)
+
+    def _fetch_semantic(self, query: str, session_id: Optional[str], limit: int) -> List[Dict]:
+        self.engine.flush()  # vectors are appended when their rows commit
+        embedding = self.embedder.embed(query)
+        k = limit
+        while True:
+            hits = self.vectors.search(embedding, k, session_id)
+            rows = self._hot_rows([rowid for rowid, _ in hits])
+            found = [
+                {
+                    "id": rowid,
+                    "session_id": rows[rowid][1],
+                    "timestamp": rows[rowid][2],
+                    "user_input": rows[rowid][3],
+                    "response": rows[rowid][4],
+                    "score": score
+                }
+                for rowid, score in hits if rowid in rows
+            ]
+            # Archived rows keep their vectors; look further down the ranking for live ones.
+            if len(found) >= limit or len(hits) < k:
+                return found[:limit]
+            k *= 2
+
+    def _hot_rows(self, ids: List[int], chunk: int = 500) -> Dict[int, tuple]:
+        rows = {}
+        for start in range(0, len(ids), chunk):
+            part = ids[start:start + chunk]
+            for row in self.engine.read(
+                f"""SELECT id, session_id, timestamp, user_input, response
+                    FROM conversations WHERE id IN ({",".join("?" * len(part))})""",
+                part
+            ):
+                rows[row[0]] = row
+        return rows
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters and footprint of the recent-context cache"""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def pending_writes(self) -> int:
+        """Number of interactions queued but not yet handed to SQLite"""
+        return self._writes.qsize()
+
+    def flush(self):
+        """Commit any queued interactions"""
+        self._writes.submit(self.engine.flush).result()
+
+    def close(self):
+        """Flush queued interactions and release database connections"""
+        if self.retention is not None:
+            self.retention.stop()
+        self._writes.shutdown()
+        self._reads.shutdown()
+        self.engine.close()
+        if self.vectors is not None:
+            self.vectors.close()
+
+
+
+class JarvisCore:
+    """Jarvis engine: the LM Studio local server plus session-aware memory"""
+    def __init__(self, base_path: Optional[Path] = None, base_url: Optional[str] = None,
+                 model: Optional[str] = None, system_prompt: Optional[str] = None,
+                 memory: Optional[JarvisMemory] = None, history_turns: int = 5):
+        self.base_url = base_url or os.getenv("LM_STUDIO_URL", "http://127.0.0.1:1234")
+        self.model = model or os.getenv("MODEL_NAME", "llama-2-7b-chat")
+        self.system_prompt = system_prompt or os.getenv(
+            "SYSTEM_PROMPT", "You are Jarvis, a helpful AI assistant."
+        )
+        self.temperature = float(os.getenv("TEMPERATURE", "0.7"))
+        self.max_tokens = int(os.getenv("MAX_TOKENS", "500"))
+        self.history_turns = history_turns
+        self.client = AsyncBackendClient(get_client(self.base_url, model=self.model))
+        self.memory = memory or JarvisMemory.open(base_path or Path(__file__).resolve().parent.parent)
+
+    def is_ready(self) -> bool:
+        """True when the local server is up"""
+        return self.client.client.is_ready()
+
+    async def build_messages(self, user_input: str, session_id: str) -> List[Dict]:
+        history = await self.memory.get_recent_context(session_id, self.history_turns)
+        messages = [{"role": "system", "content": self.system_prompt}]
+        for turn in reversed(history):
+            if turn["context"].get("summary_of"):
+                # A rolled-up stretch of archived turns.
+                messages.append({"role": "system", "content": f"Earlier conversation:\n{turn['response']}"})
+                continue
+            messages.append({"role": "user", "content": turn["user_input"]})
+            messages.append({"role": "assistant", "content": turn["response"]})
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    async def process_input(self, user_input: str, session_id: str = "default") -> str:
+        """Answer one message and remember the exchange"""
+        with metrics.span("core.turn", session=session_id) as turn:
+            with metrics.span("history.build"):
+                messages = await self.build_messages(user_input, session_id)
+            try:
+                with metrics.span("model.call", backend="lmstudio"):
+                    response = await self.client.complete(
+                        messages, temperature=self.temperature, max_tokens=self.max_tokens
+                    )
+            except BackendError as e:
+                print(f"Error getting response from LM Studio: {e}")
+                turn.set(error=str(e))
+                return f"Sorry, I encountered an error: {str(e)}"
+            with metrics.span("memory.store"):
+                await self.memory.store_interaction(user_input, response, session_id)
+            return response
+
+    async def stream_input(self, user_input: str, session_id: str = "default") -> AsyncIterator[str]:
+        """Like process_input, but yield the reply as it is generated"""
+        messages = await self.build_messages(user_input, session_id)
+        parts = []
+        try:
+            async for chunk in self.client.stream_chat_completion(
+                messages, temperature=self.temperature, max_tokens=self.max_tokens
+            ):
+                parts.append(chunk)
+                yield chunk
+        except BackendError as e:
+            print(f"Error streaming response from LM Studio: {e}")
+            yield f"Sorry, I encountered an error: {str(e)}"
+            return
+        await self.memory.store_interaction(user_input, "".join(parts).strip(), session_id)
+
+    def close(self):
+        self.client.close()
+        self.memory.close()
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 OR-query of quoted terms (no query syntax)"""
+    terms = re.findall(r"\w+", text.lower())
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
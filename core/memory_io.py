@@ -0,0 +1,549 @@
+"""
+Streaming JSONL export/import for the conversations store.
+
+One JSON object per line:
+
+    {"id": 42, "session_id": "ui-…", "timestamp": "2024-05-01T09:30:00",
+     "ts": 1714548600000, "user_input": "…", "response": "…", "context": {…}}
+
+Both schemas are handled: the session-aware one from core/jarvis_core.py
+(including rows held in the retention archive) and the legacy one from
+core/memory_system.py, whose rows export with session_id null and a `ts`
+derived from their timestamp. A `.gz` path means gzip either way.
+
+Memory use does not depend on the size of the store or the file. Export
+iterates one cursor inside a single read snapshot and records a checkpoint
+(`<output>.checkpoint`) every `checkpoint_rows` rows, so a rerun picks up
+after the last one. Import inserts with `executemany` in large transactions;
+each one also advances a row in `memory_io_checkpoints` inside the target
+database, so a crashed import resumes from the last commit. With --defer,
+indexes and triggers on `conversations` (FTS included) are dropped for the
+import and rebuilt once at the end: much faster for a bulk load, but only
+allowed while no other connection (a running Jarvis) has the database open.
+
+    python -m core.memory_io export data/memory/jarvis_memory.db dump.jsonl.gz --since 2024-01-01
+    python -m core.memory_io import other/jarvis_memory.db dump.jsonl.gz --session ui-1234
+    python -m core.memory_io import new/jarvis_memory.db dump.jsonl.gz --defer
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .retention import decompress
+from .storage import SQLiteEngine
+
+SCHEMAS = ("session", "legacy")
+
+# Epoch millis from a local-time ISO timestamp; the same conversion the
+# session schema's v1 migration applies to legacy rows.
+_LEGACY_TS = "CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def detect_schema(conn) -> Optional[str]:
+    """"session", "legacy", or None when there is no conversations table"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+    if not columns:
+        return None
+    return "session" if "session_id" in columns else "legacy"
+
+
+def parse_time(value) -> Optional[int]:
+    """Epoch millis from epoch seconds or a (local-time) ISO-8601 string"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value * 1000)
+    try:
+        return int(float(value) * 1000)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def _timestamp_ms(timestamp: Optional[str]) -> Optional[int]:
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+
+class RecordFilter:
+    """Session / time-range selection shared by export and import"""
+    def __init__(self, sessions: Optional[Iterable[str]] = None,
+                 since=None, until=None):
+        self.sessions = sorted(set(sessions)) if sessions else None
+        self.since = parse_time(since)
+        self.until = parse_time(until)
+
+    def __call__(self, session_id: Optional[str], ts: Optional[int]) -> bool:
+        if self.sessions is not None and session_id not in self.sessions:
+            return False
+        if self.since is not None and (ts is None or ts < self.since):
+            return False
+        if self.until is not None and (ts is None or ts >= self.until):
+            return False
+        return True
+
+    def sql(self, session_column: str, ts_column: str) -> Tuple[str, List]:
+        """WHERE terms (each prefixed with AND) and their parameters"""
+        terms, params = [], []
+        if self.sessions is not None:
+            terms.append(f"{session_column} IN ({', '.join('?' * len(self.sessions))})")
+            params.extend(self.sessions)
+        if self.since is not None:
+            terms.append(f"{ts_column} >= ?")
+            params.append(self.since)
+        if self.until is not None:
+            terms.append(f"{ts_column} < ?")
+            params.append(self.until)
+        return "".join(f" AND {term}" for term in terms), params
+
+    def as_dict(self) -> Dict:
+        return {"sessions": self.sessions, "since": self.since, "until": self.until}
+
+
+# -- export -----------------------------------------------------------------
+
+def _archive_records(conn, selection: RecordFilter, after: int) -> Iterator[Tuple[int, Dict]]:
+    """Rows held in conversation_archive, block by block (key = block first_id)"""
+    if not conn.execute("""SELECT 1 FROM sqlite_master
+                           WHERE type = 'table' AND name = 'conversation_archive'""").fetchone():
+        return
+    # Blocks overlapping the range; rows are checked one by one below.
+    where, params = selection.sql("session_id", "last_ts")
+    if selection.until is not None:
+        where += " AND first_ts < ?"
+        params.append(selection.until)
+    blocks = conn.execute(
+        f"""SELECT first_id, last_id, last_ts, row_count, kind, codec, data, session_id
+            FROM conversation_archive
+            WHERE first_id > ?{where}
+            ORDER BY first_id""",
+        [after] + params
+    )
+    for first_id, last_id, last_ts, row_count, kind, codec, data, session_id in blocks:
+        payload = json.loads(decompress(data, codec))
+        if kind == "summary":
+            # Exported like the rolled-up row JarvisMemory reads back.
+            if selection(session_id, last_ts):
+                yield first_id, {
+                    "id": last_id, "session_id": session_id,
+                    "timestamp": payload["timestamp"], "ts": last_ts,
+                    "user_input": "", "response": payload["summary"],
+                    "context": {"summary_of": row_count, "first_id": first_id},
+                }
+            continue
+        for rowid, timestamp, ts, user_input, response, context in payload:
+            if selection(session_id, ts):
+                yield first_id, {
+                    "id": rowid, "session_id": session_id, "timestamp": timestamp, "ts": ts,
+                    "user_input": user_input, "response": response,
+                    "context": json.loads(context or "{}"),
+                }
+
+
+def _hot_records(conn, schema: str, selection: RecordFilter, after: int,
+                 fetch_rows: int) -> Iterator[Tuple[int, Dict]]:
+    """Rows in conversations, in id order (key = row id)"""
+    if schema == "session":
+        where, params = selection.sql("session_id", "ts")
+        columns = "id, session_id, timestamp, ts, user_input, response, context"
+    else:
+        if selection.sessions is not None:
+            return  # legacy rows belong to no session
+        where, params = selection.sql("NULL", _LEGACY_TS)
+        columns = f"id, NULL, timestamp, {_LEGACY_TS}, user_input, response, context"
+    cursor = conn.execute(
+        f"SELECT {columns} FROM conversations WHERE id > ?{where} ORDER BY id",
+        [after] + params
+    )
+    while True:
+        rows = cursor.fetchmany(fetch_rows)
+        if not rows:
+            break
+        for rowid, session_id, timestamp, ts, user_input, response, context in rows:
+            yield rowid, {
+                "id": rowid, "session_id": session_id, "timestamp": timestamp, "ts": ts,
+                "user_input": user_input, "response": response,
+                "context": json.loads(context or "{}"),
+            }
+
+
+def iter_records(conn, selection: Optional[RecordFilter] = None) -> Iterator[Dict]:
+    """Every selected record of a database: archived rows first, then hot rows by id"""
+    selection = selection or RecordFilter()
+    schema = detect_schema(conn)
+    if schema == "session":
+        for _, record in _archive_records(conn, selection, 0):
+            yield record
+    if schema is not None:
+        for _, record in _hot_records(conn, schema, selection, 0, 5_000):
+            yield record
+
+
+def _write_json(path: Path, state: Dict):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def export_jsonl(db_path, output, sessions: Optional[Iterable[str]] = None,
+                 since=None, until=None, gzipped: Optional[bool] = None,
+                 checkpoint_rows: int = 100_000, fetch_rows: int = 5_000,
+                 restart: bool = False,
+                 progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """Stream conversations (archive first, then hot rows) to a JSONL file
+
+    Resumes from `<output>.checkpoint` if a previous run with the same
+    filters stopped early; `restart` starts over. Returns a summary dict.
+    """
+    output = Path(output)
+    gzipped = output.suffix == ".gz" if gzipped is None else gzipped
+    checkpoint_path = output.with_name(output.name + ".checkpoint")
+    selection = RecordFilter(sessions, since, until)
+    state = {"phase": "archive", "after": 0, "offset": 0, "records": 0,
+             "filter": selection.as_dict(), "gzip": gzipped}
+    if checkpoint_path.exists() and output.exists() and not restart:
+        saved = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+        if saved["filter"] != state["filter"] or saved["gzip"] != gzipped:
+            raise ValueError(f"{checkpoint_path} was written with other options; use restart")
+        state = saved
+
+    started = time.perf_counter()
+    resumed_from = state["records"]
+    with SQLiteEngine(db_path, readers=1) as engine, engine.reader() as conn:
+        schema = detect_schema(conn)
+        if schema is None:
+            raise ValueError(f"{db_path} has no conversations table")
+        raw = open(output, "r+b" if state["offset"] else "wb")
+        try:
+            raw.truncate(state["offset"])
+            raw.seek(state["offset"])
+            out = gzip.GzipFile(fileobj=raw, mode="wb") if gzipped else raw
+            pending = 0
+            # One read transaction: the archive and hot tiers come from the
+            # same snapshot, so rows moved by retention mid-export are seen once.
+            conn.execute("BEGIN")
+            try:
+                phases = ("archive", "hot") if schema == "session" else ("hot",)
+                for phase in phases[phases.index(state["phase"]) if state["phase"] in phases else 0:]:
+                    if phase != state["phase"]:
+                        state["phase"], state["after"] = phase, 0
+                    if phase == "archive":
+                        records = _archive_records(conn, selection, state["after"])
+                    else:
+                        records = _hot_records(conn, schema, selection, state["after"], fetch_rows)
+                    key = state["after"]
+                    for next_key, record in records:
+                        # Checkpoints fall between keys (archive blocks are never split).
+                        if next_key != key and pending >= checkpoint_rows:
+                            out = _export_checkpoint(raw, out, gzipped, checkpoint_path, state, key)
+                            pending = 0
+                            if progress:
+                                progress(state["records"])
+                        key = next_key
+                        out.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+                        out.write(b"\n")
+                        state["records"] += 1
+                        pending += 1
+                    state["after"] = key
+            finally:
+                conn.execute("COMMIT")
+            if gzipped:
+                out.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        finally:
+            raw.close()
+    if checkpoint_path.exists():
+        checkpoint_path.unlink()
+    if progress:
+        progress(state["records"])
+    return {"schema": schema, "records": state["records"],
+            "resumed_from": resumed_from, "bytes": output.stat().st_size,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def _export_checkpoint(raw, out, gzipped: bool, checkpoint_path: Path, state: Dict, key: int):
+    """Make everything written so far durable and record where to resume"""
+    if gzipped:
+        out.close()  # ends this gzip member; the next one starts at `offset`
+    raw.flush()
+    os.fsync(raw.fileno())
+    state["after"] = key
+    state["offset"] = raw.tell()
+    _write_json(checkpoint_path, state)
+    return gzip.GzipFile(fileobj=raw, mode="wb") if gzipped else out
+
+
+# -- import -----------------------------------------------------------------
+
+def _create_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS memory_io_checkpoints (
+            source TEXT PRIMARY KEY,
+            size INTEGER,
+            offset INTEGER NOT NULL,
+            records INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            deferred TEXT,
+            updated INTEGER
+        )
+    """)
+
+
+def _init_target(engine: SQLiteEngine, schema: str) -> str:
+    with engine.reader() as conn:
+        existing = detect_schema(conn)
+    if existing is None:
+        if schema == "session":
+            from .jarvis_core import JarvisMemory
+        else:
+            from .memory_system import JarvisMemory
+        JarvisMemory.init_schema(engine)
+        existing = schema
+    with engine.transaction() as conn:
+        _create_checkpoint_table(conn)
+    return existing
+
+
+def drop_indexes(conn) -> List[str]:
+    """Drop the indexes and triggers on conversations; returns their CREATE statements"""
+    objects = conn.execute(
+        """SELECT type, name, sql FROM sqlite_master
+           WHERE tbl_name = 'conversations' AND type IN ('index', 'trigger')
+             AND sql IS NOT NULL
+           ORDER BY type, name""").fetchall()
+    for kind, name, _ in objects:
+        conn.execute(f'DROP {kind.upper()} "{name}"')
+    return [sql for _, _, sql in objects]
+
+
+def restore_indexes(conn, statements: List[str]):
+    """Recreate what drop_indexes removed and rebuild the FTS index"""
+    for sql in statements:
+        conn.execute(sql.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+                        .replace("CREATE TRIGGER ", "CREATE TRIGGER IF NOT EXISTS ", 1))
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'conversations_fts'").fetchone():
+        conn.execute("INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')")
+
+
+def in_use(db_path) -> bool:
+    """Whether another connection has the database open
+
+    WAL-mode connections keep a shared lock while open, so an exclusive
+    lock is refused even when they are idle.
+    """
+    if not Path(db_path).exists():
+        return False
+    conn = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+    try:
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("ROLLBACK")
+        return False
+    except sqlite3.OperationalError:
+        return True
+    finally:
+        conn.close()
+
+
+def _restore_deferred(engine: SQLiteEngine, source: str):
+    with engine.transaction() as conn:
+        row = conn.execute("SELECT deferred FROM memory_io_checkpoints WHERE source = ?",
+                           (source,)).fetchone()
+        if row and row[0]:
+            restore_indexes(conn, json.loads(row[0]))
+            conn.execute("UPDATE memory_io_checkpoints SET deferred = NULL WHERE source = ?",
+                         (source,))
+
+
+def insert_sql(schema: str, keep_ids: bool = False) -> str:
+    columns = ["timestamp", "user_input", "response", "context"]
+    if schema == "session":
+        columns += ["session_id", "ts"]
+    if keep_ids:
+        columns.insert(0, "id")
+    verb = "INSERT OR IGNORE" if keep_ids else "INSERT"
+    return (f"{verb} INTO conversations ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})")
+
+
+def to_row(record: Dict, schema: str, keep_ids: bool = False,
+           default_session: str = "default") -> tuple:
+    """Parameters for insert_sql(schema, keep_ids) from one record"""
+    context = record.get("context")
+    row = [record.get("timestamp"), record.get("user_input"), record.get("response"),
+           context if isinstance(context, str) else json.dumps(context or {})]
+    if schema == "session":
+        ts = record.get("ts")
+        row += [record.get("session_id") or default_session,
+                ts if ts is not None else _timestamp_ms(record.get("timestamp"))]
+    if keep_ids:
+        row.insert(0, record.get("id"))
+    return tuple(row)
+
+
+def import_jsonl(db_path, source, sessions: Optional[Iterable[str]] = None,
+                 since=None, until=None, keep_ids: bool = False,
+                 default_session: str = "default", schema: str = "session",
+                 defer: bool = False, batch_rows: int = 50_000, restart: bool = False,
+                 progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """Load a JSONL export into a conversations database
+
+    The target is created with `schema` if it has no conversations table
+    yet. Records without a session get `default_session`; with `keep_ids`
+    the exported row ids are kept and rows whose id exists are skipped.
+    Re-running after a crash resumes from the last committed batch; a
+    source that was already imported completely needs `restart`. `defer`
+    drops the indexes and triggers until the end, which is refused while
+    another connection has the database open.
+    """
+    if schema not in SCHEMAS:
+        raise ValueError(f"Unknown schema: {schema}")
+    source = Path(source)
+    key = str(source.resolve())
+    size = source.stat().st_size
+    selection = RecordFilter(sessions, since, until)
+    started = time.perf_counter()
+    if defer and in_use(db_path):
+        raise ValueError(f"{db_path} is open elsewhere; stop Jarvis or import without deferring indexes")
+
+    with SQLiteEngine(db_path, readers=1) as engine:
+        target = _init_target(engine, schema)
+        insert = insert_sql(target, keep_ids)
+        with engine.transaction() as conn:
+            row = conn.execute(
+                "SELECT size, offset, records, done FROM memory_io_checkpoints WHERE source = ?",
+                (key,)
+            ).fetchone()
+            if row and not restart:
+                if row[3]:
+                    raise ValueError(f"{source} was already imported into {db_path}; use restart")
+                if row[0] != size:
+                    raise ValueError(f"{source} changed since the interrupted import; use restart")
+            if row is None or restart:
+                conn.execute(
+                    """INSERT OR REPLACE INTO memory_io_checkpoints
+                       (source, size, offset, records, done, deferred, updated)
+                       VALUES (?, ?, 0, 0, 0,
+                               (SELECT deferred FROM memory_io_checkpoints WHERE source = ?), ?)""",
+                    (key, size, key, int(time.time() * 1000))
+                )
+                row = (size, 0, 0, 0)
+            offset, imported = row[1], row[2]
+            resumed_from = imported
+            if defer:
+                statements = drop_indexes(conn)
+                if statements:
+                    # Saved in the same transaction, so a crashed run can still put them back.
+                    saved = conn.execute("SELECT deferred FROM memory_io_checkpoints WHERE source = ?",
+                                         (key,)).fetchone()[0]
+                    merged = (json.loads(saved) if saved else []) + statements
+                    conn.execute("UPDATE memory_io_checkpoints SET deferred = ? WHERE source = ?",
+                                 (json.dumps(merged), key))
+
+        skipped = 0
+        try:
+            opener = gzip.open if source.suffix == ".gz" else open
+            with opener(source, "rb") as f:
+                if offset:
+                    f.seek(offset)
+                batch = []
+                for line in f:
+                    offset += len(line)
+                    if line.strip():
+                        record = json.loads(line)
+                        if selection(record.get("session_id"), record.get("ts")
+                                     if record.get("ts") is not None
+                                     else _timestamp_ms(record.get("timestamp"))):
+                            batch.append(to_row(record, target, keep_ids, default_session))
+                        else:
+                            skipped += 1
+                    if len(batch) >= batch_rows:
+                        imported += _import_batch(engine, insert, batch, key, offset, imported)
+                        batch = []
+                        if progress:
+                            progress(imported)
+                imported += _import_batch(engine, insert, batch, key, offset, imported, done=True)
+        finally:
+            _restore_deferred(engine, key)
+    if progress:
+        progress(imported)
+    return {"schema": target, "records": imported - resumed_from, "total": imported,
+            "resumed_from": resumed_from, "filtered": skipped,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def _import_batch(engine: SQLiteEngine, insert: str, batch: List[tuple], source: str,
+                  offset: int, imported: int, done: bool = False) -> int:
+    """Insert one batch and advance the checkpoint in the same transaction"""
+    with engine.transaction() as conn:
+        # rowcount, unlike total_changes, leaves out rows written by triggers.
+        added = conn.executemany(insert, batch).rowcount if batch else 0
+        conn.execute(
+            """UPDATE memory_io_checkpoints
+               SET offset = ?, records = ?, done = ?, updated = ? WHERE source = ?""",
+            (offset, imported + added, int(done), int(time.time() * 1000), source)
+        )
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import Jarvis memory as JSON lines")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "import"):
+        command = commands.add_parser(name)
+        command.add_argument("db_path", help="path to the memory database")
+        command.add_argument("path", help="JSONL file (.gz for gzip)")
+        command.add_argument("--session", action="append", dest="sessions",
+                             help="only this session (repeatable)")
+        command.add_argument("--since", help="epoch seconds or ISO time (inclusive)")
+        command.add_argument("--until", help="epoch seconds or ISO time (exclusive)")
+        command.add_argument("--restart", action="store_true",
+                             help="ignore any checkpoint and start over")
+    commands.choices["export"].add_argument("--gzip", action="store_true", default=None,
+                                            help="compress even without a .gz suffix")
+    importer = commands.choices["import"]
+    importer.add_argument("--keep-ids", action="store_true", help="keep exported row ids")
+    importer.add_argument("--default-session", default="default")
+    importer.add_argument("--schema", choices=SCHEMAS, default="session",
+                          help="schema for a new database")
+    importer.add_argument("--batch-rows", type=int, default=50_000)
+    importer.add_argument("--defer", action="store_true",
+                          help="drop indexes and triggers until the end (bulk loads; Jarvis must be stopped)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    def progress(records: int):
+        rate = records / max(time.perf_counter() - started, 1e-9)
+        print(f"  {records:,} records ({rate:,.0f}/s)", flush=True)
+
+    filters = {"sessions": args.sessions, "since": args.since, "until": args.until,
+               "restart": args.restart, "progress": progress}
+    try:
+        if args.command == "export":
+            print(f"📤 Exporting {args.db_path} -> {args.path}")
+            result = export_jsonl(args.db_path, args.path, gzipped=args.gzip, **filters)
+        else:
+            print(f"📥 Importing {args.path} -> {args.db_path}")
+            result = import_jsonl(args.db_path, args.path, keep_ids=args.keep_ids,
+                                  default_session=args.default_session, schema=args.schema,
+                                  defer=args.defer, batch_rows=args.batch_rows, **filters)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
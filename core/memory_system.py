@@ -1,53 +1,88 @@
 from pathlib import Path
-import sqlite3
+import asyncio
 import json
 from datetime import datetime
+from concurrent.futures import Future
 from typing import Dict, List, Optional
 
+from .db_worker import DBWorker
+from .storage import SQLiteEngine
+
 class JarvisMemory:
     """Memory system for Jarvis AI"""
-    def __init__(self, base_path: Path):
+    def __init__(self, base_path: Path, durability: str = "turn",
+                 batch_size: int = 64, flush_interval: float = 0.05, readers: int = 4,
+                 queue_size: int = 1024):
         self.memory_path = base_path / "data" / "memory"
         self.memory_path.mkdir(parents=True, exist_ok=True)
         self.db_path = self.memory_path / "jarvis_memory.db"
-        self._init_db()
-
-    def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    user_input TEXT,
-                    response TEXT,
-                    context TEXT
-                )
-            """)
+        self.engine = SQLiteEngine(
+            self.db_path,
+            readers=readers,
+            durability=durability,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        self.init_schema(self.engine)
+        self._writes = DBWorker("jarvis-db-writer", threads=1, maxsize=queue_size)
+        self._reads = DBWorker("jarvis-db-reader", threads=readers, maxsize=queue_size)
+        self._last_write: Optional[Future] = None
+
+    @staticmethod
+    def init_schema(engine: SQLiteEngine):
+        engine.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                user_input TEXT,
+                response TEXT,
+                context TEXT
+            );
+        """)
 
     async def store_interaction(self, user_input: str, response: str, context: Optional[Dict] = None):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """INSERT INTO conversations 
-                   (timestamp, user_input, response, context) 
-                   VALUES (?, ?, ?, ?)""",
-                (datetime.now().isoformat(), user_input, response, 
-                 json.dumps(context or {}))
-            )
+        self._last_write = await self._writes.enqueue(
+            self.engine.write,
+            """INSERT INTO conversations
+               (timestamp, user_input, response, context)
+               VALUES (?, ?, ?, ?)""",
+            (datetime.now().isoformat(), user_input, response,
+             json.dumps(context or {}))
+        )
+        self._last_write.add_done_callback(_report_write_error)
 
     async def get_recent_context(self, limit: int = 5) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                """SELECT timestamp, user_input, response, context 
-                   FROM conversations 
-                   ORDER BY timestamp DESC LIMIT ?""",
-                (limit,)
-            )
-            return [
-                {
-                    "timestamp": row[0],
-                    "user_input": row[1],
-                    "response": row[2],
-                    "context": json.loads(row[3])
-                }
-                for row in cursor.fetchall()
-            ]
\ No newline at end of file
+        pending = self._last_write
+        if pending is not None and not pending.done():
+            await asyncio.wrap_future(pending)
+        return await self._reads.run(self._fetch_recent_context, limit)
+
+    def _fetch_recent_context(self, limit: int) -> List[Dict]:
+        rows = self.engine.read(
+            """SELECT timestamp, user_input, response, context
+               FROM conversations
+               ORDER BY id DESC LIMIT ?""",
+            (limit,)
+        )
+        return [
+            {
+                "timestamp": row[0],
+                "user_input": row[1],
+                "response": row[2],
+                "context": json.loads(row[3])
+            }
+            for row in rows
+        ]
+
+    def flush(self):
+        self._writes.submit(self.engine.flush).result()
+
+    def close(self):
+        self._writes.shutdown()
+        self._reads.shutdown()
+        self.engine.close()
+
+
+def _report_write_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error storing interaction: {future.exception()}")
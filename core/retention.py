@@ -0,0 +1,392 @@
+"""
+Tiered retention for the conversations table.
+
+    hot      recent rows stay in `conversations` as they are
+    archive  rows older than `hot_days` (except each session's newest
+             `keep_recent`) move to `conversation_archive` as compressed
+             blocks of up to `block_rows` rows from one session
+    rollup   with `rollup_days` set, archive blocks older than that keep
+             only an extractive summary of their turns
+
+A background thread does the work one block per transaction (compression
+happens before the write lock is taken) and then returns freed pages to
+the OS with small `PRAGMA incremental_vacuum` steps, so queued writes
+never wait for more than one block. JarvisMemory reads archived rows
+transparently once a session's hot rows run out; keyword search covers
+the hot tier only.
+
+One-off pass over an existing database (the first run of an older file
+may need --enable-incremental-vacuum, a single full VACUUM):
+
+    python -m core.retention data/memory/jarvis_memory.db --hot-days 30 --rollup-days 365
+"""
+import argparse
+import json
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from utils import metrics
+
+from .storage import SQLiteEngine
+
+DAY_MS = 86_400_000
+MAX_ROWID = 2 ** 63 - 1
+CODECS = ("zlib", "zstd")
+
+metrics.describe("jarvis_archived_rows_total", "Conversation rows moved to the archive")
+metrics.describe("jarvis_rollup_blocks_total", "Archive blocks reduced to a summary")
+metrics.describe("jarvis_vacuum_pages_total", "Pages released by incremental vacuum")
+
+
+class _Conflict(Exception):
+    """A block's rows changed between reading and archiving them"""
+
+
+def create_archive_tables(conn):
+    """Archive schema (run inside the schema migration)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_archive (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            first_ts INTEGER,
+            last_ts INTEGER,
+            row_count INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL
+        )
+    """)
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_archive_session
+                    ON conversation_archive (session_id, last_id)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_archive_age
+                    ON conversation_archive (kind, last_ts)""")
+
+
+def compress(payload: bytes, codec: str = "zlib") -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=10).compress(payload)
+    return zlib.compress(payload, 9)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _summary_row(block) -> Dict:
+    _, first_id, last_id, _, last_ts, row_count, _, codec, data = block
+    payload = json.loads(decompress(data, codec))
+    return {
+        "id": last_id,
+        "timestamp": payload["timestamp"],
+        "ts": last_ts,
+        "user_input": "",
+        "response": payload["summary"],
+        "context": {"summary_of": row_count, "first_id": first_id},
+    }
+
+
+def archived_rows(conn, session_id: str, before_id: Optional[int] = None,
+                  limit: int = 100) -> List[Dict]:
+    """A session's archived rows with id < before_id, newest first
+
+    A rolled-up block appears as a single row whose context holds
+    {"summary_of": <turns>, "first_id": ...} and whose response is the summary.
+    """
+    before_id = before_id if before_id is not None else MAX_ROWID
+    found = []
+    blocks = conn.execute(
+        """SELECT id, first_id, last_id, first_ts, last_ts, row_count, kind, codec, data
+           FROM conversation_archive
+           WHERE session_id = ? AND first_id < ?
+           ORDER BY last_id DESC""",
+        (session_id, before_id)
+    )
+    for block in blocks:
+        if block[6] == "summary":
+            if block[2] < before_id:
+                found.append(_summary_row(block))
+        else:
+            for rowid, timestamp, ts, user_input, response, context in reversed(
+                    json.loads(decompress(block[8], block[7]))):
+                if rowid < before_id:
+                    found.append({
+                        "id": rowid,
+                        "timestamp": timestamp,
+                        "ts": ts,
+                        "user_input": user_input,
+                        "response": response,
+                        "context": json.loads(context or "{}"),
+                    })
+                    if len(found) >= limit:
+                        break
+        if len(found) >= limit:
+            break
+    return found[:limit]
+
+
+class RetentionPolicy:
+    """When rows leave the hot table, and how the background work is paced.
+
+    `rollup_days=None` keeps archived turns forever; a rollup summarizes
+    at most `summary_turns` turns per block, evenly spread. `interval` is
+    the pause between passes, `pause` the gap between two blocks or vacuum
+    steps, and `vacuum_pages` the pages released per step.
+    """
+    def __init__(self, hot_days: float = 30.0, keep_recent: int = 20, block_rows: int = 100,
+                 codec: str = "zlib", rollup_days: Optional[float] = None, summary_turns: int = 20,
+                 interval: float = 300.0, pause: float = 0.05, vacuum_pages: int = 64):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        if rollup_days is not None and rollup_days < hot_days:
+            raise ValueError("rollup_days must not be shorter than hot_days")
+        self.hot_days = hot_days
+        self.keep_recent = keep_recent
+        self.block_rows = block_rows
+        self.codec = codec
+        self.rollup_days = rollup_days
+        self.summary_turns = summary_turns
+        self.interval = interval
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+
+
+class RetentionManager:
+    """Moves aged conversation rows through the hot → archive → rollup tiers."""
+    def __init__(self, engine: SQLiteEngine, policy: Optional[RetentionPolicy] = None,
+                 summarizer: Optional[Callable[[str, List[Dict]], str]] = None):
+        self.engine = engine
+        self.policy = policy or RetentionPolicy()
+        self.codec = self.policy.codec
+        if self.codec == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                print("zstandard is not installed; archiving with zlib instead")
+                self.codec = "zlib"
+        if summarizer is None:
+            from context_builder import extractive_summarizer as summarizer
+        self.summarizer = summarizer
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _candidate_sessions(self, cutoff_ts: int) -> List[str]:
+        rows = self.engine.read(
+            "SELECT DISTINCT session_id FROM conversations WHERE ts < ?", (cutoff_ts,)
+        )
+        return [row[0] for row in rows]
+
+    def _archive_block(self, session_id: str, cutoff_ts: int) -> int:
+        """Archive up to `block_rows` of the session's oldest aged rows; returns the count"""
+        keep = self.policy.keep_recent
+        with self.engine.reader() as conn:
+            boundary = MAX_ROWID
+            if keep > 0:
+                newest = conn.execute(
+                    """SELECT id FROM conversations WHERE session_id = ?
+                       ORDER BY id DESC LIMIT 1 OFFSET ?""",
+                    (session_id, keep - 1)
+                ).fetchone()
+                if newest is None:
+                    return 0
+                boundary = newest[0]
+            rows = conn.execute(
+                """SELECT id, timestamp, ts, user_input, response, context FROM conversations
+                   WHERE session_id = ? AND id < ? AND ts < ?
+                   ORDER BY id LIMIT ?""",
+                (session_id, boundary, cutoff_ts, self.policy.block_rows)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        data = compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"), self.codec)
+        with self.engine.transaction() as conn:
+            deleted = conn.executemany("DELETE FROM conversations WHERE id = ?",
+                                       [(row[0],) for row in rows]).rowcount
+            if deleted != len(rows):
+                # Rows changed since they were read; undo and retry next pass.
+                raise _Conflict()
+            conn.execute(
+                """INSERT INTO conversation_archive
+                   (session_id, first_id, last_id, first_ts, last_ts, row_count, kind, codec, data)
+                   VALUES (?, ?, ?, ?, ?, ?, 'rows', ?, ?)""",
+                (session_id, rows[0][0], rows[-1][0], rows[0][2], rows[-1][2], len(rows),
+                 self.codec, data)
+            )
+        metrics.incr("jarvis_archived_rows_total", len(rows))
+        return len(rows)
+
+    def archive_pass(self, now_ms: Optional[int] = None) -> int:
+        """Archive every aged row, one block at a time; returns the rows moved"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        cutoff_ts = now_ms - int(self.policy.hot_days * DAY_MS)
+        moved = 0
+        for session_id in self._candidate_sessions(cutoff_ts):
+            while not self._stop.is_set():
+                try:
+                    count = self._archive_block(session_id, cutoff_ts)
+                except _Conflict:
+                    break
+                moved += count
+                if count < self.policy.block_rows:
+                    break
+                self._stop.wait(self.policy.pause)
+        return moved
+
+    def rollup_pass(self, now_ms: Optional[int] = None) -> int:
+        """Replace archive blocks older than `rollup_days` with summaries"""
+        if self.policy.rollup_days is None:
+            return 0
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        cutoff_ts = now_ms - int(self.policy.rollup_days * DAY_MS)
+        # Ids only: payloads are fetched one block at a time below.
+        block_ids = [row[0] for row in self.engine.read(
+            """SELECT id FROM conversation_archive
+               WHERE kind = 'rows' AND last_ts < ? ORDER BY id""",
+            (cutoff_ts,)
+        )]
+        rolled = 0
+        for block_id in block_ids:
+            if self._stop.is_set():
+                break
+            block = self.engine.read(
+                "SELECT codec, data FROM conversation_archive WHERE id = ? AND kind = 'rows'",
+                (block_id,)
+            )
+            if not block:
+                continue  # rolled up or dropped since the ids were listed
+            codec, data = block[0]
+            rows = json.loads(decompress(data, codec))
+            step = -(-len(rows) // max(1, self.policy.summary_turns))
+            messages = []
+            for _, _, _, user_input, response, _ in rows[::step]:
+                messages.append({"role": "user", "content": user_input or ""})
+                messages.append({"role": "assistant", "content": response or ""})
+            payload = {"timestamp": rows[-1][1], "summary": self.summarizer("", messages)}
+            summary = compress(json.dumps(payload).encode("utf-8"), self.codec)
+            with self.engine.transaction() as conn:
+                rolled += conn.execute(
+                    """UPDATE conversation_archive SET kind = 'summary', codec = ?, data = ?
+                       WHERE id = ? AND kind = 'rows'""",
+                    (self.codec, summary, block_id)
+                ).rowcount
+            self._stop.wait(self.policy.pause)
+        metrics.incr("jarvis_rollup_blocks_total", rolled)
+        return rolled
+
+    def vacuum_mode(self) -> str:
+        mode = self.engine.read("PRAGMA auto_vacuum")[0][0]
+        return {0: "none", 1: "full", 2: "incremental"}.get(mode, str(mode))
+
+    def vacuum_step(self) -> int:
+        """Release up to `vacuum_pages` free pages; returns how many were released"""
+        before = self.engine.read("PRAGMA freelist_count")[0][0]
+        if before == 0:
+            return 0
+        # executescript steps the pragma to completion; execute() frees a single page.
+        self.engine.executescript(f"PRAGMA incremental_vacuum({int(self.policy.vacuum_pages)});")
+        released = max(0, before - self.engine.read("PRAGMA freelist_count")[0][0])
+        metrics.incr("jarvis_vacuum_pages_total", released)
+        return released
+
+    def vacuum(self) -> int:
+        """Incremental vacuum in small steps until no free pages are left"""
+        if self.vacuum_mode() != "incremental":
+            return 0
+        released = 0
+        while not self._stop.is_set():
+            step = self.vacuum_step()
+            released += step
+            if step == 0:
+                break
+            self._stop.wait(self.policy.pause)
+        return released
+
+    def enable_incremental_vacuum(self):
+        """Switch an older database to incremental auto-vacuum (one full, blocking VACUUM)"""
+        self.engine.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+
+    def run_once(self, now_ms: Optional[int] = None) -> Dict:
+        """One full pass: archive, roll up, vacuum"""
+        return {
+            "archived_rows": self.archive_pass(now_ms),
+            "rolled_up_blocks": self.rollup_pass(now_ms),
+            "vacuumed_pages": self.vacuum(),
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error applying retention: {e}")
+            self._stop.wait(self.policy.interval)
+
+    def start(self) -> "RetentionManager":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="jarvis-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict:
+        with self.engine.reader() as conn:
+            hot = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            archive = conn.execute(
+                """SELECT kind, COUNT(*), COALESCE(SUM(row_count), 0), COALESCE(SUM(LENGTH(data)), 0)
+                   FROM conversation_archive GROUP BY kind"""
+            ).fetchall()
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        tiers = {kind: {"blocks": blocks, "rows": rows, "bytes": size}
+                 for kind, blocks, rows, size in archive}
+        return {
+            "hot_rows": hot,
+            "archived": tiers.get("rows", {"blocks": 0, "rows": 0, "bytes": 0}),
+            "summarized": tiers.get("summary", {"blocks": 0, "rows": 0, "bytes": 0}),
+            "page_count": page_count,
+            "free_pages": free_pages,
+            "auto_vacuum": self.vacuum_mode(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive, roll up and vacuum Jarvis memory")
+    parser.add_argument("db_path", help="path to jarvis_memory.db")
+    parser.add_argument("--hot-days", type=float, default=30.0)
+    parser.add_argument("--keep-recent", type=int, default=20)
+    parser.add_argument("--rollup-days", type=float, default=None)
+    parser.add_argument("--codec", choices=CODECS, default="zlib")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="convert the file to incremental auto-vacuum first (full VACUUM)")
+    parser.add_argument("--stats", action="store_true", help="only print the tier sizes")
+    args = parser.parse_args()
+
+    policy = RetentionPolicy(args.hot_days, args.keep_recent, codec=args.codec,
+                             rollup_days=args.rollup_days, pause=0.0)
+    with SQLiteEngine(args.db_path) as engine:
+        with engine.transaction() as conn:
+            create_archive_tables(conn)
+        manager = RetentionManager(engine, policy)
+        if not args.stats:
+            if args.enable_incremental_vacuum and manager.vacuum_mode() != "incremental":
+                print("🧹 Converting to incremental auto-vacuum ...")
+                manager.enable_incremental_vacuum()
+            print(f"📦 {manager.run_once()}")
+        print(json.dumps(manager.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
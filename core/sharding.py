@@ -0,0 +1,384 @@
+"""
+Session-sharded memory: N SQLite files instead of one.
+
+SQLite allows one writer per file even in WAL mode, so several UI/server
+processes sharing `jarvis_memory.db` queue on its write lock. Sharded mode
+hashes each session id to one of `shards` files under data/memory/
+
+    shards.json             {"shards": 4, "hash": "blake2b-64"}
+    jarvis_memory.00.db … jarvis_memory.03.db
+
+and each file gets its own JarvisMemory (writer queue, reader pool, cache,
+retention). Per-session calls touch only their shard; global recent
+activity and searches fan out to every shard concurrently and merge.
+Row ids are unique within a shard only, so merged results carry a `shard`
+index next to the id.
+
+JarvisMemory.open() picks up the layout from shards.json, or from
+JARVIS_MEMORY_SHARDS for a new store. Existing data is moved with the
+reshard tool (stop every Jarvis process first; the old files are kept in
+a pre-reshard-<time>-<random> directory). The new files are built in
+reshard.tmp; a reshard.json marker written before the swap lets the next
+JarvisMemory.open() or reshard finish a swap that was interrupted:
+
+    python -m core.sharding . --shards 4
+    python -m core.sharding . --status
+"""
+import argparse
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from .jarvis_core import DB_NAME, JarvisMemory
+from .memory_io import drop_indexes, insert_sql, iter_records, restore_indexes, to_row
+from .storage import SQLiteEngine
+
+SHARDS_ENV = "JARVIS_MEMORY_SHARDS"
+LAYOUT_FILE = "shards.json"
+MARKER_FILE = "reshard.json"
+STAGING_DIR = "reshard.tmp"
+HASH_NAME = "blake2b-64"
+
+
+def shard_index(session_id: str, shards: int) -> int:
+    """Shard of a session (stable across processes, unlike hash())"""
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
+
+
+def shard_name(index: int) -> str:
+    return f"jarvis_memory.{index:02d}.db"
+
+
+def read_layout(memory_path: Path) -> Optional[Dict]:
+    """Contents of shards.json, or None for a single-file store"""
+    path = Path(memory_path) / LAYOUT_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_json(path: Path, data: Dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_layout(memory_path: Path, shards: int):
+    _write_json(Path(memory_path) / LAYOUT_FILE, {"shards": shards, "hash": HASH_NAME})
+
+
+def _place(source: Path, target: Path):
+    os.replace(source, target)
+
+
+def _db_files(path: Path) -> List[Path]:
+    """A database file with its WAL, shared-memory and vector-index companions"""
+    return [path.with_name(path.name + suffix) for suffix in ("", "-wal", "-shm")] + [
+        path.with_suffix(".f32"), path.with_suffix(".ids")]
+
+
+def finish_reshard(memory_path: Path) -> bool:
+    """Complete a reshard whose swap was interrupted; False when none was pending
+
+    Every step checks what is already done, so this is safe to repeat after
+    another interruption. Old files only ever move into the backup
+    directory named in the marker, and the new ones come from reshard.tmp.
+    """
+    memory_path = Path(memory_path)
+    marker_path = memory_path / MARKER_FILE
+    if not marker_path.exists():
+        return False
+    marker = json.loads(marker_path.read_text(encoding="utf-8"))
+    staging = memory_path / STAGING_DIR
+    backup = memory_path / marker["backup"]
+    backup.mkdir(exist_ok=True)
+    targets = marker["targets"]
+    for name in dict.fromkeys(marker["sources"] + targets):
+        if name in targets and not (staging / name).exists():
+            continue  # already replaced by its new file
+        for old in _db_files(memory_path / name):
+            if old.exists():
+                shutil.move(str(old), str(backup / old.name))
+    layout = memory_path / LAYOUT_FILE
+    if marker["had_layout"] and layout.exists() and not (backup / LAYOUT_FILE).exists():
+        shutil.move(str(layout), str(backup / LAYOUT_FILE))
+    for name in targets:
+        if (staging / name).exists():
+            _place(staging / name, memory_path / name)
+    if marker["shards"] > 1:
+        write_layout(memory_path, marker["shards"])
+    shutil.rmtree(staging, ignore_errors=True)
+    marker_path.unlink()
+    return True
+
+
+def _has_rows(db_path: Path) -> bool:
+    if not db_path.exists():
+        return False
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return next(iter_records(conn), None) is not None
+    finally:
+        conn.close()
+
+
+class ShardedMemory:
+    """JarvisMemory's interface over `shards` files, routed by session id
+
+    `options` are passed to each shard's JarvisMemory; `cache_bytes` is the
+    total across shards. Shards are opened on first use.
+    """
+    def __init__(self, base_path: Path, shards: int = 4, readers: int = 2,
+                 cache_bytes: int = 32 * 1024 * 1024, **options):
+        if shards < 2:
+            raise ValueError("ShardedMemory needs at least 2 shards")
+        self.base_path = Path(base_path)
+        self.memory_path = self.base_path / "data" / "memory"
+        self.memory_path.mkdir(parents=True, exist_ok=True)
+        layout = read_layout(self.memory_path)
+        if layout is None:
+            if _has_rows(self.memory_path / DB_NAME):
+                raise ValueError(f"{self.memory_path / DB_NAME} is not sharded yet; run "
+                                 f"`python -m core.sharding {self.base_path} --shards {shards}`")
+            write_layout(self.memory_path, shards)
+        elif layout["shards"] != shards:
+            raise ValueError(f"{self.memory_path} has {layout['shards']} shards, not {shards}; "
+                             f"run `python -m core.sharding {self.base_path} --shards {shards}`")
+        self.shards = shards
+        self._options = dict(options, readers=readers, cache_bytes=cache_bytes // shards)
+        self._memories: List[Optional[JarvisMemory]] = [None] * shards
+        self._lock = threading.Lock()
+
+    def _memory(self, index: int) -> JarvisMemory:
+        memory = self._memories[index]
+        if memory is None:
+            with self._lock:
+                memory = self._memories[index]
+                if memory is None:
+                    memory = JarvisMemory(self.base_path, db_name=shard_name(index), **self._options)
+                    self._memories[index] = memory
+        return memory
+
+    def shard(self, session_id: str) -> JarvisMemory:
+        """The JarvisMemory holding `session_id`"""
+        return self._memory(shard_index(session_id, self.shards))
+
+    def _opened(self) -> List[JarvisMemory]:
+        return [memory for memory in self._memories if memory is not None]
+
+    async def _fan_out(self, call: Callable, limit: int, key: Callable) -> List[Dict]:
+        """Run `call(memory)` on every shard at once; merge the top `limit` rows by `key`"""
+        results = await asyncio.gather(*(call(self._memory(i)) for i in range(self.shards)))
+        rows = []
+        for index, shard_rows in enumerate(results):
+            for row in shard_rows:
+                row["shard"] = index
+                rows.append(row)
+        return heapq.nlargest(limit, rows, key=key)
+
+    async def store_interaction(self, user_input: str, response: str,
+                                session_id: str, context: Optional[Dict] = None):
+        """Store a conversation interaction in its session's shard (returns once queued)"""
+        await self.shard(session_id).store_interaction(user_input, response, session_id, context)
+
+    async def get_recent_context(self, session_id: str, limit: int = 5) -> List[Dict]:
+        return await self.shard(session_id).get_recent_context(session_id, limit)
+
+    async def iter_history(self, session_id: str, before_id: Optional[int] = None,
+                           page_size: int = 100) -> AsyncIterator[Dict]:
+        async for row in self.shard(session_id).iter_history(session_id, before_id, page_size):
+            yield row
+
+    async def recent_activity(self, limit: int = 20, since: Optional[int] = None) -> List[Dict]:
+        """Newest interactions across every shard"""
+        return await self._fan_out(lambda memory: memory.recent_activity(limit, since), limit,
+                                   key=lambda row: (row["ts"] or 0, row["id"]))
+
+    async def search_context(self, query: str, session_id: Optional[str] = None,
+                             limit: int = 5) -> List[Dict]:
+        """Keyword recall; without a session, the best hits of all shards
+
+        BM25 weights terms by their frequency within each shard, so merged
+        scores are comparable only roughly; every shard returns its own top
+        `limit` before the merge.
+        """
+        if session_id is not None:
+            index = shard_index(session_id, self.shards)
+            rows = await self._memory(index).search_context(query, session_id, limit)
+            return [dict(row, shard=index) for row in rows]
+        return await self._fan_out(lambda memory: memory.search_context(query, None, limit), limit,
+                                   key=lambda row: row["score"])
+
+    async def semantic_search(self, query: str, session_id: Optional[str] = None,
+                              limit: int = 5) -> List[Dict]:
+        if session_id is not None:
+            index = shard_index(session_id, self.shards)
+            rows = await self._memory(index).semantic_search(query, session_id, limit)
+            return [dict(row, shard=index) for row in rows]
+        return await self._fan_out(lambda memory: memory.semantic_search(query, None, limit), limit,
+                                   key=lambda row: row["score"])
+
+    def cache_stats(self) -> Dict:
+        """Recent-context cache counters summed over the open shards"""
+        totals: Dict = {}
+        for memory in self._opened():
+            for key, value in memory.cache_stats().items():
+                if key != "hit_ratio":
+                    totals[key] = totals.get(key, 0) + value
+        if totals:
+            lookups = totals["hits"] + totals["misses"]
+            totals["hit_ratio"] = totals["hits"] / lookups if lookups else 0.0
+            totals["shards"] = len(self._opened())
+        return totals
+
+    def pending_writes(self) -> int:
+        return sum(memory.pending_writes() for memory in self._opened())
+
+    def flush(self):
+        for memory in self._opened():
+            memory.flush()
+
+    def close(self):
+        with self._lock:
+            for memory in self._opened():
+                memory.close()
+            self._memories = [None] * self.shards
+
+
+def reshard(base_path: Path, shards: int, batch_rows: int = 50_000,
+            progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """Rewrite the store under `base_path` as `shards` files (1 = back to one file)
+
+    Every row, archived ones included, is copied in per-session order into
+    freshly created shards with indexes deferred, then the files are swapped
+    in. Rows get new ids; archived rows land in the hot tier until the next
+    retention pass re-archives them. Run it with Jarvis stopped.
+    """
+    started = time.perf_counter()
+    memory_path = Path(base_path) / "data" / "memory"
+    finish_reshard(memory_path)
+    layout = read_layout(memory_path)
+    if layout:
+        sources = [memory_path / shard_name(i) for i in range(layout["shards"])]
+    else:
+        sources = [memory_path / DB_NAME]
+    targets = [DB_NAME] if shards <= 1 else [shard_name(i) for i in range(shards)]
+
+    staging = memory_path / STAGING_DIR
+    if staging.exists():
+        shutil.rmtree(staging)  # left by an interrupted run; the sources are untouched
+    staging.mkdir(parents=True)
+    engines, deferred, buffers = [], [], [[] for _ in targets]
+    counts = [0] * len(targets)
+    insert = insert_sql("session")
+    try:
+        for name in targets:
+            engine = SQLiteEngine(staging / name, readers=1)
+            engines.append(engine)
+            JarvisMemory.init_schema(engine)
+            with engine.transaction() as conn:
+                deferred.append(drop_indexes(conn))
+
+        def write(index: int):
+            with engines[index].transaction() as conn:
+                conn.executemany(insert, buffers[index])
+            counts[index] += len(buffers[index])
+            buffers[index] = []
+
+        for source in sources:
+            if not source.exists():
+                continue
+            conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            try:
+                for record in iter_records(conn):
+                    row = to_row(record, "session")
+                    index = shard_index(row[4], len(targets))
+                    buffers[index].append(row)
+                    if len(buffers[index]) >= batch_rows:
+                        write(index)
+                        if progress:
+                            progress(sum(counts))
+            finally:
+                conn.close()
+        for index in range(len(targets)):
+            write(index)
+            with engines[index].transaction() as conn:
+                restore_indexes(conn, deferred[index])
+    finally:
+        for engine in engines:
+            engine.close()
+
+    # Swap: the old files go to a backup directory, the new ones take their place.
+    # The marker goes first, so a crash part-way is finished by finish_reshard().
+    backup = Path(tempfile.mkdtemp(dir=memory_path, prefix=time.strftime("pre-reshard-%Y%m%d-%H%M%S-")))
+    _write_json(memory_path / MARKER_FILE, {
+        "backup": backup.name, "sources": [source.name for source in sources],
+        "targets": targets, "shards": len(targets), "had_layout": layout is not None,
+    })
+    finish_reshard(memory_path)
+    if progress:
+        progress(sum(counts))
+    return {"sources": [source.name for source in sources], "shards": len(targets),
+            "records": sum(counts), "per_shard": counts, "backup": str(backup),
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def status(base_path: Path) -> Dict:
+    """Layout and row counts of the store under `base_path`"""
+    memory_path = Path(base_path) / "data" / "memory"
+    layout = read_layout(memory_path)
+    names = [shard_name(i) for i in range(layout["shards"])] if layout else [DB_NAME]
+    files = {}
+    for name in names:
+        path = memory_path / name
+        if not path.exists():
+            files[name] = None
+            continue
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            files[name] = {
+                "rows": conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+                "sessions": conn.execute(
+                    "SELECT COUNT(DISTINCT session_id) FROM conversations").fetchone()[0],
+                "bytes": path.stat().st_size,
+            }
+        except sqlite3.Error as e:
+            files[name] = {"error": str(e)}
+        finally:
+            conn.close()
+    return {"shards": layout["shards"] if layout else 1, "files": files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard Jarvis memory by session")
+    parser.add_argument("base_path", nargs="?", default=".",
+                        help="project directory holding data/memory (default: .)")
+    parser.add_argument("--shards", type=int, help="reshard into this many files (1 = single file)")
+    parser.add_argument("--batch-rows", type=int, default=50_000)
+    parser.add_argument("--status", action="store_true", help="only print the current layout")
+    args = parser.parse_args()
+
+    if args.shards and not args.status:
+        started = time.perf_counter()
+
+        def progress(records: int):
+            rate = records / max(time.perf_counter() - started, 1e-9)
+            print(f"  {records:,} rows ({rate:,.0f}/s)", flush=True)
+
+        print(f"🔀 Resharding {Path(args.base_path) / 'data' / 'memory'} into {args.shards} file(s)...")
+        print(json.dumps(reshard(Path(args.base_path), args.shards, args.batch_rows, progress), indent=2))
+    print(json.dumps(status(Path(args.base_path)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
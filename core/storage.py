@@ -0,0 +1,244 @@
+from pathlib import Path
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+DURABILITY_MODES = ("turn", "group")
+
+PRAGMAS = (
+    # Only takes effect on a new database, so it has to precede journal_mode.
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+def _report_write_error(error: Exception):
+    print(f"Error storing memory write: {error}")
+
+
+class SQLiteEngine:
+    """Long-lived SQLite connections: one writer plus a pool of readers.
+
+    With durability="turn" every write is committed before `write` returns.
+    With durability="group" writes are queued and committed together once
+    `batch_size` rows are pending or `flush_interval` seconds have passed.
+    A batch that hits a locked/busy database stays queued and is retried;
+    a row that fails on its own is reported to its `on_error` callback
+    without taking the rest of the batch down.
+    """
+    def __init__(self, db_path: Path, readers: int = 4, durability: str = "turn",
+                 batch_size: int = 64, flush_interval: float = 0.05,
+                 busy_timeout: float = 5.0):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.db_path = Path(db_path)
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.busy_timeout = busy_timeout
+
+        self._write_lock = threading.RLock()
+        self._pending: List[Tuple[str, Sequence[Any], Optional[Callable[[int], None]],
+                                  Optional[Callable[[Exception], None]]]] = []
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._closed = False
+
+        self._writer = self._connect()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max(1, readers))
+        self._all_readers: List[sqlite3.Connection] = []
+
+        self._flusher = None
+        if durability == "group":
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="jarvis-sqlite-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def executescript(self, script: str):
+        """Run DDL on the writer connection"""
+        with self._write_lock:
+            self._flush_locked()
+            self._writer.executescript(script)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Exclusive access to the writer connection inside BEGIN/COMMIT"""
+        with self._write_lock:
+            self._flush_locked()
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    def write(self, sql: str, params: Sequence[Any] = (),
+              on_commit: Optional[Callable[[int], None]] = None,
+              on_error: Optional[Callable[[Exception], None]] = None):
+        """Queue a single-row write; `on_commit` receives its lastrowid
+
+        With durability="turn" a failed write raises here. With "group" the
+        row's own failure goes to `on_error` (printed if none is given).
+        """
+        if self._closed:
+            raise RuntimeError("SQLiteEngine is closed")
+        with self._write_lock:
+            if self.durability == "turn":
+                errors: List[Exception] = []
+                self._pending.append((sql, params, on_commit, errors.append))
+                try:
+                    self._flush_locked()
+                except sqlite3.OperationalError:
+                    self._pending = []  # the caller sees the error, so don't retry behind its back
+                    raise
+                if errors:
+                    raise errors[0]
+            else:
+                self._pending.append((sql, params, on_commit, on_error or _report_write_error))
+                if len(self._pending) >= self.batch_size:
+                    try:
+                        self._flush_locked()
+                    except sqlite3.OperationalError as e:
+                        # Still queued; the flusher retries the batch.
+                        print(f"Error flushing memory writes (will retry): {e}")
+                        self._flush_event.set()
+                else:
+                    self._flush_event.set()
+
+    def flush(self):
+        """Commit every queued write"""
+        with self._write_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """Commit the queued rows; on OperationalError (busy, locked) they stay queued"""
+        if not self._pending:
+            return
+        # Rows stay in _pending until COMMIT so readers that see them wait
+        # for this flush instead of racing past an uncommitted batch.
+        try:
+            committed, failed = self._commit_batch(isolate=False)
+        except sqlite3.OperationalError:
+            raise
+        except sqlite3.Error:
+            # One bad row: replay the batch with a savepoint per row so
+            # only that row fails.
+            committed, failed = self._commit_batch(isolate=True)
+        self._pending = []
+        for on_commit, rowid in committed:
+            on_commit(rowid)
+        for on_error, error in failed:
+            on_error(error)
+
+    def _commit_batch(self, isolate: bool):
+        committed, failed = [], []
+        self._writer.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params, on_commit, on_error in self._pending:
+                if isolate:
+                    self._writer.execute("SAVEPOINT row")
+                try:
+                    cursor = self._writer.execute(sql, params)
+                except sqlite3.OperationalError:
+                    raise
+                except sqlite3.Error as e:
+                    if not isolate:
+                        raise
+                    self._writer.execute("ROLLBACK TO row")
+                    self._writer.execute("RELEASE row")
+                    failed.append((on_error, e))
+                    continue
+                if isolate:
+                    self._writer.execute("RELEASE row")
+                if on_commit is not None:
+                    committed.append((on_commit, cursor.lastrowid))
+            self._writer.execute("COMMIT")
+        except BaseException:
+            self._writer.execute("ROLLBACK")
+            raise
+        return committed, failed
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_event.wait()
+            if self._closed:
+                break
+            self._stop_event.wait(self.flush_interval)  # close() cuts the wait short
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # The batch is still queued (see _flush_locked); try again.
+                print(f"Error flushing memory writes (will retry): {e}")
+                self._flush_event.set()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled read connection (pending writes are flushed first)"""
+        if self._closed:
+            raise RuntimeError("SQLiteEngine is closed")
+        if self._pending:
+            self.flush()
+        self._reader_slots.acquire()
+        try:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                conn.execute("PRAGMA query_only=ON")
+                with self._write_lock:
+                    self._all_readers.append(conn)
+            try:
+                yield conn
+            finally:
+                self._readers.put(conn)
+        finally:
+            self._reader_slots.release()
+
+    def read(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        """Run a query on a pooled reader and fetch all rows"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        """Flush pending writes and close every connection"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._write_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,131 @@
+from pathlib import Path
+import hashlib
+import re
+import threading
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+class HashingEmbedder:
+    """Offline text embeddings from signed feature hashing.
+
+    Words and character n-grams are hashed into a fixed number of buckets,
+    so no model download, network call or GPU is needed.
+    """
+    def __init__(self, dim: int = 256, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text: str):
+        for word in re.findall(r"\w+", text.lower()):
+            yield word, 1.0
+            padded = f" {word} "
+            for i in range(len(padded) - self.ngram + 1):
+                yield padded[i:i + self.ngram], 0.5
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+def session_key(session_id: str) -> int:
+    """Stable 64-bit key for a session id (Python's hash() is salted per process)"""
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class VectorIndex:
+    """Append-only embedding matrix stored as raw float32 next to the database.
+
+    `<db>.f32` holds one `dim`-wide row per interaction and `<db>.ids` holds
+    the matching (row id, session key) int64 pairs. Both files are only ever
+    appended to and are memory-mapped for queries, so startup cost does not
+    grow with the number of stored memories.
+    """
+    def __init__(self, db_path: Path, dim: int = 256):
+        self.dim = dim
+        self.vec_path = Path(db_path).with_suffix(".f32")
+        self.ids_path = Path(db_path).with_suffix(".ids")
+        self._lock = threading.Lock()
+        self._count = self._repair()
+        self._vec_file = open(self.vec_path, "ab")
+        self._ids_file = open(self.ids_path, "ab")
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+
+    def _repair(self) -> int:
+        """Trim a half-written trailing row left behind by a crash"""
+        row_bytes = self.dim * 4
+        vec_size = self.vec_path.stat().st_size if self.vec_path.exists() else 0
+        ids_size = self.ids_path.stat().st_size if self.ids_path.exists() else 0
+        count = min(vec_size // row_bytes, ids_size // 16)
+        for path, size in ((self.vec_path, count * row_bytes), (self.ids_path, count * 16)):
+            if path.exists() and path.stat().st_size != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        return count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def last_row_id(self) -> int:
+        _, ids = self._mapped()
+        return int(ids[-1, 0]) if len(ids) else 0
+
+    def row_ids(self) -> np.ndarray:
+        """Sorted row ids that have an embedding"""
+        _, ids = self._mapped()
+        return np.unique(ids[:, 0])
+
+    def add(self, row_id: int, session_id: str, vector: np.ndarray):
+        """Append one embedding for conversation row `row_id`"""
+        with self._lock:
+            self._vec_file.write(np.asarray(vector, dtype=np.float32).tobytes())
+            self._ids_file.write(np.array([row_id, session_key(session_id)], dtype=np.int64).tobytes())
+            self._vec_file.flush()
+            self._ids_file.flush()
+            self._count += 1
+
+    def _mapped(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            count = self._count
+            if self._vectors is None or len(self._vectors) != count:
+                if count == 0:
+                    return np.empty((0, self.dim), np.float32), np.empty((0, 2), np.int64)
+                self._vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r",
+                                          shape=(count, self.dim))
+                self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r",
+                                      shape=(count, 2))
+            return self._vectors, self._ids
+
+    def search(self, vector: np.ndarray, k: int = 5,
+               session_id: Optional[str] = None) -> List[Tuple[int, float]]:
+        """Top-k (row id, cosine score) pairs by a single matrix-vector product"""
+        vectors, ids = self._mapped()
+        if session_id is not None:
+            rows = np.flatnonzero(ids[:, 1] == session_key(session_id))
+            scores = vectors[rows] @ vector
+        else:
+            rows = None
+            scores = vectors @ vector
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = rows[top] if rows is not None else top
+        return [(int(ids[p, 0]), float(scores[t])) for p, t in zip(positions, top)]
+
+    def close(self):
+        with self._lock:
+            self._vectors = None
+            self._ids = None
+            self._vec_file.close()
+            self._ids_file.close()
@@ -1,13 +1,14 @@
 import sys
 import os
 import streamlit as st
-from dotenv import load_dotenv
-from langchain_openai import OpenAI
+from config_store import load_env
+from chat import ChatStream
+from response_cache import get_response_cache
 
 # Force UTF-8 encoding globally
 
 # Load environment variables
-load_dotenv()
+load_env()
 api_key = os.getenv("OPENAI_API_KEY")
 
 # Check if API key is available
@@ -15,8 +16,11 @@ if not api_key:
     st.error("OpenAI API key not found. Please check your .env file.")
     st.stop()
 
-# Initialize OpenAI LLM
-llm = OpenAI(openai_api_key=api_key)
+# Initialize OpenAI LLM (once per process, on the first message)
+@st.cache_resource
+def get_llm(api_key):
+    from langchain_openai import OpenAI
+    return OpenAI(openai_api_key=api_key)
 
 # Setup Streamlit UI
 st.set_page_config(page_title="Jarvis V1 Chat", page_icon="🤖")
@@ -46,14 +50,26 @@ if raw_input != user_input and raw_input.strip() != "":
 
 # Process input
 if user_input:
-    with st.spinner("Jarvis is thinking..."):
-        try:
-            # Get response from LLM
-            response = llm.invoke(user_input)
+    placeholder = st.empty()
+    cache = get_response_cache()
+    cache_key = cache.key("langchain-openai", user_input)
+    try:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            placeholder.markdown(f"**Jarvis:** {cached}")
+            st.caption("served from cache")
+        else:
+            # Stream the response from the LLM as tokens arrive
+            stream = ChatStream(get_llm(api_key).stream(user_input))
+            for _ in stream:
+                placeholder.markdown(f"**Jarvis:** {sanitize(stream.text)}▌")
 
             # Sanitize response just in case
-            clean_response = sanitize(response)
+            clean_response = sanitize(stream.text)
 
-            st.markdown(f"**Jarvis:** {clean_response}")
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+            placeholder.markdown(f"**Jarvis:** {clean_response}")
+            st.caption(stream.stats.summary())
+            if clean_response:
+                cache.put(cache_key, clean_response, stream.stats.as_dict()["total_time"])
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
@@ -0,0 +1,610 @@
+"""
+Headless Jarvis service: an asyncio HTTP + WebSocket API around JarvisCore.
+
+    GET  /health
+    GET  /metrics                      Prometheus text (see utils/metrics.py)
+    POST /v1/sessions/<id>/messages   {"message": "...", "stream": false, "timeout": 60}
+    GET  /v1/sessions/<id>/history?before=<row id>&limit=50
+    GET  /v1/sessions/<id>/search?q=<text>&limit=5
+    GET  /v1/ws                        WebSocket, one JSON message per frame:
+         -> {"id": 1, "session_id": "...", "message": "...", "timeout": 60}
+         <- {"id": 1, "delta": "..."} ... {"id": 1, "reply": "...", "done": true}
+         <- {"id": 1, "error": "...", "status": 504}
+
+With "stream": true a message is answered as server-sent events
+(`data: {"delta": ...}` lines, then `data: {"reply": ..., "done": true}`).
+
+Messages of one session are answered strictly in arrival order; at most
+`workers` replies are generated at once and at most `max_pending` wait
+for a slot. Each message has a deadline covering queueing and
+generation. SIGINT/SIGTERM stop accepting connections, let in-flight
+replies finish (up to `shutdown_timeout`) and flush pending memory
+writes before exiting.
+
+    python jarvis_server.py --port 8765 --workers 8
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import signal
+import struct
+from http import HTTPStatus
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from utils import metrics
+from utils.lazy import lazy_import
+
+requests = lazy_import("requests")
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict:
+        try:
+            payload = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return payload
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parse one HTTP/1.1 request; None when the client closed the connection"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HTTPError(400, "incomplete request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return Request(method.upper(), url.path, query, headers, body)
+
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+    data = json.dumps(payload).encode("utf-8")
+    writer.write(_head(status, {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(data)),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }) + data)
+    await writer.drain()
+
+
+async def send_text(writer: asyncio.StreamWriter, status: int, text: str,
+                    content_type: str = "text/plain; charset=utf-8", keep_alive: bool = True):
+    data = text.encode("utf-8")
+    writer.write(_head(status, {
+        "Content-Type": content_type,
+        "Content-Length": str(len(data)),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }) + data)
+    await writer.drain()
+
+
+def ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """A single unmasked (server-to-client) WebSocket frame"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def ws_read(reader: asyncio.StreamReader):
+    """(opcode, payload) of the next complete WebSocket message"""
+    message = b""
+    message_opcode = None
+    while True:
+        first, second = await reader.readexactly(2)
+        fin, opcode = first & 0x80, first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length + len(message) > MAX_BODY_BYTES:
+            raise HTTPError(413, "message too large")
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        if opcode >= 0x8:
+            return opcode, payload  # control frames are never fragmented
+        if opcode:
+            message_opcode = opcode
+        message += payload
+        if fin:
+            return message_opcode, message
+
+
+class JarvisServer:
+    """Serves one JarvisCore to many concurrent sessions."""
+    def __init__(self, core=None, host: str = "127.0.0.1", port: int = 8765, workers: int = 8,
+                 max_pending: int = 256, default_timeout: float = 60.0, max_timeout: float = 300.0,
+                 shutdown_timeout: float = 30.0, idle_timeout: float = 75.0):
+        if core is None:
+            from core.jarvis_core import JarvisCore
+            core = JarvisCore()
+        self.core = core
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.idle_timeout = idle_timeout
+        self.served = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._session_users: Dict[str, int] = {}
+        self._waiting = 0
+        self._active = 0
+        self._requests = set()
+        self._idle: Optional[asyncio.Event] = None
+        self._connections = set()
+        self._server = None
+        self._closing = False
+        self._stopped: Optional[asyncio.Event] = None
+
+    @contextlib.asynccontextmanager
+    async def _turn(self, session_id: str):
+        """Hold the session's ordering lock, then a worker slot"""
+        if self._closing:
+            raise HTTPError(503, "server is shutting down")
+        if self._waiting >= self.max_pending:
+            self.rejected += 1
+            raise HTTPError(503, "too many pending requests")
+        self._waiting += 1
+        waiting = True
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        self._session_users[session_id] = self._session_users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                async with self._slots:
+                    self._waiting -= 1
+                    waiting = False
+                    self._active += 1
+                    try:
+                        yield
+                    finally:
+                        self._active -= 1
+        finally:
+            if waiting:
+                self._waiting -= 1
+            self._session_users[session_id] -= 1
+            if not self._session_users[session_id]:
+                del self._session_users[session_id]
+                del self._session_locks[session_id]
+
+    @contextlib.contextmanager
+    def _tracked(self):
+        """Count a request as in flight so shutdown can wait for it"""
+        task = asyncio.current_task()
+        self._requests.add(task)
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._requests.discard(task)
+            if not self._requests:
+                self._idle.set()
+
+    def _timeout(self, requested) -> float:
+        if requested is None:
+            return self.default_timeout
+        try:
+            return max(0.001, min(float(requested), self.max_timeout))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "timeout must be a number of seconds")
+
+    async def reply(self, message: str, session_id: str, timeout: Optional[float] = None) -> str:
+        """Full reply, queued behind the session's earlier messages"""
+        async def run():
+            async with self._turn(session_id):
+                return await self.core.process_input(message, session_id)
+        try:
+            reply = await asyncio.wait_for(run(), self._timeout(timeout))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPError(504, "deadline exceeded")
+        self.served += 1
+        return reply
+
+    async def stream(self, message: str, session_id: str, timeout: Optional[float] = None):
+        """Reply chunks as they are generated; raises HTTPError(504) past the deadline"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._timeout(timeout)
+
+        def remaining():
+            left = deadline - loop.time()
+            if left <= 0:
+                self.timeouts += 1
+                raise HTTPError(504, "deadline exceeded")
+            return left
+
+        turn = self._turn(session_id)
+        try:
+            await asyncio.wait_for(turn.__aenter__(), remaining())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPError(504, "deadline exceeded")
+        chunks = self.core.stream_input(message, session_id).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining())
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise HTTPError(504, "deadline exceeded")
+                yield chunk
+            self.served += 1
+        finally:
+            await chunks.aclose()
+            await turn.__aexit__(None, None, None)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while not self._closing:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self.idle_timeout)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    return
+                except (asyncio.TimeoutError, ConnectionError):
+                    return
+                if request is None:
+                    return
+                if request.headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(request, reader, writer)
+                    return
+                try:
+                    with self._tracked():
+                        await self._dispatch(request, writer)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": str(e)}, request.keep_alive)
+                except ConnectionError:
+                    return
+                except Exception as e:
+                    print(f"Error handling {request.method} {request.path}: {e}")
+                    await send_json(writer, 500, {"error": "internal server error"}, keep_alive=False)
+                    return
+                if not request.keep_alive:
+                    return
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter):
+        parts = [unquote(part) for part in request.path.strip("/").split("/")]
+        if request.method == "GET" and parts == ["health"]:
+            await send_json(writer, 200, self.stats(), request.keep_alive)
+            return
+        if request.method == "GET" and parts == ["metrics"]:
+            await send_text(writer, 200, metrics.prometheus_text(),
+                            "text/plain; version=0.0.4; charset=utf-8", request.keep_alive)
+            return
+        if len(parts) != 4 or parts[:2] != ["v1", "sessions"] or not parts[2]:
+            raise HTTPError(404, "not found")
+        session_id, action = parts[2], parts[3]
+
+        if action == "messages" and request.method == "POST":
+            payload = request.json()
+            message = payload.get("message")
+            if not isinstance(message, str) or not message.strip():
+                raise HTTPError(400, "'message' must be a non-empty string")
+            if payload.get("stream"):
+                await self._send_stream(writer, message, session_id, payload.get("timeout"))
+            else:
+                reply = await self.reply(message, session_id, payload.get("timeout"))
+                await send_json(writer, 200, {"session_id": session_id, "reply": reply}, request.keep_alive)
+        elif action == "history" and request.method == "GET":
+            limit = self._int_param(request, "limit", 50, 1, 500)
+            before = self._int_param(request, "before", None, 1, None)
+            rows = []
+            async for row in self.core.memory.iter_history(session_id, before, page_size=limit):
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+            await send_json(writer, 200, {"session_id": session_id, "history": rows}, request.keep_alive)
+        elif action == "search" and request.method == "GET":
+            query = request.query.get("q", "")
+            limit = self._int_param(request, "limit", 5, 1, 100)
+            hits = await self.core.memory.search_context(query, session_id, limit)
+            await send_json(writer, 200, {"session_id": session_id, "results": hits}, request.keep_alive)
+        else:
+            raise HTTPError(404, "not found")
+
+    @staticmethod
+    def _int_param(request: Request, name: str, default, low, high):
+        value = request.query.get(name)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise HTTPError(400, f"'{name}' must be an integer")
+        if value < low or (high is not None and value > high):
+            raise HTTPError(400, f"'{name}' is out of range")
+        return value
+
+    async def _send_stream(self, writer, message, session_id, timeout):
+        chunks = self.stream(message, session_id, timeout)
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        # Errors before the first chunk still get a proper status code.
+        writer.write(_head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Transfer-Encoding": "chunked",
+        }))
+
+        async def event(payload):
+            data = f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+
+        parts = []
+        try:
+            if first is not None:
+                parts.append(first)
+                await event({"delta": first})
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    await event({"delta": chunk})
+            await event({"reply": "".join(parts), "done": True})
+        except HTTPError as e:
+            await event({"error": str(e), "status": e.status})
+        finally:
+            await chunks.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _websocket(self, request: Request, reader, writer):
+        key = request.headers.get("sec-websocket-key")
+        if not key:
+            await send_json(writer, 400, {"error": "missing Sec-WebSocket-Key"}, keep_alive=False)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest()).decode("ascii")
+        writer.write(_head(101, {"Upgrade": "websocket", "Connection": "Upgrade",
+                                 "Sec-WebSocket-Accept": accept}))
+        await writer.drain()
+
+        send_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(payload):
+            async with send_lock:
+                writer.write(ws_frame(json.dumps(payload).encode("utf-8")))
+                await writer.drain()
+
+        async def answer(message):
+            with self._tracked():
+                await respond(message)
+
+        async def respond(message):
+            request_id = message.get("id")
+            try:
+                text = message.get("message")
+                if not isinstance(text, str) or not text.strip():
+                    raise HTTPError(400, "'message' must be a non-empty string")
+                session_id = str(message.get("session_id") or "default")
+                parts = []
+                async for chunk in self.stream(text, session_id, message.get("timeout")):
+                    parts.append(chunk)
+                    await send({"id": request_id, "delta": chunk})
+                await send({"id": request_id, "reply": "".join(parts), "done": True})
+            except HTTPError as e:
+                await send({"id": request_id, "error": str(e), "status": e.status})
+            except ConnectionError:
+                pass
+
+        try:
+            while not self._closing:
+                opcode, payload = await ws_read(reader)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    async with send_lock:
+                        writer.write(ws_frame(payload, 0xA))
+                    continue
+                if opcode != 0x1:
+                    continue
+                try:
+                    message = json.loads(payload)
+                except ValueError:
+                    await send({"error": "frames must be JSON", "status": 400})
+                    continue
+                # Tasks start in arrival order, so per-session FIFO locks keep order.
+                task = asyncio.create_task(answer(message if isinstance(message, dict) else {}))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, HTTPError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+            with contextlib.suppress(Exception):
+                async with send_lock:
+                    writer.write(ws_frame(b"\x03\xe8", 0x8))
+                    await writer.drain()
+
+    def stats(self) -> Dict:
+        return {
+            "status": "closing" if self._closing else "ok",
+            "workers": self.workers,
+            "active": self._active,
+            "pending": self._waiting,
+            "sessions": len(self._session_locks),
+            "connections": len(self._connections),
+            "served": self.served,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "pending_writes": self.core.memory.pending_writes(),
+        }
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.workers)
+        self._stopped = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def shutdown(self):
+        """Stop accepting, drain in-flight replies, then flush memory"""
+        if self._closing:
+            await self._stopped.wait()
+            return
+        self._closing = True
+        self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            for task in list(self._requests):
+                task.cancel()
+        for writer in list(self._connections):
+            writer.close()
+        await asyncio.to_thread(self.core.memory.flush)
+        await asyncio.to_thread(self.core.close)
+        self._stopped.set()
+
+    async def serve_forever(self):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(signum, stop.set)
+        print(f"🚀 Jarvis server listening on http://{self.host}:{self.port}")
+        await stop.wait()
+        print("🛑 Shutting down: finishing in-flight replies and flushing memory...")
+        await self.shutdown()
+
+
+class JarvisClient:
+    """Thin blocking client for a running JarvisServer."""
+    def __init__(self, base_url: str, session_id: str = "default", timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.session_id = session_id
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _url(self, action: str) -> str:
+        return f"{self.base_url}/v1/sessions/{quote(self.session_id, safe='')}/{action}"
+
+    def send(self, message: str) -> str:
+        response = self.session.post(self._url("messages"), json={"message": message},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["reply"]
+
+    def stream(self, message: str) -> Iterator[str]:
+        with self.session.post(self._url("messages"), json={"message": message, "stream": True},
+                               stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                if "error" in event:
+                    raise RuntimeError(event["error"])
+                if "delta" in event:
+                    yield event["delta"]
+
+    def history(self, before: Optional[int] = None, limit: int = 50) -> List[Dict]:
+        params = {"limit": limit}
+        if before is not None:
+            params["before"] = before
+        response = self.session.get(self._url("history"), params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["history"]
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        response = self.session.get(self._url("search"), params={"q": query, "limit": limit},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["results"]
+
+    def close(self):
+        self.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Jarvis HTTP/WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8, help="replies generated concurrently")
+    parser.add_argument("--max-pending", type=int, default=256, help="queued messages before 503")
+    parser.add_argument("--timeout", type=float, default=60.0, help="default per-message deadline")
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = JarvisServer(host=args.host, port=args.port, workers=args.workers,
+                          max_pending=args.max_pending, default_timeout=args.timeout,
+                          shutdown_timeout=args.shutdown_timeout)
+    asyncio.run(server.serve_forever())
@@ -1,6 +1,9 @@
 import streamlit as st
 import asyncio
+import os
+import uuid
 from core.jarvis_core import JarvisCore
+from jarvis_server import JarvisClient
 
 async def main():
     st.set_page_config(
@@ -11,9 +14,14 @@ async def main():
     
     st.title("🤖 Jarvis AI Assistant")
     
-    # Initialize Jarvis if not already done
+    # Initialize Jarvis if not already done. With JARVIS_SERVER_URL set this UI
+    # is a thin client of jarvis_server.py, one server session per browser tab.
     if 'jarvis' not in st.session_state:
-        st.session_state.jarvis = JarvisCore()
+        server_url = os.getenv("JARVIS_SERVER_URL")
+        if server_url:
+            st.session_state.jarvis = JarvisClient(server_url, session_id=uuid.uuid4().hex)
+        else:
+            st.session_state.jarvis = JarvisCore()
         st.session_state.messages = []
 
     # Chat input
@@ -21,7 +29,11 @@ async def main():
     
     if user_input:
         with st.spinner('Processing...'):
-            response = await st.session_state.jarvis.process_input(user_input)
+            jarvis = st.session_state.jarvis
+            if isinstance(jarvis, JarvisClient):
+                response = await asyncio.to_thread(jarvis.send, user_input)
+            else:
+                response = await jarvis.process_input(user_input)
             st.session_state.messages.append({"role": "user", "content": user_input})
             st.session_state.messages.append({"role": "assistant", "content": response})
 
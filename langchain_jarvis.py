@@ -1,15 +1,15 @@
 import os
-from dotenv import load_dotenv
-from langchain_openai import OpenAI  # ✅ Final updated import
+from config_store import load_env
 
 # Load environment variables
-load_dotenv()
+load_env()
 api_key = os.getenv("OPENAI_API_KEY")
 
 def create_langchain_instance():
     if not api_key:
         raise ValueError("❌ OPENAI_API_KEY not found. Make sure your .env file is in the root directory.")
 
+    from langchain_openai import OpenAI  # ✅ Final updated import (deferred: slow to import)
     return OpenAI(api_key=api_key)  # ✅ Updated parameter name
 
 if __name__ == "__main__":
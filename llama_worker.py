@@ -0,0 +1,264 @@
+"""
+Resident local-model worker.
+
+Instead of launching `llama-chat` (and re-loading the weights) for every
+message, one long-lived process loads the model once and answers prompts
+sent over its stdin/stdout as JSON lines:
+
+    -> {"id": 1, "prompt": "...", "system_prompt": "...", "history": [["user", "..."], ...],
+        "max_tokens": 2048, "temperature": 0.7, "repeat_penalty": 1.1, "stream": false}
+    <- {"id": 1, "delta": "..."}             (only when "stream" is true)
+    <- {"id": 1, "text": "...", "done": true}
+    <- {"id": 1, "error": "..."}
+
+The process prints {"ready": true} once the model is loaded. `LlamaWorker`
+is the client side: it starts the process, restarts it if it dies and
+retries the request that was in flight.
+
+Run the server side with:  python llama_worker.py --serve -m model.gguf
+"""
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_SYSTEM_PROMPT = "You are Jarvis, an AI assistant. Respond as if you were Tony Stark's AI."
+
+
+class LlamaWorkerError(RuntimeError):
+    """The worker process failed, timed out or reported an error"""
+
+
+def build_prompt(prompt, system_prompt=None, history=None):
+    """The prompt layout llama-chat was driven with; the system part is a constant prefix.
+
+    `history` is a list of [role, content] pairs placed between the system
+    prompt and the new message (system entries, such as a summary, verbatim).
+    """
+    parts = [system_prompt or DEFAULT_SYSTEM_PROMPT]
+    for role, content in history or []:
+        if role == "system":
+            parts.append(content)
+        else:
+            parts.append(f"{'User' if role == 'user' else 'Jarvis'}: {content}")
+    parts.append(f"User: {prompt}\n\nJarvis:")
+    return "\n\n".join(parts)
+
+
+class LlamaWorker:
+    """Client for a resident model process speaking the JSON-lines protocol."""
+    def __init__(self, command, startup_timeout=120.0, request_timeout=300.0,
+                 max_restarts=5, restart_backoff=0.5):
+        self.command = list(command)
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.restarts = 0
+        self._failures = 0
+        self._process = None
+        self._lines = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._read_stdout,
+            args=(self._process.stdout, self._lines),
+            name="llama-worker-stdout",
+            daemon=True,
+        ).start()
+        message = self._read_message(self.startup_timeout)
+        if not message.get("ready"):
+            raise LlamaWorkerError(f"Worker failed to start: {message}")
+
+    @staticmethod
+    def _read_stdout(stdout, lines):
+        for line in stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def _read_message(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._kill()
+                raise LlamaWorkerError("Timed out waiting for the model worker")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                raise BrokenPipeError("Model worker exited")
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return json.loads(line)
+            except json.JSONDecodeError:
+                continue  # stray output from the model library
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def _ensure_running(self):
+        if self._process is not None and self._process.poll() is None:
+            return
+        if self._process is not None:
+            self._on_crash()  # died between requests
+        self._start()
+
+    def _on_crash(self):
+        """Reap a dead worker and back off before it is started again"""
+        self._kill()
+        self.restarts += 1
+        self._failures += 1
+        if self._failures > self.max_restarts:
+            raise LlamaWorkerError("Model worker keeps crashing; giving up")
+        time.sleep(self.restart_backoff * self._failures)
+
+    def _send(self, request):
+        self._next_id += 1
+        request["id"] = self._next_id
+        self._process.stdin.write(json.dumps(request) + "\n")
+        self._process.stdin.flush()
+        return self._next_id
+
+    def _messages(self, request):
+        request_id = self._send(request)
+        while True:
+            message = self._read_message(self.request_timeout)
+            if message.get("id") != request_id:
+                continue
+            if "error" in message:
+                raise LlamaWorkerError(message["error"])
+            yield message
+            if message.get("done"):
+                return
+
+    def generate(self, prompt, system_prompt=None, **params):
+        """Generate a full reply, restarting the worker and retrying once on a crash"""
+        request = {"prompt": prompt, "system_prompt": system_prompt, "stream": False, **params}
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    self._ensure_running()
+                    for message in self._messages(dict(request)):
+                        if message.get("done"):
+                            self._failures = 0
+                            return message["text"]
+                except (BrokenPipeError, OSError):
+                    if attempt:
+                        self._kill()
+                        raise LlamaWorkerError("Model worker crashed while generating")
+                    self._on_crash()
+
+    def stream(self, prompt, system_prompt=None, **params):
+        """Yield reply text as the worker produces it"""
+        request = {"prompt": prompt, "system_prompt": system_prompt, "stream": True, **params}
+        with self._lock:
+            try:
+                self._ensure_running()
+                for message in self._messages(request):
+                    if "delta" in message:
+                        yield message["delta"]
+                self._failures = 0
+            except (BrokenPipeError, OSError):
+                self._kill()
+                raise LlamaWorkerError("Model worker crashed while generating")
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def default_command(model_path):
+    return [sys.executable, os.path.abspath(__file__), "--serve", "-m", model_path]
+
+
+def get_worker(model_path, command=None):
+    """Process-wide resident worker for a model (started on first use)"""
+    command = tuple(command or default_command(model_path))
+    with _workers_lock:
+        worker = _workers.get(command)
+        if worker is None:
+            worker = _workers[command] = LlamaWorker(command)
+        return worker
+
+
+def serve(model_path, n_ctx=2048):
+    """Load the model once and answer JSON-line requests on stdin until EOF"""
+    from llama_cpp import Llama, LlamaRAMCache
+
+    llm = Llama(model_path=model_path, n_ctx=n_ctx, verbose=False)
+    # Keeps the evaluated system-prompt prefix around between requests.
+    llm.set_cache(LlamaRAMCache())
+    print(json.dumps({"ready": True, "model": model_path}), flush=True)
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        try:
+            kwargs = {
+                "max_tokens": request.get("max_tokens", 2048),
+                "temperature": request.get("temperature", 0.7),
+                "repeat_penalty": request.get("repeat_penalty", 1.1),
+                "stop": ["User:"],
+            }
+            full_prompt = build_prompt(request["prompt"], request.get("system_prompt"),
+                                       request.get("history"))
+            if request.get("stream"):
+                parts = []
+                for chunk in llm(full_prompt, stream=True, **kwargs):
+                    delta = chunk["choices"][0]["text"]
+                    parts.append(delta)
+                    print(json.dumps({"id": request["id"], "delta": delta}), flush=True)
+                text = "".join(parts)
+            else:
+                text = llm(full_prompt, **kwargs)["choices"][0]["text"]
+            print(json.dumps({"id": request["id"], "text": text.strip(), "done": True}), flush=True)
+        except Exception as e:
+            print(json.dumps({"id": request.get("id"), "error": str(e)}), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident Jarvis local-model worker")
+    parser.add_argument("--serve", action="store_true", help="run the worker loop on stdin/stdout")
+    parser.add_argument("-m", "--model", required=True, help="path to the model weights")
+    parser.add_argument("--ctx", type=int, default=2048, help="context window size")
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.model, args.ctx)
+    else:
+        worker = get_worker(args.model)
+        print(worker.generate("Hello Jarvis, are you running locally?"))
+        worker.close()
@@ -0,0 +1,178 @@
+"""
+Micro-batching in front of the local model.
+
+Concurrent prompts for the local backend are collected for a short window
+(`batch_window`, or until `max_batch_size` are waiting) and sent as one
+batched request; each caller gets its own reply through a Future. Batches
+are filled round-robin across sessions so one chatty session cannot starve
+the others, and no request is held back for batching longer than
+`max_wait` seconds. When a batch is rejected because of its contents
+(a 4xx reply, or an error from a plain `run_batch` function), its prompts
+are retried one by one so only the offending request fails.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from utils.backend_client import BackendError, get_client
+
+
+class _Request:
+    __slots__ = ("prompt", "params", "params_key", "future", "enqueued")
+
+    def __init__(self, prompt, params):
+        self.prompt = prompt
+        self.params = params
+        self.params_key = json.dumps(params, sort_keys=True)
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+def _request_specific(error: Exception) -> bool:
+    """Whether a failed batch may have failed because of one of its prompts
+
+    Server and connection failures (5xx, 429, no status) would hit every
+    prompt alike, so those fail the whole batch without a retry.
+    """
+    if isinstance(error, BackendError):
+        return error.status is not None and 400 <= error.status < 500 and error.status != 429
+    return True
+
+
+class BatchScheduler:
+    """Groups concurrent prompts into calls of `run_batch(prompts, params) -> replies`.
+
+    Only prompts with identical generation parameters share a batch. One
+    batch is in flight at a time; prompts arriving meanwhile form the next.
+    """
+    def __init__(self, run_batch: Callable[[List[str], Dict], List[str]],
+                 max_batch_size: int = 8, batch_window: float = 0.005, max_wait: float = 0.05,
+                 name: str = "local"):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._dispatch, name=f"jarvis-batch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, session_id: str = "default", **params) -> Future:
+        """Queue a prompt; the Future resolves to its reply text"""
+        request = _Request(prompt, params)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed")
+            queue = self._queues.get(session_id)
+            if queue is None:
+                queue = self._queues[session_id] = deque()
+            queue.append(request)
+            self._pending += 1
+            self._cond.notify()
+        return request.future
+
+    def generate(self, prompt: str, session_id: str = "default", timeout: Optional[float] = None,
+                 **params) -> str:
+        return self.submit(prompt, session_id, **params).result(timeout)
+
+    def _oldest(self) -> float:
+        return min(queue[0].enqueued for queue in self._queues.values())
+
+    def _take_batch(self) -> List[_Request]:
+        """One request per session per round, oldest-waiting session first"""
+        batch: List[_Request] = []
+        params_key = min(self._queues.values(), key=lambda q: q[0].enqueued)[0].params_key
+        served = []
+        progress = True
+        while progress and len(batch) < self.max_batch_size:
+            progress = False
+            for session_id, queue in self._queues.items():
+                if len(batch) >= self.max_batch_size:
+                    break
+                if queue and queue[0].params_key == params_key:
+                    batch.append(queue.popleft())
+                    served.append(session_id)
+                    progress = True
+        # Sessions that were just served go to the back of the line.
+        for session_id in dict.fromkeys(served):
+            if self._queues[session_id]:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+        self._pending -= len(batch)
+        return batch
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = min(time.monotonic() + self.batch_window, self._oldest() + self.max_wait)
+                while self._pending < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                self.batches += 1
+                self.requests += len(batch)
+            self._run(batch)
+
+    def _run(self, batch: List[_Request]):
+        try:
+            replies = self.run_batch([request.prompt for request in batch], batch[0].params)
+            if len(replies) != len(batch):
+                raise RuntimeError(f"expected {len(batch)} replies, got {len(replies)}")
+        except Exception as e:
+            if len(batch) > 1 and _request_specific(e):
+                for request in batch:
+                    self._run([request])
+                return
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, reply in zip(batch, replies):
+            request.future.set_result(reply)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "pending": self._pending,
+            }
+
+    def close(self):
+        """Stop accepting prompts; queued ones are still answered"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+_schedulers: Dict[tuple, BatchScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_batch_scheduler(base_url: str, model: Optional[str] = None, **kwargs) -> BatchScheduler:
+    """Process-wide scheduler batching raw prompts to `base_url`'s /v1/completions"""
+    key = (base_url.rstrip("/"), model)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            client = get_client(base_url)
+            scheduler = _schedulers[key] = BatchScheduler(
+                lambda prompts, params: client.complete_batch(prompts, model, **params),
+                name=model or "local", **kwargs
+            )
+        return scheduler
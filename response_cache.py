@@ -0,0 +1,178 @@
+"""
+Two-tier cache for chat() replies.
+
+Repeated prompts (greetings, status checks, FAQs) are answered from an
+in-memory LRU, backed by a SQLite file so hits survive restarts and are
+shared between the Streamlit front ends. Keys combine the model, the
+normalized prompt, a hash of the trimmed history window and the sampling
+temperature.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.storage import SQLiteEngine
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / "data" / "cache" / "responses.db"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip(" ?!.")
+
+
+def make_key(model: str, prompt: str, history: Optional[List[Dict]] = None,
+             temperature: float = 0.7, history_window: int = 10) -> str:
+    """Cache key for a prompt in the context of the last `history_window` messages"""
+    history = list(history or [])
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == prompt:
+        history = history[:-1]
+    window = [(m.get("role"), m.get("content")) for m in history[-history_window:]] if history_window else []
+    history_hash = hashlib.sha256(json.dumps(window).encode("utf-8")).hexdigest()
+    raw = json.dumps([model.lower(), normalize_prompt(prompt), history_hash, round(temperature, 3)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of an on-disk SQLite tier, both with a TTL."""
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_entries: int = 512,
+                 max_disk_bytes: int = 64 * 1024 * 1024, ttl: float = 24 * 3600,
+                 history_window: int = 10):
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.history_window = history_window
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.engine = SQLiteEngine(path, readers=2, durability="group")
+        self.engine.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT,
+                latency REAL,
+                created REAL,
+                last_access REAL,
+                size INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+        """)
+        self._writes_since_trim = 0
+
+    def key(self, model: str, prompt: str, history: Optional[List[Dict]] = None,
+            temperature: float = 0.7) -> str:
+        return make_key(model, prompt, history, temperature, self.history_window)
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached reply or None; counts hits, misses and latency saved"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, latency, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += latency
+                    return response
+                del self._memory[key]
+
+        rows = self.engine.read(
+            "SELECT response, latency, created FROM responses WHERE key = ? AND created >= ?",
+            (key, now - self.ttl)
+        )
+        with self._lock:
+            if not rows:
+                self.misses += 1
+                return None
+            response, latency, created = rows[0]
+            self.hits += 1
+            self.disk_hits += 1
+            self.saved_seconds += latency or 0.0
+            self._remember(key, (response, latency or 0.0, created))
+        self.engine.write("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return response
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, response: str, latency: float = 0.0):
+        """Store a reply along with how long it took to produce"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, (response, latency, now))
+            self._writes_since_trim += 1
+            trim = self._writes_since_trim >= 100
+            if trim:
+                self._writes_since_trim = 0
+        self.engine.write(
+            """INSERT OR REPLACE INTO responses (key, response, latency, created, last_access, size)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (key, response, latency, now, now, len(response.encode("utf-8")) + len(key))
+        )
+        if trim:
+            self.trim()
+
+    def trim(self):
+        """Drop expired rows, then least-recently-used rows beyond max_disk_bytes"""
+        with self.engine.transaction() as conn:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_disk_bytes:
+                return
+            excess = total - self.max_disk_bytes
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with self.engine.transaction() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": self.saved_seconds,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        self.engine.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache shared by chat() and the Streamlit front ends"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,261 @@
+"""
+Latency-aware routing across chat backends.
+
+`BackendRouter.route` sends a prompt to the fastest healthy backend (by
+rolling median latency, penalised by recent errors). If that backend has
+not answered by its own p95, a hedged duplicate goes to the next-best
+backend and whichever succeeds first wins. A backend that fails
+`failure_threshold` times in a row is tripped open by its circuit breaker
+and skipped until `reset_timeout` has passed; then a single half-open probe
+decides whether it closes again.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RouterError(Exception):
+    """Every candidate backend failed or the deadline passed"""
+
+
+class LatencyTracker:
+    """Rolling window of latencies and outcomes for one backend."""
+    def __init__(self, window: int = 100):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._sorted: Optional[List[float]] = None
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency)
+                self._sorted = None
+
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency at percentile `p` (0-100) of successful calls, None without data"""
+        with self._lock:
+            if not self._latencies:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._latencies)
+            data = self._sorted
+        index = min(len(data) - 1, max(0, int(round(p / 100.0 * (len(data) - 1)))))
+        return data[index]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return 1.0 - sum(self._outcomes) / len(self._outcomes)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open single probe."""
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a call could be admitted now (does not claim the probe)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.reset_timeout
+            return not self._probing
+
+    def allow(self) -> bool:
+        """Admit a call; in half-open state only one probe is in flight"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class _Backend:
+    __slots__ = ("name", "call", "tracker", "breaker", "requests", "wins")
+
+    def __init__(self, name, call, tracker, breaker):
+        self.name = name
+        self.call = call
+        self.tracker = tracker
+        self.breaker = breaker
+        self.requests = 0
+        self.wins = 0
+
+
+class BackendRouter:
+    """Routes each prompt to the fastest healthy backend, hedging slow ones.
+
+    `backends` maps a name to `call(prompt, chat_history, session_id) -> str`,
+    which must raise on failure. Until a backend has `min_samples`
+    successful calls its hedge delay is `default_hedge_delay`.
+
+    Calls are blocking, so a losing call that has already started cannot be
+    interrupted: it runs to completion on one of the `max_workers` threads
+    (its latency still feeds the tracker and breaker). Losers still queued
+    for a thread are cancelled when `route` returns.
+    """
+    def __init__(self, backends: Dict[str, Callable], window: int = 100,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 default_hedge_delay: float = 2.0, min_hedge_delay: float = 0.05,
+                 min_samples: int = 5, timeout: float = 120.0, max_workers: int = 8):
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.hedges = 0
+        self._backends = {
+            name: _Backend(name, call, LatencyTracker(window),
+                           CircuitBreaker(failure_threshold, reset_timeout))
+            for name, call in backends.items()
+        }
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jarvis-router")
+
+    def _score(self, backend: _Backend) -> float:
+        median = backend.tracker.percentile(50)
+        if median is None:
+            return 0.0  # untried backends go first so they get measured
+        return median * (1.0 + 4.0 * backend.tracker.error_rate())
+
+    def _hedge_delay(self, backend: _Backend) -> float:
+        if backend.tracker.samples() < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, backend.tracker.percentile(95))
+
+    def ranked(self, names: Optional[Sequence[str]] = None) -> List[str]:
+        """Candidate backends, best first; tripped breakers are left out"""
+        backends = [self._backends[n] for n in (names or self._backends) if n in self._backends]
+        healthy = [b for b in backends if b.breaker.available()]
+        return [b.name for b in sorted(healthy, key=self._score)]
+
+    def _run(self, backend: _Backend, prompt, chat_history, session_id):
+        started = time.perf_counter()
+        try:
+            reply = backend.call(prompt, list(chat_history) if chat_history else chat_history, session_id)
+        except Exception:
+            backend.tracker.record(time.perf_counter() - started, False)
+            backend.breaker.record_failure()
+            raise
+        backend.tracker.record(time.perf_counter() - started, True)
+        backend.breaker.record_success()
+        return reply
+
+    def _launch(self, queue: List[str], in_flight: Dict, prompt, chat_history, session_id) -> Optional[_Backend]:
+        while queue:
+            backend = self._backends[queue.pop(0)]
+            if not backend.breaker.allow():
+                continue
+            with self._lock:
+                backend.requests += 1
+            future = self._executor.submit(metrics.bind(self._run), backend, prompt, chat_history, session_id)
+            in_flight[future] = backend
+            return backend
+        return None
+
+    def route(self, prompt: str, chat_history=None, session_id: str = "default",
+              names: Optional[Sequence[str]] = None) -> Tuple[str, str]:
+        """(backend name, reply) from the first backend to answer successfully"""
+        queue = self.ranked(names)
+        if not queue:
+            raise RouterError("no healthy backend available")
+        deadline = time.monotonic() + self.timeout
+        in_flight: Dict = {}
+        try:
+            return self._race(queue, in_flight, deadline, prompt, chat_history, session_id)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _race(self, queue: List[str], in_flight: Dict, deadline: float,
+              prompt, chat_history, session_id) -> Tuple[str, str]:
+        errors = []
+        newest = self._launch(queue, in_flight, prompt, chat_history, session_id)
+        hedge_at = time.monotonic() + self._hedge_delay(newest) if newest else deadline
+
+        while in_flight:
+            now = time.monotonic()
+            if now >= deadline:
+                raise RouterError(f"no reply within {self.timeout:g}s")
+            timeout = min(deadline, hedge_at if queue else deadline) - now
+            done, _ = wait(list(in_flight), timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = in_flight.pop(future)
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    errors.append(f"{backend.name}: {e}")
+                    continue
+                with self._lock:
+                    backend.wins += 1
+                return backend.name, reply
+
+            launch_next = (not in_flight) or (not done and time.monotonic() >= hedge_at)
+            if launch_next and queue:
+                hedging = bool(in_flight)
+                newest = self._launch(queue, in_flight, prompt, chat_history, session_id)
+                if newest is not None:
+                    if hedging:
+                        with self._lock:
+                            self.hedges += 1
+                    hedge_at = time.monotonic() + self._hedge_delay(newest)
+
+        raise RouterError("; ".join(errors) or "no healthy backend available")
+
+    def stats(self) -> Dict:
+        stats = {"hedges": self.hedges, "backends": {}}
+        for backend in self._backends.values():
+            stats["backends"][backend.name] = {
+                "state": backend.breaker.state,
+                "requests": backend.requests,
+                "wins": backend.wins,
+                "error_rate": backend.tracker.error_rate(),
+                "p50": backend.tracker.percentile(50),
+                "p95": backend.tracker.percentile(95),
+                "p99": backend.tracker.percentile(99),
+            }
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False)
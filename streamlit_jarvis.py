@@ -1,12 +1,20 @@
 import streamlit as st
-import os
-import json
+import asyncio
 import sys
+import queue
+import threading
+import time
 from pathlib import Path
 
 # Import your modules
-from chat import chat, get_config
-from voice import text_to_speech, recognize_speech
+from chat import chat_stream, forget_session, get_config
+from config_store import ConfigError, get_config_store
+from transcript import Transcript
+from utils import metrics
+from utils.lazy import lazy_import
+
+# Speech libraries load only once voice input/output is actually used.
+voice = lazy_import("voice")
 
 # Page configuration
 st.set_page_config(
@@ -15,66 +23,188 @@ st.set_page_config(
     layout="wide"
 )
 
+# Per-backend time limits in compare mode (seconds)
+BACKEND_TIMEOUTS = {"openai": 60.0, "llama": 120.0}
+BACKEND_LABELS = {"openai": "OpenAI", "llama": "Llama"}
+MODEL_CHOICES = ("OpenAI", "Llama", "Compare")
+
 # Load and save configuration
 def save_config(config_data):
     try:
-        config_path = os.path.join(os.path.dirname(__file__), "config.json")
-        with open(config_path, "w") as f:
-            json.dump(config_data, f, indent=4)
+        get_config_store().save(config_data)
         return True
-    except Exception as e:
+    except (ConfigError, OSError) as e:
         st.error(f"Error saving config: {e}")
         return False
 
 # Initialize session state
-if "openai_messages" not in st.session_state:
-    st.session_state.openai_messages = []
-if "llama_messages" not in st.session_state:
-    st.session_state.llama_messages = []
+# One shared list of turns; each column renders only its recent window.
+if "transcript" not in st.session_state:
+    st.session_state.transcript = Transcript()
 if "active_model" not in st.session_state:
     st.session_state.active_model = "OpenAI"
-if "config" not in st.session_state:
-    st.session_state.config = get_config()
+# Cheap after the first load; picks up edits made by other processes.
+st.session_state.config = get_config()
 if "voice_output" not in st.session_state:
     st.session_state.voice_output = False
 if "text_input" not in st.session_state:
     st.session_state.text_input = ""
+if "pending_input" not in st.session_state:
+    st.session_state.pending_input = None
+if "last_stats" not in st.session_state:
+    st.session_state.last_stats = None
+if "last_latencies" not in st.session_state:
+    st.session_state.last_latencies = {}
+
+def render_message(message):
+    st.markdown(f"**{'You' if message['role'] == 'user' else 'Jarvis'}:** {message['content']}")
+
+@st.cache_resource
+def get_memory():
+    """JarvisMemory holding finished turns, shared across reruns and sessions"""
+    from core.jarvis_core import JarvisMemory
+    return JarvisMemory.open(Path(__file__).resolve().parent)
+
+def record_turn(turn, primary):
+    """Persist a finished turn and fold the transcript back to its window"""
+    transcript = st.session_state.transcript
+    try:
+        with metrics.span("memory.store"):
+            asyncio.run(transcript.persist(get_memory(), turn, primary))
+    except Exception as e:
+        print(f"❌ Error saving turn: {e}")
+    transcript.trim()
+
+def open_stream(backend, user_input):
+    """Reply stream for `backend`; nothing is sent until it is iterated."""
+    # Each browser session keeps its own rolling summary in context_builder.
+    transcript = st.session_state.transcript
+    return chat_stream(user_input, backend, transcript.messages(backend),
+                       session_id=transcript.session_id)
 
 # Process user input
-def process_user_input(user_input):
-    user_message = {"role": "user", "content": user_input}
-    st.session_state.openai_messages.append(user_message)
-    st.session_state.llama_messages.append(user_message)
-    
+def process_user_input(user_input, placeholder=None):
+    """Send the prompt to the active model, streaming the reply into `placeholder`."""
     active_model = st.session_state.active_model.lower()
+    with metrics.span("ui.turn", model=active_model):
+        try:
+            stream = open_stream(active_model, user_input)
+            chunks = stream
+            if st.session_state.voice_output:
+                # A new message cuts off whatever Jarvis was still saying.
+                speaker = voice.get_speaker()
+                speaker.interrupt()
+                chunks = speaker.speak_stream(stream)
+            for _ in chunks:
+                if placeholder is not None:
+                    placeholder.markdown(f"**Jarvis:** {stream.text}▌")
+            response = stream.text
+            st.session_state.last_stats = stream.stats.summary()
+        except Exception as e:
+            response = f"Error getting response: {str(e)}"
+        if placeholder is not None:
+            placeholder.markdown(f"**Jarvis:** {response}")
+
+        turn = st.session_state.transcript.add(user_input)
+        turn.set_reply(active_model, response)
+        record_turn(turn, active_model)
+
+def _pump(backend, stream, events, cancelled):
+    """Worker thread: forward the chunks of `stream` to the script thread."""
     try:
-        if active_model == "openai":
-            response = chat(user_input, "openai", st.session_state.openai_messages)
-        else:
-            response = chat(user_input, "llama")
+        for chunk in stream:
+            if cancelled.is_set():
+                return
+            events.put((backend, "chunk", chunk))
+        events.put((backend, "done", stream.stats.summary()))
     except Exception as e:
-        response = f"Error getting response: {str(e)}"
-    
-    assistant_message = {"role": "assistant", "content": response}
-    if active_model == "openai":
-        st.session_state.openai_messages.append(assistant_message)
-        st.session_state.llama_messages.append({"role": "assistant", "content": "[OpenAI was used]"})
-    else:
-        st.session_state.llama_messages.append(assistant_message)
-        st.session_state.openai_messages.append({"role": "assistant", "content": "[Llama was used]"})
+        events.put((backend, "error", str(e)))
+    finally:
+        # Releases the backend (the llama worker is locked while it streams).
+        stream.close()
+
+def compare_user_input(user_input, placeholders, timeouts=BACKEND_TIMEOUTS):
+    """Send the prompt to both backends at once.
+
+    `placeholders` maps each backend to a (reply, caption) pair of st.empty()
+    slots. Streamlit calls stay on this thread; the worker threads only feed
+    a queue, so each column fills as its backend streams and the turn takes
+    as long as the slower backend (or its timeout), not the sum of both.
 
+    Each backend gets its own daemon thread rather than a shared pool: a
+    thread blocked on a stalled backend cannot be interrupted, and once its
+    turn has timed out it must not hold up later turns.
+    """
     if st.session_state.voice_output:
-        text_to_speech(response)
+        voice.get_speaker().interrupt()
+    streams = {backend: open_stream(backend, user_input) for backend in placeholders}
+
+    events = queue.Queue()
+    cancelled = threading.Event()
+    started = time.perf_counter()
+    for backend, stream in streams.items():
+        threading.Thread(target=metrics.bind(_pump), args=(backend, stream, events, cancelled),
+                         name=f"jarvis-compare-{backend}", daemon=True).start()
+
+    texts = {backend: "" for backend in streams}
+    results = {}
+    answered = []
+    while len(results) < len(streams):
+        now = time.perf_counter()
+        for backend in streams:
+            if backend not in results and now - started >= timeouts[backend]:
+                partial = texts[backend] + " …" if texts[backend] else ""
+                results[backend] = (partial or f"No reply within {timeouts[backend]:g}s",
+                                    f"timed out after {timeouts[backend]:g}s")
+                placeholders[backend][0].markdown(f"**Jarvis:** {results[backend][0]}")
+                placeholders[backend][1].caption(f"⏱️ {results[backend][1]}")
+        if len(results) == len(streams):
+            break
+        wait = min(started + timeouts[b] for b in streams if b not in results) - now
+        try:
+            backend, kind, payload = events.get(timeout=max(wait, 0.01))
+        except queue.Empty:
+            continue
+        if backend in results:
+            continue
+        elapsed = time.perf_counter() - started
+        if kind == "chunk":
+            texts[backend] += payload
+            placeholders[backend][0].markdown(f"**Jarvis:** {texts[backend]}▌")
+            continue
+        if kind == "done":
+            results[backend] = (texts[backend], f"{elapsed:.2f}s · {payload}")
+            if streams[backend].error is None:
+                answered.append(backend)
+        else:
+            results[backend] = (f"Error getting response: {payload}", f"failed after {elapsed:.2f}s")
+        placeholders[backend][0].markdown(f"**Jarvis:** {results[backend][0]}")
+        placeholders[backend][1].caption(f"⏱️ {results[backend][1]}")
+    # Streams that timed out stop at their next chunk.
+    cancelled.set()
+
+    wall = time.perf_counter() - started
+    turn = st.session_state.transcript.add(user_input)
+    for backend, (text, _) in results.items():
+        turn.set_reply(backend, text)
+    # The stored response is the first complete reply, in column order.
+    primary = next((backend for backend in streams if backend in answered), next(iter(streams)))
+    record_turn(turn, primary)
+    st.session_state.last_latencies = {backend: meta for backend, (_, meta) in results.items()}
+    st.session_state.last_stats = f"compare took {wall:.2f}s wall-clock"
+
+    if st.session_state.voice_output:
+        voice.get_speaker().speak(results[primary][0])
 
 # Voice input
 def handle_voice_input():
     try:
         st.session_state.listening = True
-        user_input = recognize_speech()
+        user_input = voice.recognize_speech()
         st.session_state.listening = False
         if user_input:
-            process_user_input(user_input)
-            st.experimental_rerun()
+            st.session_state.pending_input = user_input
+            st.rerun()
     except Exception as e:
         st.error(f"Error with voice input: {str(e)}")
         st.session_state.listening = False
@@ -88,8 +218,8 @@ def main():
     with st.sidebar:
         st.title("Controls")
         st.subheader("Model Selection")
-        model_choice = st.radio("Choose AI Model:", ("OpenAI", "Llama"),
-                                index=0 if st.session_state.active_model == "OpenAI" else 1)
+        model_choice = st.radio("Choose AI Model:", MODEL_CHOICES,
+                                index=MODEL_CHOICES.index(st.session_state.active_model))
         if model_choice != st.session_state.active_model:
             st.session_state.active_model = model_choice
             st.success(f"Switched to {model_choice} model")
@@ -98,6 +228,8 @@ def main():
         voice_output = st.checkbox("Enable Voice Output", value=st.session_state.voice_output)
         if voice_output != st.session_state.voice_output:
             st.session_state.voice_output = voice_output
+            if not voice_output and voice.loaded:
+                voice.get_speaker().interrupt()
 
         st.subheader("Configuration")
         with st.expander("API Settings"):
@@ -112,30 +244,61 @@ def main():
                     st.success("Settings saved successfully!")
 
         if st.button("Clear Chat History"):
-            st.session_state.openai_messages = []
-            st.session_state.llama_messages = []
+            forget_session(st.session_state.transcript.session_id)
+            st.session_state.transcript.clear()
+            st.session_state.last_latencies = {}
             st.success("Chat history cleared")
 
+    # Older turns are paged in from memory only when asked for
+    transcript = st.session_state.transcript
+    if transcript.has_older and st.button("⬆️ Load older messages"):
+        try:
+            asyncio.run(transcript.load_older(get_memory()))
+        except Exception as e:
+            st.error(f"Error loading older messages: {str(e)}")
+        st.rerun()
+
     # Dual chat columns
     col1, col2 = st.columns(2)
-    with col1:
-        st.header("OpenAI Chat")
-        for message in st.session_state.openai_messages:
-            st.markdown(f"**{'You' if message['role'] == 'user' else 'Jarvis'}:** {message['content']}")
-    with col2:
-        st.header("Llama Chat")
-        for message in st.session_state.llama_messages:
-            st.markdown(f"**{'You' if message['role'] == 'user' else 'Jarvis'}:** {message['content']}")
+    columns = {"openai": col1, "llama": col2}
+    for backend, column in columns.items():
+        with column:
+            st.header(f"{BACKEND_LABELS[backend]} Chat")
+            if transcript.turns:
+                st.markdown(transcript.render(backend))
+            if backend in st.session_state.last_latencies:
+                st.caption(f"⏱️ {st.session_state.last_latencies[backend]}")
+
+    # Stream the pending reply into the active model's column (or both)
+    pending_input = st.session_state.pending_input
+    if pending_input:
+        st.session_state.pending_input = None
+        if st.session_state.active_model == "Compare":
+            placeholders = {}
+            for backend, column in columns.items():
+                with column:
+                    render_message({"role": "user", "content": pending_input})
+                    placeholders[backend] = (st.empty(), st.empty())
+            with metrics.span("ui.compare"):
+                compare_user_input(pending_input, placeholders)
+        else:
+            st.session_state.last_latencies = {}
+            with col1 if st.session_state.active_model == "OpenAI" else col2:
+                render_message({"role": "user", "content": pending_input})
+                process_user_input(pending_input, st.empty())
+        st.rerun()
 
     st.write("---")
-    st.info(f"Active Model: {st.session_state.active_model}")
+    status = f"Active Model: {st.session_state.active_model}"
+    if st.session_state.last_stats:
+        status += f" · last reply: {st.session_state.last_stats}"
+    st.info(status)
 
     # Input + Voice
     def submit_and_clear():
         if st.session_state.text_input:
-            process_user_input(st.session_state.text_input)
+            st.session_state.pending_input = st.session_state.text_input
             st.session_state.text_input = ""
-            st.rerun()
 
     col1, col2 = st.columns([7, 1])
     with col1:
@@ -1,42 +1,29 @@
-import requests
-import json
 import sys
 from pathlib import Path
+from utils.backend_client import BackendError, get_client
 
 def test_llama_connection():
     """Test LM Studio Llama connection"""
     print("🔄 Testing LM Studio connection...\n")
     
-    url = "http://127.0.0.1:1234/v1/chat/completions"
-    headers = {"Content-Type": "application/json"}
+    url = "http://127.0.0.1:1234"
+    client = get_client(url, read_timeout=60.0)
     
-    data = {
-        "messages": [
-            {"role": "system", "content": "You are Jarvis, an AI assistant running on local LLM."},
-            {"role": "user", "content": "Confirm you're running locally and explain what you can do."}
-        ],
-        "model": "llama-2-7b-chat",
-        "temperature": 0.7,
-        "max_tokens": 500
-    }
+    messages = [
+        {"role": "system", "content": "You are Jarvis, an AI assistant running on local LLM."},
+        {"role": "user", "content": "Confirm you're running locally and explain what you can do."}
+    ]
     
     try:
         print(f"📡 Connecting to LM Studio at: {url}")
-        response = requests.post(url, headers=headers, json=data)
-        print(f"📊 Status: {response.status_code}\n")
-        
-        if response.status_code == 200:
-            result = response.json()
-            print("✅ Connection successful!")
-            print("\n🤖 Jarvis Response:")
-            print(result["choices"][0]["message"]["content"])
-            return True
-        else:
-            print(f"❌ Error {response.status_code}: {response.text}")
-            return False
+        reply = client.complete(messages, model="llama-2-7b-chat", temperature=0.7, max_tokens=500)
+        print("✅ Connection successful!")
+        print("\n🤖 Jarvis Response:")
+        print(reply)
+        return True
             
-    except Exception as e:
-        print(f"❌ Connection Error: {str(e)}")
+    except BackendError as e:
+        print(f"❌ Error {e.status or ''}: {str(e)}")
         return False
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.backend_client import BackendClient, BackendError
+from utils.stub_server import StubServer
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def stub():
+    with StubServer(reply="Hello from the stub.") as server:
+        yield server
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays the client chose, in order"""
+    delays = []
+    choose = BackendClient._delay
+
+    def record(self, attempt, response=None):
+        delays.append(choose(self, attempt, response))
+        return delays[-1]
+
+    monkeypatch.setattr(BackendClient, "_delay", record)
+    return delays
+
+
+def make_client(url, **options):
+    options.setdefault("backoff", 0.02)
+    return BackendClient(url, model="stub-model", **options)
+
+
+def test_connections_are_reused(stub):
+    client = make_client(stub.url)
+    for _ in range(5):
+        assert client.complete(MESSAGES) == "Hello from the stub."
+    assert stub.requests == 5
+    assert stub.connections == 1
+    client.close()
+
+
+def test_stream_yields_deltas(stub):
+    client = make_client(stub.url)
+    assert "".join(client.stream_chat_completion(MESSAGES)) == "Hello from the stub."
+    client.close()
+
+
+def test_5xx_is_retried_with_jittered_backoff(stub, sleeps):
+    stub.fail_next(2)
+    client = make_client(stub.url, max_retries=3)
+    assert client.complete(MESSAGES) == "Hello from the stub."
+    assert stub.requests == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.02 and 0 <= sleeps[1] <= 0.04
+    client.close()
+
+
+def test_jitter_is_random_and_capped():
+    client = make_client("http://127.0.0.1:9", max_backoff=1.0)
+    delays = {client._delay(10) for _ in range(20)}
+    assert len(delays) > 1
+    assert all(0 <= delay <= 1.0 for delay in delays)
+    client.close()
+
+
+def test_retries_exhausted_maps_to_backend_error(stub, sleeps):
+    stub.fail_next(10)
+    client = make_client(stub.url, max_retries=2)
+    with pytest.raises(BackendError) as error:
+        client.complete(MESSAGES)
+    assert error.value.status == 503
+    assert stub.requests == 3 and len(sleeps) == 2
+    client.close()
+
+
+def test_client_errors_are_not_retried(sleeps):
+    with StubServer(error_status=400) as stub:
+        stub.fail_next(1)
+        client = make_client(stub.url)
+        with pytest.raises(BackendError) as error:
+            client.complete(MESSAGES)
+        assert error.value.status == 400
+        assert stub.requests == 1 and sleeps == []
+        client.close()
+
+
+def test_connection_errors_are_retried(sleeps):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]  # closed again before the client connects
+    client = make_client(f"http://127.0.0.1:{port}", max_retries=2)
+    with pytest.raises(BackendError, match="failed"):
+        client.complete(MESSAGES)
+    assert len(sleeps) == 2
+    assert client.is_ready() is False
+    client.close()
+
+
+def test_read_timeout_maps_to_backend_error(sleeps):
+    with StubServer(latency=1.0) as stub:
+        client = make_client(stub.url, read_timeout=0.1, max_retries=1)
+        with pytest.raises(BackendError):
+            client.complete(MESSAGES)
+        assert len(sleeps) == 1
+        client.close()
+
+
+class _GarbageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = b"<html>not json</html>"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._reply()
+
+
+@pytest.mark.parametrize("body", [b"<html>not json</html>", b'{"choices": []}', b"[1, 2]"])
+def test_malformed_bodies_map_to_backend_error(body):
+    handler = type("Handler", (_GarbageHandler,), {"body": body})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = make_client(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        with pytest.raises(BackendError):
+            client.complete(MESSAGES)
+        if not body.startswith(b"{"):
+            with pytest.raises(BackendError):
+                client.list_models()
+            assert client.is_ready() is False
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,58 @@
+import asyncio
+
+from benchmarks.harness import compare, percentile, run_async_load, run_load, summarize
+from benchmarks.run import OPTION_DEFAULTS, run_scenario
+
+
+def test_percentile_is_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 95) == 95.0
+    assert percentile(samples, 100) == 100.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_counts_errors_and_throughput():
+    summary = summarize([0.2, 0.1, 0.3, 0.4], errors=1, wall=2.0, concurrency=2)
+    assert summary["requests"] == 4 and summary["error_rate"] == 0.25
+    assert summary["throughput_rps"] == 2.0
+    assert summary["latency_ms"]["p50"] == 200.0 and summary["latency_ms"]["max"] == 400.0
+
+
+def test_loads_time_failures_and_exceptions_as_errors():
+    def call(i):
+        if i == 3:
+            raise RuntimeError("boom")
+        return i % 2 == 0
+
+    summary = run_load(call, requests=10, concurrency=3)
+    assert summary["requests"] == 10 and summary["errors"] == 5
+
+    async def acall(i):
+        await asyncio.sleep(0)
+        return i != 0
+
+    summary = asyncio.run(run_async_load(acall, requests=6, concurrency=2))
+    assert summary["requests"] == 6 and summary["errors"] == 1
+
+
+def result(p95=10.0, rps=100.0, error_rate=0.0, rss=50.0):
+    return {"latency_ms": {"p50": 5.0, "p95": p95, "p99": p95}, "throughput_rps": rps,
+            "error_rate": error_rate, "peak_rss_mb": rss}
+
+
+def test_compare_flags_each_kind_of_regression():
+    baseline = {"chat": result()}
+    assert compare({"chat": result(p95=13.0, rps=80.0, rss=60.0)}, baseline) == []
+    failures = compare({"chat": result(p95=20.0, rps=50.0, error_rate=0.1, rss=90.0),
+                        "new": result()}, baseline)
+    assert len(failures) == 5  # p95, p99, throughput, error rate, RSS; "new" has no baseline
+    assert all(failure.startswith("chat: ") for failure in failures)
+
+
+def test_memory_scenario_runs_offline_in_a_child_process():
+    options = dict(OPTION_DEFAULTS, requests=20, concurrency=4, sessions=2, rows=20)
+    report = run_scenario("memory_recall", options)
+    assert "failed" not in report, report
+    assert report["requests"] == 20 and report["errors"] == 0
+    assert report["peak_rss_mb"] is None or report["peak_rss_mb"] > 0
@@ -0,0 +1,120 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import chat
+import llama_worker
+from response_cache import ResponseCache
+from transcript import Transcript
+from utils.backend_client import BackendError
+
+FAKE = str(Path(__file__).resolve().parent.parent / "utils" / "fake_llama_chat.py")
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Config served to chat.py; the response cache is off unless a test turns it on"""
+    config = {"response_cache": False}
+    monkeypatch.setattr(chat, "get_config", lambda: dict(config))
+    return config
+
+
+@pytest.fixture
+def fake_llama(config, monkeypatch):
+    monkeypatch.setattr(llama_worker, "_workers", {})
+    config.update(llama_model_path="fake.gguf",
+                  llama_worker_cmd=[sys.executable, FAKE, "--serve", "--echo-history"])
+    yield
+    for worker in llama_worker._workers.values():
+        worker.close()
+
+
+def test_transcript_history_reaches_the_llama_worker(fake_llama):
+    transcript = Transcript()
+    turn = transcript.add("What is the reactor output?")
+    turn.set_reply("llama", "Forty percent.")
+    transcript.add("Ignored by llama").set_reply("openai", "OpenAI-only reply.")
+
+    stream = chat.chat_stream("And the shield status?", "llama", transcript.messages("llama"),
+                              session_id=transcript.session_id)
+    text = "".join(stream)
+    assert text.startswith("Fake Jarvis reply to: And the shield status?")
+    history = json.loads(text.split(" history=", 1)[1])
+    assert history == [["user", "What is the reactor output?"], ["assistant", "Forty percent."]]
+
+
+def test_closing_a_stream_early_releases_the_llama_worker(fake_llama):
+    stream = chat.chat_stream("Status?", "llama")
+    chunks = iter(stream)
+    assert next(chunks).startswith("Fake")
+    [worker] = llama_worker._workers.values()
+    assert worker._lock.locked()
+    stream.close()
+    assert not worker._lock.locked()
+    assert "".join(chat.chat_stream("Again?", "llama")).startswith("Fake Jarvis reply to: Again?")
+
+
+class FlakyClient:
+    """LM Studio client whose stream breaks after `fail_after` chunks"""
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def complete(self, messages, **params):
+        return "".join(self.stream_chat_completion(messages, **params))
+
+    def stream_chat_completion(self, messages, **params):
+        self.calls += 1
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise BackendError("connection reset")
+            yield chunk
+
+
+@pytest.fixture
+def cache(config, monkeypatch, tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db")
+    config["response_cache"] = True
+    monkeypatch.setattr(chat, "get_response_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+def test_stream_failing_midway_is_not_cached(cache, monkeypatch):
+    client = FlakyClient(["The reactor", " is", " stable."], fail_after=2)
+    monkeypatch.setattr(chat, "get_client", lambda base_url: client)
+
+    stream = chat.chat_stream("Status?", "lmstudio")
+    assert "".join(stream) == "The reactor isSorry, I encountered an error: connection reset"
+    assert stream.error == "Sorry, I encountered an error: connection reset"
+
+    client.fail_after = None
+    again = chat.chat_stream("Status?", "lmstudio")
+    assert "".join(again) == "The reactor is stable."
+    assert again.backend == "lmstudio" and client.calls == 2
+
+
+def test_completed_stream_is_cached(cache, monkeypatch):
+    client = FlakyClient(["All", " good."])
+    monkeypatch.setattr(chat, "get_client", lambda base_url: client)
+    assert "".join(chat.chat_stream("Status?", "lmstudio")) == "All good."
+    hit = chat.chat_stream("Status?", "lmstudio")
+    assert "".join(hit) == "All good." and hit.backend == "cache"
+    assert client.calls == 1
+
+
+@pytest.mark.parametrize("call", [chat.chat, lambda *args: "".join(chat.chat_stream(*args))])
+def test_cache_hit_updates_chat_history_like_a_miss(cache, monkeypatch, call):
+    client = FlakyClient(["All", " good."])
+    monkeypatch.setattr(chat, "get_client", lambda base_url: client)
+    system = {"role": "system", "content": "You are Jarvis."}
+
+    missed = [dict(system)]
+    assert call("Status?", "lmstudio", missed) == "All good."
+    hit = [dict(system)]
+    assert call("Status?", "lmstudio", hit) == "All good."
+    assert client.calls == 1
+    assert hit == missed == [system, {"role": "user", "content": "Status?"}]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from config_store import ConfigError, ConfigStore
+
+
+def write(path, config):
+    path.write_text(json.dumps(config))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "config.json"
+    write(path, {"openai_api_key": "sk-1"})
+    return path
+
+
+def test_reads_are_served_from_memory_until_the_interval(path):
+    store = ConfigStore(path, check_interval=3600)
+    assert store.get() == {"openai_api_key": "sk-1"}
+    write(path, {"openai_api_key": "sk-22"})
+    assert store.get() == {"openai_api_key": "sk-1"}
+    assert store.reload() == {"openai_api_key": "sk-22"}
+
+
+def test_edits_by_other_processes_are_picked_up(path):
+    store = ConfigStore(path, check_interval=0)
+    changes = []
+    store.subscribe(changes.append)
+    write(path, {"openai_api_key": "sk-22", "response_cache": False})
+    assert store.get()["response_cache"] is False
+    assert changes == [{"openai_api_key": "sk-22", "response_cache": False}]
+    store.get()
+    assert len(changes) == 1, "an unchanged file is not announced again"
+
+
+def test_a_broken_file_keeps_the_last_good_config(path):
+    store = ConfigStore(path, check_interval=0)
+    path.write_text("{not json")
+    assert store.get() == {"openai_api_key": "sk-1"}
+    write(path, {"response_cache": "yes"})
+    assert store.get() == {"openai_api_key": "sk-1"}
+
+
+def test_save_validates_writes_atomically_and_notifies(path):
+    store = ConfigStore(path, check_interval=3600)
+    changes = []
+    unsubscribe = store.subscribe(changes.append)
+    with pytest.raises(ConfigError, match="local_batching"):
+        store.save({"local_batching": "on"})
+    assert json.loads(path.read_text()) == {"openai_api_key": "sk-1"}
+
+    store.save({"openai_api_key": "sk-3", "custom": 1})
+    assert json.loads(path.read_text()) == {"openai_api_key": "sk-3", "custom": 1}
+    assert changes == [{"openai_api_key": "sk-3", "custom": 1}]
+    assert [p.name for p in path.parent.iterdir()] == ["config.json"]
+    unsubscribe()
+    store.save({})
+    assert len(changes) == 1
+
+
+def test_missing_file_is_an_empty_config(tmp_path):
+    store = ConfigStore(tmp_path / "absent.json", check_interval=0)
+    assert store.get() == {}
+    write(tmp_path / "absent.json", {"lmstudio_url": "http://127.0.0.1:1234"})
+    assert store.get() == {"lmstudio_url": "http://127.0.0.1:1234"}
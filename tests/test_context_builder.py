@@ -0,0 +1,102 @@
+import threading
+
+from context_builder import SUMMARY_PREFIX, ContextBuilder
+
+
+def words(text):
+    return len(text.split())
+
+
+class RecordingSummarizer:
+    """Summary = one line per folded message; remembers each call's messages"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages):
+        self.calls.append([m["content"] for m in messages])
+        return "\n".join(filter(None, [previous] + [m["content"] for m in messages]))
+
+
+def conversation(n):
+    """n user/assistant exchanges of five words per message"""
+    history = []
+    for i in range(n):
+        history.append({"role": "user", "content": f"question {i} about the reactor"})
+        history.append({"role": "assistant", "content": f"answer {i} about the reactor"})
+    return history
+
+
+def make_builder(**options):
+    summarizer = RecordingSummarizer()
+    # 9 tokens a message, 20 reserved for the summary: room for the prompt and 4 turns
+    builder = ContextBuilder(budget=70, summary_budget=16, tokenizer=words, summarizer=summarizer, **options)
+    return builder, summarizer
+
+
+def build(builder, history, prompt="what now", conversation_id="c"):
+    return builder.build(history + [{"role": "user", "content": prompt}], conversation_id)
+
+
+def summary_of(built):
+    return next((m["content"][len(SUMMARY_PREFIX):] for m in built if m["content"].startswith(SUMMARY_PREFIX)), "")
+
+
+def test_old_turns_fold_into_the_summary():
+    builder, summarizer = make_builder()
+    built = build(builder, conversation(4))
+    assert summarizer.calls == [["question 0 about the reactor", "answer 0 about the reactor",
+                                 "question 1 about the reactor", "answer 1 about the reactor"]]
+    assert [m["content"] for m in built[1:-1]] == [m["content"] for m in conversation(4)[4:]]
+
+
+def test_summary_is_extended_when_the_window_slides():
+    builder, summarizer = make_builder()
+    history = conversation(4)
+    build(builder, history)
+    # The caller keeps a sliding window: the two oldest exchanges are gone, one new one arrived.
+    history = history[4:] + conversation(5)[8:]
+    built = build(builder, history)
+    assert summarizer.calls[1] == ["question 2 about the reactor", "answer 2 about the reactor"]
+    # "answer 1" was folded by the first build and is no longer in the history passed in.
+    assert summary_of(built).splitlines() == ["answer 1 about the reactor", "question 2 about the reactor",
+                                              "answer 2 about the reactor"]
+
+
+def test_prepending_older_turns_does_not_refold():
+    builder, summarizer = make_builder()
+    history = conversation(6)
+    build(builder, history[6:])  # only the recent window was loaded at first
+    calls = len(summarizer.calls)
+    built = build(builder, history)  # older turns paged back in
+    assert len(summarizer.calls) == calls
+    assert [m["content"] for m in built[-5:-1]] == [m["content"] for m in history[-4:]]
+
+
+def test_summaries_are_bounded_per_conversation():
+    builder, _ = make_builder(max_conversations=2)
+    for conversation_id in ("a", "b", "c"):
+        build(builder, conversation(4), conversation_id=conversation_id)
+    assert list(builder._summaries) == ["b", "c"]
+    builder.forget("b")
+    assert list(builder._summaries) == ["c"]
+
+
+def test_summarizer_runs_outside_the_lock():
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_summarizer(previous, messages):
+        entered.set()
+        release.wait(5)
+        return "slow summary"
+
+    builder = ContextBuilder(budget=70, summary_budget=16, tokenizer=words, summarizer=slow_summarizer)
+    slow = threading.Thread(target=build, args=(builder, conversation(4)), kwargs={"conversation_id": "slow"})
+    slow.start()
+    assert entered.wait(5)
+    done = threading.Event()
+    other = threading.Thread(target=lambda: (build(builder, conversation(1), conversation_id="fast"), done.set()))
+    other.start()
+    assert done.wait(2), "another conversation waited for the summarizer"
+    release.set()
+    slow.join(5)
+    other.join(5)
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.db_worker import DBWorker
+from core.jarvis_core import JarvisMemory
+
+
+@pytest.fixture
+def worker():
+    worker = DBWorker("test-db", maxsize=1)
+    yield worker
+    worker.shutdown(wait=False)
+
+
+async def ticks_while(awaitable, interval=0.01):
+    """Await `awaitable` while counting event-loop ticks; returns (result, ticks)"""
+    ticks = 0
+    task = asyncio.ensure_future(awaitable)
+    while not task.done():
+        await asyncio.sleep(interval)
+        ticks += 1
+    return task.result(), ticks
+
+
+def test_run_returns_results_and_raises_errors(worker):
+    async def scenario():
+        assert await worker.run(lambda a, b: a + b, 2, b=3) == 5
+        with pytest.raises(ZeroDivisionError):
+            await worker.run(lambda: 1 / 0)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_waits_off_the_event_loop(worker):
+    release = threading.Event()
+
+    async def scenario():
+        await worker.enqueue(release.wait, 5)  # occupies the thread
+        await worker.enqueue(lambda: None)  # fills the one queue slot
+        threading.Timer(0.2, release.set).start()
+        future, ticks = await ticks_while(worker.enqueue(lambda: "late"))
+        return await asyncio.wrap_future(future), ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result == "late"
+    assert ticks >= 5, "the event loop stalled while the queue was full"
+
+
+def test_shutdown_finishes_queued_calls_then_refuses_new_ones():
+    worker = DBWorker("test-db")
+    done = []
+    futures = [worker.submit(lambda i=i: (time.sleep(0.01), done.append(i))) for i in range(3)]
+    worker.shutdown()
+    assert done == [0, 1, 2] and all(f.done() for f in futures)
+    with pytest.raises(RuntimeError, match="shut down"):
+        worker.submit(lambda: None)
+
+
+def test_store_interaction_does_not_wait_for_the_database(tmp_path):
+    memory = JarvisMemory(tmp_path)
+    release = threading.Event()
+
+    async def scenario():
+        await memory._writes.enqueue(release.wait, 5)  # a slow write ahead in the queue
+        started = time.perf_counter()
+        await memory.store_interaction("hi", "hello", "s1")
+        queued_in = time.perf_counter() - started
+        release.set()
+        return queued_in, await memory.get_recent_context("s1")
+
+    try:
+        queued_in, rows = asyncio.run(scenario())
+    finally:
+        release.set()
+        memory.close()
+    assert queued_in < 0.5
+    assert [row["user_input"] for row in rows] == ["hi"]
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from utils import importtime
+
+# Loose on purpose: the baseline was recorded on another machine. What this
+# catches is an eager heavy import (openai, langchain, requests) creeping
+# back into start-up, which costs hundreds of milliseconds.
+TOLERANCE = 1.0
+SLACK_MS = 25.0
+
+
+def test_compare_applies_tolerance_and_slack():
+    results = importtime.compare({"fast": 12.0, "slow": 40.0, "new": 99.0},
+                                 {"fast": 10.0, "slow": 10.0}, tolerance=0.25, slack_ms=5.0)
+    assert [(r["module"], r["limit_ms"], r["ok"]) for r in results] == [
+        ("fast", 17.5, True), ("slow", 17.5, False)]
+
+
+@pytest.mark.parametrize("module", importtime.DEFAULT_TARGETS)
+def test_cold_import_within_baseline(module):
+    baseline = json.loads(importtime.BASELINE.read_text())
+    ms, _ = importtime.cold_import(module, runs=3)
+    [result] = importtime.compare({module: ms}, baseline, TOLERANCE, SLACK_MS)
+    assert result["ok"], (f"import {module} took {ms:.1f} ms, limit {result['limit_ms']:.1f} ms "
+                          f"(baseline {result['baseline_ms']:.1f} ms); "
+                          f"run `python utils/importtime.py {module}` for the breakdown")
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from core.jarvis_core import JarvisMemory
+
+REJECT_BAD = """
+    CREATE TRIGGER reject_bad BEFORE INSERT ON conversations WHEN new.user_input = 'bad'
+    BEGIN SELECT RAISE(ABORT, 'rejected'); END;
+"""
+
+
+@pytest.fixture(params=["turn", "group"])
+def memory(request, tmp_path):
+    memory = JarvisMemory(tmp_path, durability=request.param, flush_interval=60)
+    memory.engine.executescript(REJECT_BAD)
+    yield memory
+    memory.close()
+
+
+def inputs(rows):
+    return [row["user_input"] for row in rows]
+
+
+def test_failed_write_leaves_no_phantom_turn(memory):
+    async def scenario():
+        await memory.store_interaction("good", "kept", "s1")
+        await memory.get_recent_context("s1")  # the session is now cached
+        await memory.store_interaction("bad", "rejected by the database", "s1")
+        await asyncio.to_thread(memory.flush)
+        return await memory.get_recent_context("s1")
+
+    assert inputs(asyncio.run(scenario())) == ["good"]
+
+
+def test_rejected_enqueue_leaves_no_phantom_turn(memory):
+    async def scenario():
+        await memory.store_interaction("good", "kept", "s1")
+        await asyncio.to_thread(memory.flush)
+        await memory.get_recent_context("s1")  # the whole session is now cached
+        memory._writes.shutdown()
+        with pytest.raises(RuntimeError):
+            await memory.store_interaction("late", "never queued", "s1")
+        return await memory.get_recent_context("s1")
+
+    assert inputs(asyncio.run(scenario())) == ["good"]
+
+
+def test_cached_context_is_not_shared_with_callers(memory):
+    async def scenario():
+        await memory.store_interaction("hi", "hello", "s1", {"replies": {"openai": "hello"}})
+        first = await memory.get_recent_context("s1")
+        first[0]["context"]["replies"]["openai"] = "edited by a caller"
+        return await memory.get_recent_context("s1")
+
+    assert asyncio.run(scenario())[0]["context"] == {"replies": {"openai": "hello"}}
+
+
+def store(memory, turns):
+    async def scenario():
+        for session_id, user_input, response in turns:
+            await memory.store_interaction(user_input, response, session_id)
+        await asyncio.to_thread(memory.flush)
+
+    asyncio.run(scenario())
+
+
+def collect(memory, session_id, before_id=None, page_size=3):
+    async def scenario():
+        return [row async for row in memory.iter_history(session_id, before_id, page_size)]
+
+    return asyncio.run(scenario())
+
+
+def test_history_pages_newest_first_and_resumes(memory):
+    store(memory, [("s1" if i % 2 else "s2", f"turn {i}", "ok") for i in range(15)])
+    rows = collect(memory, "s1")
+    assert inputs(rows) == [f"turn {i}" for i in range(13, 0, -2)]
+    assert [row["id"] for row in rows] == sorted((row["id"] for row in rows), reverse=True)
+    resumed = collect(memory, "s1", before_id=rows[3]["id"])
+    assert resumed == rows[4:]
+    assert collect(memory, "nobody") == []
+
+
+def test_keyword_search_ranks_filters_and_escapes(memory):
+    store(memory, [
+        ("s1", "reactor reactor reactor check", "the reactor is stable"),
+        ("s1", "weather today", "sunny, and the reactor is fine"),
+        ("s2", "reactor status", "nominal"),
+        ("s2", "dinner plans", "pasta"),
+    ])
+
+    async def search(query, session_id=None, limit=5):
+        return await memory.search_context(query, session_id, limit)
+
+    hits = asyncio.run(search("Reactor?"))
+    assert len(hits) == 3 and hits[0]["user_input"] == "reactor reactor reactor check"
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    assert "[reactor]" in hits[0]["snippet"]
+    assert {hit["session_id"] for hit in asyncio.run(search("reactor", "s2"))} == {"s2"}
+    assert len(asyncio.run(search("reactor", limit=1))) == 1
+    # FTS5 syntax in user text is matched literally rather than raising.
+    assert inputs(asyncio.run(search('dinner" OR (NEAR'))) == ["dinner plans"]
+    assert asyncio.run(search("?!")) == []
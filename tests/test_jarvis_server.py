@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.jarvis_core import JarvisCore
+from jarvis_server import HTTPError, JarvisServer
+from utils.backend_client import AsyncBackendClient, BackendClient
+from utils.stub_server import StubServer
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def slow_stub():
+    with StubServer(reply="one two three four five", token_delay=0.3) as server:
+        yield server
+
+
+def test_stream_past_the_deadline_is_a_504(slow_stub, tmp_path):
+    async def scenario():
+        core = JarvisCore(base_path=tmp_path, base_url=slow_stub.url, model="stub-model")
+        server = await JarvisServer(core, port=0).start()
+        chunks = []
+        with pytest.raises(HTTPError) as error:
+            async for chunk in server.stream("hello", "s1", timeout=0.5):
+                chunks.append(chunk)
+        await server.shutdown()
+        return chunks, error.value, server
+
+    chunks, error, server = asyncio.run(scenario())
+    assert error.status == 504
+    assert chunks[:1] == ["one"]
+    assert server.timeouts == 1
+
+
+def test_cancelled_stream_closes_after_the_read_in_flight(slow_stub):
+    client = BackendClient(slow_stub.url, model="stub-model")
+    closed = threading.Event()
+    stream = client.stream_chat_completion
+
+    def tracked_stream(*args, **kwargs):
+        try:
+            yield from stream(*args, **kwargs)
+        finally:
+            closed.set()
+
+    client.stream_chat_completion = tracked_stream
+
+    async def scenario():
+        chunks = AsyncBackendClient(client).stream_chat_completion(MESSAGES)
+        assert await chunks.__anext__() == "one"
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(chunks.__anext__(), 0.1)
+        assert not closed.is_set()  # the executor thread is still inside next()
+
+    asyncio.run(scenario())
+    assert closed.wait(5)
+    client.close()
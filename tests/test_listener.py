@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+import types
+from array import array
+
+import pytest
+
+import voice
+from voice import Listener, PCMSource
+
+RATE = 16000
+FRAME_MS = 30
+
+
+def tone(ms, amplitude=8000):
+    samples = int(RATE * ms / 1000)
+    return array("h", (int(amplitude * math.sin(2 * math.pi * 440 * i / RATE)) for i in range(samples))).tobytes()
+
+
+def silence(ms):
+    return bytes(int(RATE * ms / 1000) * 2)
+
+
+class FakeRecognizer:
+    """Names each segment it hears; raises `errors` for the first calls"""
+    def __init__(self, errors=()):
+        self.segments = []
+        self.errors = list(errors)
+
+    def transcribe(self, pcm, sample_rate):
+        self.segments.append(pcm)
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"utterance {len(self.segments)}"
+
+
+def two_utterances():
+    return silence(600) + tone(300) + silence(900) + tone(600) + silence(900)
+
+
+def make_listener(data, recognizer, **options):
+    options.setdefault("threshold", 1000)
+    return Listener(PCMSource(data, RATE, FRAME_MS), recognizer, **options)
+
+
+def test_utterances_are_segmented_and_transcribed():
+    recognizer = FakeRecognizer()
+    heard = []
+    listener = make_listener(two_utterances(), recognizer, on_text=heard.append).start()
+    assert list(listener) == ["utterance 1", "utterance 2"]
+    assert heard == ["utterance 1", "utterance 2"]
+    frames = [len(pcm) // (RATE * FRAME_MS // 1000 * 2) for pcm in recognizer.segments]
+    # 3 silent pre-roll frames + the speech + 16 frames (480ms) of closing silence
+    assert frames == [3 + 10 + 16, 3 + 20 + 16]
+    listener.stop()
+
+
+def test_calibration_sets_the_threshold_from_ambient_noise():
+    noise = tone(600, amplitude=2000)
+    data = noise + tone(300, amplitude=12000) + noise + noise
+    listener = Listener(PCMSource(data, RATE, FRAME_MS, key="test:calibration"), FakeRecognizer()).start()
+    assert list(listener) == ["utterance 1"]
+    assert listener.threshold == pytest.approx(2000 / math.sqrt(2) * 1.5, rel=0.05)
+    listener.stop()
+
+
+def test_recognizer_errors_are_raised_from_get():
+    recognizer = FakeRecognizer(errors=[ConnectionError("offline")])
+    listener = make_listener(two_utterances(), recognizer).start()
+    with pytest.raises(ConnectionError, match="offline"):
+        listener.get(5)
+    assert listener.get(5) == "utterance 2"
+    assert listener.get(5) is None
+    listener.stop()
+
+
+def test_paused_listener_captures_nothing():
+    recognizer = FakeRecognizer()
+    listener = make_listener(two_utterances(), recognizer, paused=True).start()
+    assert listener.get(0.3) is None
+    assert recognizer.segments == []
+    listener.resume()
+    assert listener.get(5) == "utterance 1"
+    listener.stop()
+
+
+def test_pause_drops_a_transcript_still_in_flight():
+    class SlowRecognizer(FakeRecognizer):
+        def __init__(self):
+            super().__init__()
+            self.busy = threading.Event()
+            self.release = threading.Event()
+
+        def transcribe(self, pcm, sample_rate):
+            if self.segments:
+                self.busy.set()
+                self.release.wait(5)
+            return super().transcribe(pcm, sample_rate)
+
+    recognizer = SlowRecognizer()
+    listener = make_listener(two_utterances(), recognizer).start()
+    assert listener.get(5) == "utterance 1"
+    assert recognizer.busy.wait(5)
+    listener.pause()
+    listener.resume()
+    recognizer.release.set()
+    assert listener.get(5) is None  # "utterance 2" was heard before the pause
+    assert len(recognizer.segments) == 2
+    listener.stop()
+
+
+def test_dead_listener_is_replaced(monkeypatch):
+    monkeypatch.setattr(voice, "_listener", None)
+    monkeypatch.setattr(voice, "MicrophoneSource", lambda: PCMSource(silence(300), RATE, FRAME_MS))
+    monkeypatch.setattr(voice, "GoogleRecognizer", FakeRecognizer)
+    first = voice.get_listener()
+    assert voice.get_listener() is first
+    first.resume()
+    assert first.get(5) is None  # source exhausted, threads exit
+    deadline = time.monotonic() + 5
+    while first.alive and time.monotonic() < deadline:
+        time.sleep(0.01)
+    second = voice.get_listener()
+    assert second is not first and second.alive
+    second.stop()
+
+
+def test_recognize_speech_reports_service_errors(monkeypatch):
+    class RequestError(Exception):
+        pass
+
+    said = []
+    listener = make_listener(two_utterances(), FakeRecognizer(errors=[RequestError("quota")]), paused=True).start()
+    monkeypatch.setattr(voice, "sr", types.SimpleNamespace(RequestError=RequestError))
+    monkeypatch.setattr(voice, "get_listener", lambda: listener)
+    monkeypatch.setattr(voice, "text_to_speech", lambda text, block=False: said.append(text))
+    assert voice.recognize_speech(timeout=5) == ""
+    assert said == ["Speech recognition service is currently unavailable."]
+    assert not listener._active.is_set()
+    listener.stop()
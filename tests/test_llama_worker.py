@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from llama_worker import LlamaWorker, LlamaWorkerError
+
+FAKE = str(Path(__file__).resolve().parent.parent / "utils" / "fake_llama_chat.py")
+
+
+def fake_worker(*args, **options):
+    options.setdefault("restart_backoff", 0.0)
+    return LlamaWorker([sys.executable, FAKE, "--serve", "-m", "fake.gguf", *args], **options)
+
+
+def test_generate_returns_the_reply():
+    worker = fake_worker()
+    try:
+        assert worker.generate("hello there") == "Fake Jarvis reply to: hello there"
+        assert worker.generate("again") == "Fake Jarvis reply to: again"
+        assert worker.restarts == 0
+    finally:
+        worker.close()
+
+
+def test_stream_yields_deltas():
+    worker = fake_worker()
+    try:
+        deltas = list(worker.stream("stream me"))
+        assert len(deltas) > 1
+        assert "".join(deltas) == "Fake Jarvis reply to: stream me"
+    finally:
+        worker.close()
+
+
+def test_crash_restarts_and_retries(tmp_path):
+    worker = fake_worker("--crash-after", "1", "--crash-marker", str(tmp_path / "crashed"))
+    try:
+        assert worker.generate("survive this") == "Fake Jarvis reply to: survive this"
+        assert worker.restarts == 1
+        assert (tmp_path / "crashed").exists()
+    finally:
+        worker.close()
+
+
+def test_request_timeout_kills_the_worker():
+    worker = fake_worker("--token-delay", "5", request_timeout=0.3)
+    try:
+        with pytest.raises(LlamaWorkerError, match="Timed out"):
+            worker.generate("too slow")
+        assert worker._process is None
+    finally:
+        worker.close()
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from local_scheduler import BatchScheduler
+from utils.backend_client import BackendClient, BackendError
+from utils.stub_server import StubServer
+
+
+class EchoStub(StubServer):
+    def reply_for(self, body):
+        return f"re: {body.get('prompt')}"
+
+
+@pytest.fixture
+def stub():
+    with EchoStub(serialize=True, latency=0.01) as server:
+        yield server
+
+
+def stub_scheduler(stub, **options):
+    client = BackendClient(stub.url, model="stub-model", backoff=0.0)
+    return BatchScheduler(lambda prompts, params: client.complete_batch(prompts, **params),
+                          **options)
+
+
+def submit_all(scheduler, prompts, session_id="default"):
+    return [scheduler.submit(prompt, session_id) for prompt in prompts]
+
+
+def test_concurrent_prompts_share_one_batch(stub):
+    scheduler = stub_scheduler(stub, batch_window=0.2, max_wait=1.0)
+    futures = submit_all(scheduler, ["a", "b", "c", "d"])
+    assert [future.result(5) for future in futures] == ["re: a", "re: b", "re: c", "re: d"]
+    assert stub.batch_sizes == [4]
+    assert scheduler.stats()["batches"] == 1
+    scheduler.close()
+
+
+def test_batches_are_capped_at_max_batch_size(stub):
+    scheduler = stub_scheduler(stub, max_batch_size=2, batch_window=0.2, max_wait=1.0)
+    futures = submit_all(scheduler, ["a", "b", "c", "d", "e"])
+    assert [future.result(5) for future in futures] == [f"re: {p}" for p in "abcde"]
+    assert stub.batch_sizes == [2, 2, 1]
+    scheduler.close()
+
+
+def test_max_wait_flushes_a_partial_batch(stub):
+    scheduler = stub_scheduler(stub, max_batch_size=8, batch_window=30.0, max_wait=0.1)
+    started = time.monotonic()
+    assert scheduler.generate("lonely", timeout=5) == "re: lonely"
+    assert time.monotonic() - started < 2.0
+    assert stub.batch_sizes == [1]
+    scheduler.close()
+
+
+def test_only_identical_params_share_a_batch():
+    seen = []
+    scheduler = BatchScheduler(lambda prompts, params: seen.append((prompts, params)) or prompts,
+                               batch_window=0.2, max_wait=1.0)
+    cold = scheduler.submit("a", temperature=0.1)
+    hot = scheduler.submit("b", temperature=0.9)
+    assert (cold.result(5), hot.result(5)) == ("a", "b")
+    assert sorted(len(prompts) for prompts, _ in seen) == [1, 1]
+    scheduler.close()
+
+
+def test_sessions_are_served_round_robin():
+    batches = []
+    release = threading.Event()
+
+    def run_batch(prompts, params):
+        release.wait(5)
+        batches.append(list(prompts))
+        return prompts
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=2, batch_window=0.2, max_wait=1.0)
+    futures = submit_all(scheduler, ["a1", "a2", "a3"], "a") + submit_all(scheduler, ["b1"], "b")
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert batches == [["a1", "b1"], ["a2", "a3"]]
+    scheduler.close()
+
+
+def test_a_bad_prompt_fails_alone():
+    def run_batch(prompts, params):
+        if "bad" in prompts:
+            raise ValueError("prompt rejected")
+        return [prompt.upper() for prompt in prompts]
+
+    scheduler = BatchScheduler(run_batch, batch_window=0.2, max_wait=1.0)
+    good, bad, other = submit_all(scheduler, ["good", "bad", "other"])
+    assert good.result(5) == "GOOD" and other.result(5) == "OTHER"
+    with pytest.raises(ValueError):
+        bad.result(5)
+    scheduler.close()
+
+
+def test_4xx_batch_is_split_and_retried(stub):
+    stub.error_status = 400
+    stub.fail_next(1)
+    scheduler = stub_scheduler(stub, batch_window=0.2, max_wait=1.0)
+    futures = submit_all(scheduler, ["a", "b", "c"])
+    assert [future.result(5) for future in futures] == ["re: a", "re: b", "re: c"]
+    assert stub.batch_sizes == [1, 1, 1]  # the failed batch of 3 never got a reply
+    scheduler.close()
+
+
+def test_server_errors_fail_the_whole_batch(stub):
+    stub.fail_next(10)
+    client = BackendClient(stub.url, model="stub-model", backoff=0.0, max_retries=0)
+    scheduler = BatchScheduler(lambda prompts, params: client.complete_batch(prompts, **params),
+                               batch_window=0.2, max_wait=1.0)
+    futures = submit_all(scheduler, ["a", "b", "c"])
+    for future in futures:
+        with pytest.raises(BackendError):
+            future.result(5)
+    assert stub.requests == 1
+    scheduler.close()
@@ -0,0 +1,211 @@
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from core import memory_io
+from core.jarvis_core import JarvisMemory
+from core.memory_io import export_jsonl, import_jsonl, insert_sql, to_row
+from core.memory_system import JarvisMemory as LegacyMemory
+from core.retention import compress
+from core.storage import SQLiteEngine
+
+BASE_TS = 1_714_548_600_000
+
+
+class Interrupted(Exception):
+    """Stands in for a crash after a checkpoint"""
+
+
+def record(i, session_id="s1"):
+    return {"id": i, "session_id": session_id, "timestamp": "2024-05-01T09:30:00",
+            "ts": BASE_TS + i, "user_input": f"question {i} about the reactor",
+            "response": f"answer {i}", "context": {"turn": i}}
+
+
+@pytest.fixture
+def source_db(tmp_path):
+    """Session store with 3 archived blocks of 4 rows (ids 1-12) and 10 hot rows (ids 13-22)"""
+    path = tmp_path / "source.db"
+    with SQLiteEngine(path, readers=1) as engine:
+        JarvisMemory.init_schema(engine)
+        with engine.transaction() as conn:
+            for first_id in (1, 5, 9):
+                rows = [[i, "2024-05-01T09:30:00", BASE_TS + i, f"question {i} about the reactor",
+                         f"answer {i}", json.dumps({"turn": i})] for i in range(first_id, first_id + 4)]
+                conn.execute(
+                    """INSERT INTO conversation_archive
+                       (session_id, first_id, last_id, first_ts, last_ts, row_count, kind, codec, data)
+                       VALUES ('s1', ?, ?, ?, ?, 4, 'rows', 'zlib', ?)""",
+                    (first_id, first_id + 3, BASE_TS + first_id, BASE_TS + first_id + 3,
+                     compress(json.dumps(rows).encode("utf-8"))))
+            conn.executemany(insert_sql("session", keep_ids=True),
+                             [to_row(record(i), "session", keep_ids=True) for i in range(13, 23)])
+    return path
+
+
+def read_ids(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def interrupt_after_first_checkpoint(records):
+    raise Interrupted(records)
+
+
+@pytest.mark.parametrize("name", ["dump.jsonl", "dump.jsonl.gz"])
+def test_interrupted_export_resumes_without_gaps_or_duplicates(source_db, tmp_path, name):
+    output = tmp_path / name
+    with pytest.raises(Interrupted):
+        export_jsonl(source_db, output, checkpoint_rows=3, progress=interrupt_after_first_checkpoint)
+    checkpoint = json.loads((tmp_path / f"{name}.checkpoint").read_text())
+    # The first checkpoint falls after a whole archive block, never inside one.
+    assert checkpoint["phase"] == "archive" and checkpoint["after"] == 1 and checkpoint["records"] == 4
+    assert output.stat().st_size >= checkpoint["offset"]
+    with open(output, "ab") as f:
+        f.write(b'{"id": 5, "torn')  # written after the checkpoint, before the crash
+
+    result = export_jsonl(source_db, output, checkpoint_rows=3)
+    assert result["resumed_from"] == 4 and result["records"] == 22
+    assert read_ids(output) == list(range(1, 23))
+    assert not (tmp_path / f"{name}.checkpoint").exists()
+
+
+def test_export_checkpoint_in_the_hot_tier(source_db, tmp_path):
+    output = tmp_path / "dump.jsonl"
+
+    def interrupt_in_hot_tier(records):
+        if records > 12:
+            raise Interrupted(records)
+
+    with pytest.raises(Interrupted):
+        export_jsonl(source_db, output, checkpoint_rows=5, progress=interrupt_in_hot_tier)
+    checkpoint = json.loads((tmp_path / "dump.jsonl.checkpoint").read_text())
+    assert checkpoint["phase"] == "hot" and checkpoint["after"] == checkpoint["records"] == 13
+    export_jsonl(source_db, output, checkpoint_rows=5)
+    assert read_ids(output) == list(range(1, 23))
+
+
+def test_export_refuses_a_checkpoint_with_other_filters(source_db, tmp_path):
+    output = tmp_path / "dump.jsonl"
+    with pytest.raises(Interrupted):
+        export_jsonl(source_db, output, checkpoint_rows=3, progress=interrupt_after_first_checkpoint)
+    with pytest.raises(ValueError, match="other options"):
+        export_jsonl(source_db, output, sessions=["s2"])
+    assert export_jsonl(source_db, output, sessions=["s2"], restart=True)["records"] == 0
+
+
+def test_legacy_schema_exports_without_sessions(tmp_path):
+    path = tmp_path / "legacy.db"
+    with SQLiteEngine(path, readers=1) as engine:
+        LegacyMemory.init_schema(engine)
+        with engine.transaction() as conn:
+            conn.executemany(insert_sql("legacy"), [to_row(record(i), "legacy") for i in range(3)])
+    output = tmp_path / "legacy.jsonl"
+    assert export_jsonl(path, output)["schema"] == "legacy"
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["session_id"] for r in records] == [None] * 3
+    assert {r["ts"] for r in records} == {memory_io._timestamp_ms("2024-05-01T09:30:00")}
+    assert records[0]["context"] == {"turn": 0}
+    assert export_jsonl(path, tmp_path / "none.jsonl", sessions=["s1"])["records"] == 0
+
+
+def dump(tmp_path, records, name="dump.jsonl"):
+    path = tmp_path / name
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return path
+
+
+def rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT id, user_input FROM conversations ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def fts_hits(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM conversations_fts WHERE conversations_fts MATCH 'reactor'").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def triggers(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'conversations'")}
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("defer", [False, True])
+def test_interrupted_import_resumes_from_the_last_batch(tmp_path, defer):
+    source = dump(tmp_path, [record(i) for i in range(1, 11)])
+    target = tmp_path / "target.db"
+    with pytest.raises(Interrupted):
+        import_jsonl(target, source, batch_rows=3, defer=defer, progress=interrupt_after_first_checkpoint)
+    assert len(rows(target)) == 3
+    conn = sqlite3.connect(target)
+    offset, records, done = conn.execute(
+        "SELECT offset, records, done FROM memory_io_checkpoints").fetchone()
+    conn.close()
+    assert (records, done) == (3, 0)
+    assert offset == sum(len(json.dumps(record(i))) + 1 for i in range(1, 4))
+
+    result = import_jsonl(target, source, batch_rows=3, defer=defer)
+    assert result["resumed_from"] == 3 and result["total"] == 10
+    assert [text for _, text in rows(target)] == [record(i)["user_input"] for i in range(1, 11)]
+    assert fts_hits(target) == 10
+    with pytest.raises(ValueError, match="already imported"):
+        import_jsonl(target, source)
+
+
+def test_deferred_indexes_survive_a_hard_crash(tmp_path, monkeypatch):
+    source = dump(tmp_path, [record(i) for i in range(1, 11)])
+    target = tmp_path / "target.db"
+    with SQLiteEngine(target, readers=1) as engine:
+        JarvisMemory.init_schema(engine)
+    live = triggers(target)
+    # A killed process never reaches the restore in import_jsonl's finally.
+    monkeypatch.setattr(memory_io, "_restore_deferred", lambda engine, source: None)
+    with pytest.raises(Interrupted):
+        import_jsonl(target, source, batch_rows=3, defer=True, progress=interrupt_after_first_checkpoint)
+    assert triggers(target) == set()
+    monkeypatch.undo()
+
+    import_jsonl(target, source, batch_rows=3, defer=True)
+    assert triggers(target) == live
+    assert fts_hits(target) == 10
+    conn = sqlite3.connect(target)
+    assert conn.execute("SELECT deferred FROM memory_io_checkpoints").fetchone()[0] is None
+    conn.close()
+
+
+def test_keep_ids_skips_ids_already_present(tmp_path):
+    target = tmp_path / "target.db"
+    import_jsonl(target, dump(tmp_path, [record(1), record(2)], "first.jsonl"), keep_ids=True)
+    clashing = [dict(record(2), user_input="a different turn 2"), record(3)]
+    result = import_jsonl(target, dump(tmp_path, clashing, "second.jsonl"), keep_ids=True)
+    assert result["records"] == 1
+    assert rows(target) == [(1, "question 1 about the reactor"), (2, "question 2 about the reactor"),
+                            (3, "question 3 about the reactor")]
+    # Without keep_ids the same records get fresh ids instead.
+    import_jsonl(target, dump(tmp_path, clashing, "third.jsonl"))
+    assert [row_id for row_id, _ in rows(target)] == [1, 2, 3, 4, 5]
+
+
+def test_deferred_import_refuses_a_database_in_use(tmp_path):
+    memory = JarvisMemory(tmp_path)
+    try:
+        with pytest.raises(ValueError, match="open elsewhere"):
+            import_jsonl(memory.engine.db_path, dump(tmp_path, [record(1)]), defer=True)
+        assert triggers(memory.engine.db_path)
+        assert import_jsonl(memory.engine.db_path, dump(tmp_path, [record(1)]))["records"] == 1
+    finally:
+        memory.close()
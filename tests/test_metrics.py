@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import metrics
+
+
+@pytest.fixture
+def slow_turns(monkeypatch):
+    """Profiles every turn (threshold 0); yields the traces of finished turns"""
+    traces = []
+    monkeypatch.setattr(metrics, "_slow_turn_hooks", [traces.append])
+    metrics.configure(True, profile_threshold=0.0, profile_interval=0.002)
+    yield traces
+    metrics.configure(False)
+
+
+def busy_alpha(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def busy_beta(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def stacks(trace):
+    return " ".join(sample["stack"] for sample in trace["profile"])
+
+
+def test_concurrent_async_turns_keep_their_own_samples(slow_turns):
+    async def turn(name, work, delay):
+        with metrics.span(name):
+            await asyncio.sleep(delay)
+            work(0.15)
+            await asyncio.sleep(0.05)
+
+    async def both():
+        await asyncio.gather(turn("alpha", busy_alpha, 0.0), turn("beta", busy_beta, 0.05))
+
+    asyncio.run(both())
+    traces = {trace["name"]: trace for trace in slow_turns}
+    assert set(traces) == {"alpha", "beta"}
+    assert "busy_alpha" in stacks(traces["alpha"]) and "busy_beta" not in stacks(traces["alpha"])
+    assert "busy_beta" in stacks(traces["beta"]) and "busy_alpha" not in stacks(traces["beta"])
+
+
+def test_bound_calls_sample_the_worker_thread(slow_turns):
+    async def turn():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(1) as pool, metrics.span("offloaded"):
+            await loop.run_in_executor(pool, metrics.bind(busy_alpha), 0.15)
+
+    asyncio.run(turn())
+    [trace] = slow_turns
+    assert "busy_alpha" in stacks(trace)
+
+
+def test_bind_joins_the_callers_trace(slow_turns):
+    def work():
+        with metrics.span("worker"):
+            pass
+
+    with metrics.span("turn"):
+        thread = threading.Thread(target=metrics.bind(work))
+        thread.start()
+        thread.join()
+    [trace] = slow_turns
+    assert [child["name"] for child in trace["children"]] == ["worker"]
+
+
+def test_bind_is_a_no_op_outside_a_span(slow_turns):
+    assert metrics.bind(busy_alpha) is busy_alpha
+
+
+def test_reconfiguring_replaces_the_profiler_thread():
+    def profilers():
+        return [t for t in threading.enumerate() if t.name == "jarvis-profiler"]
+
+    try:
+        metrics.configure(True, profile_threshold=1.0)
+        metrics.configure(True, profile_threshold=2.0)
+        assert len(profilers()) == 1
+        metrics.configure(True, profile_threshold=2.0)
+        assert len(profilers()) == 1
+        metrics.configure(True)
+        assert profilers() == []
+    finally:
+        metrics.configure(False)
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from response_cache import ResponseCache, make_key, normalize_prompt
+
+HISTORY = [{"role": "system", "content": "You are Jarvis."},
+           {"role": "user", "content": "Hi"},
+           {"role": "assistant", "content": "Hello, sir."}]
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**options):
+        cache = ResponseCache(tmp_path / "responses.db", **options)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_keys_ignore_formatting_but_not_context():
+    assert normalize_prompt("  What's   the TIME?! ") == "what's the time"
+    key = make_key("openai", "What's the time?", HISTORY)
+    assert make_key("OpenAI", "what's   the time", HISTORY) == key
+    # The prompt itself at the end of the history is not part of the context.
+    assert make_key("openai", "What's the time?", HISTORY + [
+        {"role": "user", "content": "What's the time?"}]) == key
+    assert make_key("llama", "What's the time?", HISTORY) != key
+    assert make_key("openai", "What's the time?", HISTORY[:1]) != key
+    assert make_key("openai", "What's the time?", HISTORY, temperature=0.2) != key
+
+
+def test_history_beyond_the_window_does_not_change_the_key():
+    older = [{"role": "user", "content": f"old {i}"} for i in range(5)]
+    assert make_key("openai", "Hi", older + HISTORY, history_window=3) == \
+        make_key("openai", "Hi", HISTORY, history_window=3)
+
+
+def test_disk_tier_survives_a_restart(make_cache):
+    cache = make_cache()
+    key = cache.key("openai", "Status?")
+    assert cache.get(key) is None
+    cache.put(key, "All good.", latency=1.5)
+    assert cache.get(key) == "All good."
+    cache.close()
+
+    restarted = make_cache()
+    assert restarted.get(key) == "All good."
+    stats = restarted.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["latency_saved_seconds"]) == (1, 1, 1.5)
+    assert restarted.get(key) == "All good."
+    assert restarted.stats()["disk_hits"] == 1, "the second hit comes from memory"
+
+
+def test_memory_tier_is_a_bounded_lru(make_cache):
+    cache = make_cache(max_entries=2)
+    for name in ("a", "b"):
+        cache.put(name, name.upper())
+    cache.get("a")
+    cache.put("c", "C")
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.get("b") == "B" and cache.stats()["disk_hits"] == 1
+
+
+def test_entries_expire_after_the_ttl(make_cache):
+    cache = make_cache(ttl=0.05)
+    cache.put("k", "stale soon")
+    assert cache.get("k") == "stale soon"
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_trim_evicts_least_recently_used_rows(make_cache):
+    cache = make_cache(max_disk_bytes=30)
+    for name in ("a", "b", "c"):
+        cache.put(name, name * 10)  # 11 bytes each with the key
+        time.sleep(0.01)
+    cache.engine.flush()
+    cache.trim()
+    assert [row[0] for row in cache.engine.read("SELECT key FROM responses ORDER BY key")] == ["b", "c"]
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from core.retention import DAY_MS, RetentionManager, RetentionPolicy, compress, create_archive_tables
+from core.storage import SQLiteEngine
+
+NOW_MS = 400 * DAY_MS
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SQLiteEngine(tmp_path / "archive.db")
+    with engine.transaction() as conn:
+        create_archive_tables(conn)
+    yield engine
+    engine.close()
+
+
+def add_block(engine, first_id, last_ts):
+    rows = [[first_id + i, "2025-01-01", last_ts, f"question {i}", f"answer {i}", "{}"] for i in range(4)]
+    with engine.transaction() as conn:
+        conn.execute(
+            """INSERT INTO conversation_archive
+               (session_id, first_id, last_id, first_ts, last_ts, row_count, kind, codec, data)
+               VALUES ('s', ?, ?, ?, ?, 4, 'rows', 'zlib', ?)""",
+            (first_id, first_id + 3, last_ts, last_ts, compress(json.dumps(rows).encode("utf-8")))
+        )
+
+
+def kinds(engine):
+    return [row[0] for row in engine.read("SELECT kind FROM conversation_archive ORDER BY id")]
+
+
+def manager(engine):
+    policy = RetentionPolicy(rollup_days=30, pause=0)
+    return RetentionManager(engine, policy, summarizer=lambda prompt, messages: f"{len(messages)} messages")
+
+
+def test_rollup_summarizes_only_old_blocks(engine):
+    add_block(engine, 1, NOW_MS - 90 * DAY_MS)
+    add_block(engine, 5, NOW_MS - 60 * DAY_MS)
+    add_block(engine, 9, NOW_MS - DAY_MS)
+    assert manager(engine).rollup_pass(NOW_MS) == 2
+    assert kinds(engine) == ["summary", "summary", "rows"]
+
+
+def test_rollup_stops_between_blocks(engine):
+    retention = manager(engine)
+    summaries = []
+
+    def summarize_once(prompt, messages):
+        summaries.append(messages)
+        retention._stop.set()
+        return "summary"
+
+    retention.summarizer = summarize_once
+    for first_id in (1, 5, 9):
+        add_block(engine, first_id, NOW_MS - 90 * DAY_MS)
+    assert retention.rollup_pass(NOW_MS) == 1
+    assert len(summaries) == 1
+    assert kinds(engine) == ["summary", "rows", "rows"]
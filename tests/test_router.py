@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+from router import CLOSED, HALF_OPEN, OPEN, BackendRouter, CircuitBreaker, RouterError
+
+
+class Backend:
+    """Scripted backend: replies after `delay` seconds, or raises `error`"""
+    def __init__(self, reply="ok", delay=0.0, error=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.started = []
+        self.release = threading.Event()
+
+    def __call__(self, prompt, chat_history, session_id):
+        self.started.append(time.monotonic())
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.reply
+
+
+@pytest.fixture
+def make_router():
+    routers = []
+
+    def make(backends, **options):
+        router = BackendRouter(backends, **options)
+        routers.append((router, backends))
+        return router
+
+    yield make
+    for router, backends in routers:
+        for backend in backends.values():
+            backend.release.set()
+        router.close()
+
+
+def seed(router, name, latency, samples=10):
+    for _ in range(samples):
+        router._backends[name].tracker.record(latency, True)
+
+
+def test_breaker_trips_then_admits_one_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow(), "only one probe at a time"
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.available()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow()
+
+
+def test_tripped_backend_is_skipped_until_reset(make_router):
+    broken, healthy = Backend(error="down"), Backend("fine", delay=0.01)
+    router = make_router({"broken": broken, "healthy": healthy}, failure_threshold=2, reset_timeout=0.2)
+    seed(router, "healthy", 0.5)  # slower on paper, so "broken" is tried first
+    for _ in range(2):
+        assert router.route("hi") == ("healthy", "fine")
+    assert router.stats()["backends"]["broken"]["state"] == OPEN
+    assert router.ranked() == ["healthy"]
+    router.route("hi")
+    assert len(broken.started) == 2
+
+    time.sleep(0.25)
+    broken.error = None
+    assert "broken" in router.ranked()
+    router.route("hi")
+    assert router.stats()["backends"]["broken"]["state"] == CLOSED
+
+
+def test_hedge_fires_at_the_primary_p95(make_router):
+    slow, fast = Backend("slow", delay=2.0), Backend("fast")
+    router = make_router({"slow": slow, "fast": fast})
+    seed(router, "slow", 0.05)
+    seed(router, "fast", 0.2)
+    started = time.monotonic()
+    assert router.route("hi") == ("fast", "fast")
+    hedged_after = fast.started[0] - slow.started[0]
+    assert 0.04 <= hedged_after < 0.5
+    assert time.monotonic() - started < 1.0
+    assert router.hedges == 1
+
+
+def test_no_hedge_when_the_primary_answers_in_time(make_router):
+    primary, spare = Backend("primary", delay=0.01), Backend("spare")
+    router = make_router({"primary": primary, "spare": spare})
+    seed(router, "primary", 0.2)
+    seed(router, "spare", 0.3)
+    assert router.route("hi") == ("primary", "primary")
+    assert router.hedges == 0 and spare.started == []
+
+
+def test_first_success_wins_after_a_failure(make_router):
+    failing, backup = Backend(error="boom"), Backend("saved")
+    router = make_router({"failing": failing, "backup": backup}, default_hedge_delay=5.0)
+    seed(router, "backup", 0.5)
+    started = time.monotonic()
+    assert router.route("hi") == ("backup", "saved")
+    assert time.monotonic() - started < 1.0, "a failure launches the next backend at once"
+    assert router.hedges == 0
+    assert router.stats()["backends"]["backup"]["wins"] == 1
+
+
+def test_all_failures_are_reported_together(make_router):
+    router = make_router({"a": Backend(error="boom"), "b": Backend(error="bang")})
+    with pytest.raises(RouterError) as raised:
+        router.route("hi")
+    assert "a: boom" in str(raised.value) and "b: bang" in str(raised.value)
+
+
+def test_deadline_raises_router_error(make_router):
+    router = make_router({"stuck": Backend(delay=5.0)}, timeout=0.1)
+    with pytest.raises(RouterError, match="no reply within"):
+        router.route("hi")
+
+
+def test_queued_hedge_is_cancelled_when_the_route_gives_up(make_router):
+    stuck, spare = Backend("stuck", delay=5.0), Backend("spare")
+    router = make_router({"stuck": stuck, "spare": spare}, max_workers=1, timeout=0.2)
+    seed(router, "stuck", 0.05)
+    seed(router, "spare", 0.3)
+    with pytest.raises(RouterError):
+        router.route("hi")
+    assert router.hedges == 1  # submitted, but queued behind the stuck call on the only worker
+    stuck.release.set()
+    time.sleep(0.1)
+    assert spare.started == []
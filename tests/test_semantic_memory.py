@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+
+from core.jarvis_core import JarvisMemory
+from core.vector_index import VectorIndex
+
+TOPICS = ["reactor core temperature", "reactor shield status", "reactor output level",
+          "weather in paris", "dinner reservation", "music playlist"]
+
+
+def open_memory(base_path):
+    return JarvisMemory(base_path, semantic=True)
+
+
+def store_topics(memory):
+    async def store():
+        for topic in TOPICS:
+            await memory.store_interaction(f"tell me about the {topic}", f"the {topic} is fine", "s1")
+        await asyncio.to_thread(memory.flush)
+
+    asyncio.run(store())
+
+
+def drop_vector(db_path, row_id, dim=256):
+    """Rewrite the index files without `row_id`, like a vector lost in a crash"""
+    index = VectorIndex(db_path, dim)
+    vectors, ids = (np.array(a) for a in index._mapped())
+    index.close()
+    keep = ids[:, 0] != row_id
+    db_path.with_suffix(".f32").write_bytes(vectors[keep].astype(np.float32).tobytes())
+    db_path.with_suffix(".ids").write_bytes(ids[keep].astype(np.int64).tobytes())
+
+
+def test_backfill_fills_gaps_below_the_last_indexed_id(tmp_path):
+    memory = open_memory(tmp_path)
+    store_topics(memory)
+    memory.close()
+    drop_vector(memory.db_path, 3)
+
+    memory = open_memory(tmp_path)
+    try:
+        asyncio.run(memory._writes.run(lambda: None))  # the backfill runs on the writer first
+        assert memory.vectors.row_ids().tolist() == [1, 2, 3, 4, 5, 6]
+        hits = asyncio.run(memory.semantic_search("reactor output level", limit=1))
+        assert [hit["id"] for hit in hits] == [3]
+    finally:
+        memory.close()
+
+
+def test_archived_hits_do_not_shrink_the_results(tmp_path):
+    memory = open_memory(tmp_path)
+    try:
+        store_topics(memory)
+        best = asyncio.run(memory.semantic_search("reactor", limit=2))
+        # Retention moves rows out of conversations; their vectors stay behind.
+        with memory.engine.transaction() as conn:
+            conn.executemany("DELETE FROM conversations WHERE id = ?", [(hit["id"],) for hit in best])
+        hits = asyncio.run(memory.semantic_search("reactor", limit=2))
+        assert len(hits) == 2
+        assert not {hit["id"] for hit in hits} & {hit["id"] for hit in best}
+        assert hits[0]["score"] >= hits[1]["score"]
+        assert len(asyncio.run(memory.semantic_search("reactor", limit=10))) == 4
+    finally:
+        memory.close()
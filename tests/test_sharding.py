@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from core import sharding
+from core.jarvis_core import JarvisMemory
+from core.sharding import DB_NAME, MARKER_FILE, STAGING_DIR, read_layout, reshard, status
+
+SESSIONS = [f"session-{i}" for i in range(8)]
+
+
+@pytest.fixture(autouse=True)
+def no_shard_env(monkeypatch):
+    monkeypatch.delenv(sharding.SHARDS_ENV, raising=False)
+
+
+def populate(base_path, turns=3):
+    async def store():
+        for session_id in SESSIONS:
+            for turn in range(turns):
+                await memory.store_interaction(f"{session_id} reactor question {turn}", "answer", session_id)
+        await asyncio.to_thread(memory.flush)
+
+    memory = JarvisMemory.open(base_path)
+    try:
+        asyncio.run(store())
+    finally:
+        memory.close()
+
+
+def row_counts(base_path):
+    return {name: files and files["rows"] for name, files in status(base_path)["files"].items()}
+
+
+def test_back_to_back_reshards_get_their_own_backups(tmp_path):
+    populate(tmp_path)
+    first = reshard(tmp_path, 3)
+    second = reshard(tmp_path, 1)
+    assert first["backup"] != second["backup"]
+    assert second["records"] == len(SESSIONS) * 3
+    assert row_counts(tmp_path) == {DB_NAME: len(SESSIONS) * 3}
+
+
+def test_interrupted_swap_is_finished_on_open(tmp_path, monkeypatch):
+    populate(tmp_path)
+    placed = []
+
+    def crash_after_one(source, target):
+        if placed:
+            raise KeyboardInterrupt("power cut")
+        placed.append(target)
+        source.replace(target)
+
+    monkeypatch.setattr(sharding, "_place", crash_after_one)
+    with pytest.raises(KeyboardInterrupt):
+        reshard(tmp_path, 3)
+    memory_path = tmp_path / "data" / "memory"
+    assert (memory_path / MARKER_FILE).exists()
+    monkeypatch.undo()
+
+    memory = JarvisMemory.open(tmp_path)
+    memory.close()
+    assert memory.shards == 3
+    assert not (memory_path / MARKER_FILE).exists() and not (memory_path / STAGING_DIR).exists()
+    assert read_layout(memory_path)["shards"] == 3
+    assert sum(row_counts(tmp_path).values()) == len(SESSIONS) * 3
+
+
+def test_round_trip_keeps_every_row_and_routes_by_session(tmp_path):
+    populate(tmp_path)
+    reshard(tmp_path, 3)
+    counts = row_counts(tmp_path)
+    assert list(counts) == [sharding.shard_name(i) for i in range(3)]
+    assert sum(counts.values()) == len(SESSIONS) * 3
+
+    memory = JarvisMemory.open(tmp_path)
+    try:
+        for session_id in SESSIONS:
+            rows = asyncio.run(memory.get_recent_context(session_id))
+            assert sorted(row["user_input"] for row in rows) == [
+                f"{session_id} reactor question {turn}" for turn in range(3)]
+        # Each shard holds exactly the sessions that hash to it.
+        for index in range(3):
+            expected = sum(3 for s in SESSIONS if sharding.shard_index(s, 3) == index)
+            assert counts[sharding.shard_name(index)] == expected
+    finally:
+        memory.close()
+
+    reshard(tmp_path, 1)
+    assert read_layout(tmp_path / "data" / "memory") is None
+    assert row_counts(tmp_path) == {DB_NAME: len(SESSIONS) * 3}
+
+
+def test_fan_out_merges_shards_and_tags_rows(tmp_path):
+    populate(tmp_path)
+    reshard(tmp_path, 3)
+    memory = JarvisMemory.open(tmp_path)
+    try:
+        activity = asyncio.run(memory.recent_activity(limit=100))
+        hits = asyncio.run(memory.search_context("reactor", limit=100))
+        one = asyncio.run(memory.search_context("reactor", session_id="session-5"))
+    finally:
+        memory.close()
+    assert len(activity) == len(SESSIONS) * 3
+    assert [(row["ts"], row["id"]) for row in activity] == sorted(
+        ((row["ts"], row["id"]) for row in activity), reverse=True)
+    assert {row["shard"] for row in activity} == {sharding.shard_index(s, 3) for s in SESSIONS}
+    assert all(row["shard"] == sharding.shard_index(row["session_id"], 3) for row in activity + hits)
+    assert len(hits) == len(SESSIONS) * 3
+    assert [row["score"] for row in hits] == sorted((row["score"] for row in hits), reverse=True)
+    assert {row["session_id"] for row in one} == {"session-5"}
+    assert {row["shard"] for row in one} == {sharding.shard_index("session-5", 3)}
+
+
+def test_open_follows_the_layout_on_disk(tmp_path, monkeypatch):
+    memory = JarvisMemory.open(tmp_path)
+    memory.close()
+    assert isinstance(memory, JarvisMemory)
+
+    monkeypatch.setenv(sharding.SHARDS_ENV, "2")
+    memory = JarvisMemory.open(tmp_path)  # empty single file: a new sharded store is fine
+    memory.close()
+    assert isinstance(memory, sharding.ShardedMemory)
+    monkeypatch.delenv(sharding.SHARDS_ENV)
+
+    memory = JarvisMemory.open(tmp_path)  # shards.json now decides
+    memory.close()
+    assert memory.shards == 2
+    with pytest.raises(ValueError, match="sharded"):
+        JarvisMemory.open(tmp_path, shards=1)
+    with pytest.raises(ValueError, match="2 shards, not 3"):
+        JarvisMemory.open(tmp_path, shards=3)
+
+
+def test_sharding_refuses_an_unsharded_store_with_rows(tmp_path):
+    populate(tmp_path, turns=1)
+    with pytest.raises(ValueError, match="not sharded yet"):
+        JarvisMemory.open(tmp_path, shards=2)
@@ -0,0 +1,95 @@
+import threading
+
+from voice import NullEngine, SentenceChunker, Speaker, split_sentences
+
+
+class BlockingEngine(NullEngine):
+    """Holds each sentence until stop() (or release()) is called"""
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.stops = 0
+        self._go = threading.Event()
+
+    def say(self, text):
+        self.started.set()
+        self._go.wait(5)
+        self._go.clear()
+        super().say(text)
+
+    def release(self):
+        self._go.set()
+
+    def stop(self):
+        self.stops += 1
+        self._go.set()
+
+
+def test_chunker_emits_sentences_as_they_end():
+    chunker = SentenceChunker()
+    assert chunker.feed("Hello there. How") == ["Hello there."]
+    assert chunker.feed(" are you? I am") == ["How are you?"]
+    assert chunker.feed(' "fine!" Next') == ['I am "fine!"']
+    assert chunker.flush() == ["Next"]
+    assert chunker.flush() == []
+
+
+def test_split_sentences_handles_blank_lines_and_decimals():
+    assert split_sentences("Version 2.5 is out.\n\nSecond part") == ["Version 2.5 is out.", "Second part"]
+
+
+def test_sentences_are_spoken_in_order():
+    engine = NullEngine()
+    speaker = Speaker(engine)
+    speaker.speak("One. Two!")
+    speaker.speak("Three?")
+    speaker.wait()
+    assert engine.spoken == ["One.", "Two!", "Three?"]
+    speaker.close()
+
+
+def test_speak_stream_passes_chunks_through_and_queues_sentences():
+    engine = NullEngine()
+    speaker = Speaker(engine)
+    chunks = ["The reac", "tor is stable. Pow", "er at 40", "%"]
+    assert list(speaker.speak_stream(chunks)) == chunks
+    speaker.wait()
+    assert engine.spoken == ["The reactor is stable.", "Power at 40%"]
+    speaker.close()
+
+
+def test_interrupt_drops_the_queue_and_stops_the_engine():
+    engine = BlockingEngine()
+    speaker = Speaker(engine)
+    speaker.speak("First. Second. Third.")
+    assert engine.started.wait(5)
+    speaker.interrupt()
+    speaker.wait()
+    assert engine.stops == 1
+    assert engine.spoken == ["First."]  # cut off mid-sentence; the rest never starts
+
+    speaker.speak("After.")
+    engine.release()
+    speaker.wait()
+    assert engine.spoken == ["First.", "After."]
+    speaker.close()
+
+
+def test_interrupt_discards_a_stream_still_in_progress():
+    engine = NullEngine()
+    speaker = Speaker(engine)
+    stream = speaker.speak_stream(["Old reply. Still", " old."])
+    next(stream)
+    speaker.interrupt()
+    list(stream)  # the rest of the old stream is queued under a stale generation
+    speaker.speak("New reply.")
+    speaker.wait()
+    assert "Still old." not in engine.spoken
+    assert engine.spoken[-1] == "New reply."
+    speaker.close()
+
+
+def test_close_stops_the_thread():
+    speaker = Speaker(NullEngine())
+    speaker.close()
+    assert not speaker._thread.is_alive()
@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+from core.storage import SQLiteEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SQLiteEngine(tmp_path / "test.db", durability="group", batch_size=1000,
+                          flush_interval=60, busy_timeout=0.05)
+    engine.executescript("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)")
+    yield engine
+    engine.close()
+
+
+def count(engine):
+    return engine.read("SELECT COUNT(*) FROM t")[0][0]
+
+
+def test_busy_database_keeps_the_batch(engine, tmp_path):
+    for i in range(5):
+        engine.write("INSERT INTO t (v) VALUES (?)", (f"row{i}",))
+    other = sqlite3.connect(tmp_path / "test.db", isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        engine.flush()
+    other.execute("ROLLBACK")
+    other.close()
+    engine.flush()
+    assert count(engine) == 5
+
+
+def test_bad_row_fails_alone(engine):
+    committed, errors = [], []
+    engine.write("INSERT INTO t (v) VALUES (?)", ("dup",), on_commit=committed.append)
+    engine.write("INSERT INTO t (v) VALUES (?)", ("dup",), on_error=errors.append)
+    engine.write("INSERT INTO t (v) VALUES (?)", ("other",), on_commit=committed.append)
+    engine.flush()
+    assert count(engine) == 2
+    assert len(committed) == 2
+    assert len(errors) == 1 and isinstance(errors[0], sqlite3.IntegrityError)
+
+
+def test_turn_mode_raises_to_the_caller(tmp_path):
+    with SQLiteEngine(tmp_path / "turn.db") as engine:
+        engine.executescript("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)")
+        engine.write("INSERT INTO t (v) VALUES (?)", ("a",))
+        with pytest.raises(sqlite3.IntegrityError):
+            engine.write("INSERT INTO t (v) VALUES (?)", ("a",))
+        engine.write("INSERT INTO t (v) VALUES (?)", ("b",))
+        assert count(engine) == 2
@@ -0,0 +1,77 @@
+import asyncio
+
+from core.jarvis_core import JarvisMemory
+from transcript import Transcript, Turn
+
+
+def answered(transcript, prompt, **replies):
+    turn = transcript.add(prompt)
+    for backend, text in replies.items():
+        turn.set_reply(backend, text)
+    return turn
+
+
+def test_messages_hold_only_the_turns_a_backend_answered():
+    transcript = Transcript()
+    answered(transcript, "Both?", openai="Yes.", llama="Yep.")
+    answered(transcript, "Just OpenAI?", openai="Only me.")
+    assert transcript.messages("llama") == [{"role": "user", "content": "Both?"},
+                                            {"role": "assistant", "content": "Yep."}]
+    assert len(transcript.messages("openai")) == 4
+
+
+def test_markdown_is_cached_per_turn_until_a_reply_changes():
+    turn = Turn("Status?", {"openai": "Fine."})
+    assert turn.markdown("llama") == "**You:** Status?\n\n**Jarvis:** _[OpenAI was used]_"
+    first = turn.markdown("openai")
+    assert turn.markdown("openai") is first
+    turn.set_reply("openai", "Better.")
+    assert turn.markdown("openai").endswith("Better.")
+
+
+def test_render_shows_only_the_visible_window():
+    transcript = Transcript(window=2)
+    for i in range(5):
+        answered(transcript, f"q{i}", openai=f"a{i}")
+    assert transcript.render("openai").count("**You:**") == 2
+    assert "q4" in transcript.render("openai") and "q2" not in transcript.render("openai")
+    assert transcript.has_older
+
+
+def test_trimmed_turns_are_paged_back_in_from_memory(tmp_path):
+    memory = JarvisMemory(tmp_path)
+    transcript = Transcript(window=2, keep=3, page_size=2)
+
+    async def scenario():
+        for i in range(6):
+            turn = answered(transcript, f"q{i}", openai=f"a{i}", llama=f"l{i}")
+            await transcript.persist(memory, turn, "openai")
+        transcript.trim()
+        assert [turn.prompt for turn in transcript.turns] == ["q3", "q4", "q5"]
+        assert not transcript.exhausted
+        loaded = [await transcript.load_older(memory) for _ in range(3)]
+        return loaded
+
+    try:
+        loaded = asyncio.run(scenario())
+    finally:
+        memory.close()
+    assert loaded == [1, 2, 0]  # the window first grows past the 3 turns still held
+    assert transcript.exhausted
+    assert [turn.prompt for turn in transcript.turns] == [f"q{i}" for i in range(6)]
+    assert transcript.turns[0].replies == {"openai": "a0", "llama": "l0"}
+
+
+def test_archived_summaries_render_as_one_turn():
+    turn = Turn.from_row({"id": 7, "user_input": "", "response": "Talked about the reactor.",
+                          "context": {"summary_of": 12, "first_id": 1}})
+    assert turn.prompt == "_(summary of 12 archived turns)_"
+    assert turn.replies == {"openai": "Talked about the reactor."} and turn.row_id == 7
+
+
+def test_clear_starts_a_new_session():
+    transcript = Transcript()
+    answered(transcript, "Hi", openai="Hello.")
+    old = transcript.session_id
+    transcript.clear()
+    assert transcript.session_id != old and transcript.turns == [] and transcript.exhausted
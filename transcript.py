@@ -0,0 +1,124 @@
+"""
+Compact chat transcript for the Streamlit UIs.
+
+One list of turns, each holding the prompt once and the replies keyed by
+backend, replaces the per-backend message lists. Only the newest `keep`
+turns stay in memory; completed turns are persisted to JarvisMemory, and
+older ones are paged back in on demand. Each turn caches its rendered
+markdown, so a rerun costs the same however long the session has run.
+"""
+import uuid
+from typing import Dict, List, Optional
+
+LABELS = {"openai": "OpenAI", "llama": "Llama"}
+
+
+class Turn:
+    __slots__ = ("prompt", "replies", "row_id", "_markdown")
+
+    def __init__(self, prompt: str, replies: Optional[Dict[str, str]] = None,
+                 row_id: Optional[int] = None):
+        self.prompt = prompt
+        self.replies = dict(replies or {})
+        self.row_id = row_id
+        self._markdown: Dict[str, str] = {}
+
+    def set_reply(self, backend: str, text: str):
+        self.replies[backend] = text
+        self._markdown.clear()
+
+    def markdown(self, backend: str) -> str:
+        """This turn as shown in `backend`'s column (formatted once)"""
+        cached = self._markdown.get(backend)
+        if cached is None:
+            if backend in self.replies:
+                reply = self.replies[backend]
+            else:
+                others = ", ".join(LABELS.get(name, name) for name in self.replies)
+                reply = f"_[{others} was used]_" if others else "…"
+            cached = self._markdown[backend] = f"**You:** {self.prompt}\n\n**Jarvis:** {reply}"
+        return cached
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "Turn":
+        context = row.get("context") or {}
+        replies = context.get("replies") or {"openai": row["response"]}
+        prompt = row["user_input"]
+        if context.get("summary_of"):
+            prompt = f"_(summary of {context['summary_of']} archived turns)_"
+        return cls(prompt, replies, row["id"])
+
+
+class Transcript:
+    """Recent turns of one UI session, backed by JarvisMemory for older ones."""
+    def __init__(self, session_id: Optional[str] = None, window: int = 20, keep: int = 200,
+                 page_size: int = 20):
+        self.session_id = session_id or f"ui-{uuid.uuid4().hex}"
+        self.window = window
+        self.keep = keep
+        self.page_size = page_size
+        self.visible = window
+        self.turns: List[Turn] = []
+        self.exhausted = True  # nothing older left in JarvisMemory (true for a new session)
+
+    def add(self, prompt: str) -> Turn:
+        turn = Turn(prompt)
+        self.turns.append(turn)
+        return turn
+
+    def messages(self, backend: str) -> List[Dict]:
+        """Chat history as `backend` saw it (turns it answered)"""
+        messages = []
+        for turn in self.turns:
+            if backend in turn.replies:
+                messages.append({"role": "user", "content": turn.prompt})
+                messages.append({"role": "assistant", "content": turn.replies[backend]})
+        return messages
+
+    def render(self, backend: str) -> str:
+        """Markdown for the visible window of `backend`'s column"""
+        return "\n\n---\n\n".join(turn.markdown(backend) for turn in self.turns[-self.visible:])
+
+    @property
+    def has_older(self) -> bool:
+        return len(self.turns) > self.visible or not self.exhausted
+
+    def trim(self):
+        """Back to the recent window; drop turns beyond `keep` (they live in JarvisMemory)"""
+        self.visible = self.window
+        if len(self.turns) > self.keep:
+            del self.turns[:len(self.turns) - self.keep]
+            self.exhausted = False
+
+    async def persist(self, memory, turn: Turn, primary: str):
+        """Store a finished turn; the primary backend's reply is the row's response"""
+        await memory.store_interaction(turn.prompt, turn.replies.get(primary, ""),
+                                       self.session_id, {"replies": turn.replies})
+
+    async def load_older(self, memory) -> int:
+        """Widen the window by a page, fetching turns from JarvisMemory if needed"""
+        self.visible += self.page_size
+        missing = self.visible - len(self.turns)
+        if missing <= 0 or self.exhausted:
+            return 0
+        before_id = self.turns[0].row_id if self.turns else None
+        # Without a row id for the oldest turn, skip the rows already in memory.
+        skip = len(self.turns) if before_id is None else 0
+        rows = []
+        async for row in memory.iter_history(self.session_id, before_id, page_size=missing + skip):
+            if skip:
+                skip -= 1
+                continue
+            rows.append(row)
+            if len(rows) >= missing:
+                break
+        self.exhausted = len(rows) < missing
+        self.turns[:0] = [Turn.from_row(row) for row in reversed(rows)]
+        return len(rows)
+
+    def clear(self):
+        """Start a new session (the old one stays in JarvisMemory)"""
+        self.session_id = f"ui-{uuid.uuid4().hex}"
+        self.turns = []
+        self.visible = self.window
+        self.exhausted = True
@@ -0,0 +1,237 @@
+"""
+Pooled HTTP client for OpenAI-compatible chat backends (LM Studio, OpenAI).
+
+One `BackendClient` per base URL keeps a keep-alive connection pool, caps
+the number of requests in flight, applies connect/read timeouts and retries
+429/5xx responses and connection errors with jittered exponential backoff.
+`AsyncBackendClient` exposes the same calls to coroutines.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from utils import metrics
+from utils.lazy import lazy_import
+
+# Loaded when the first client is created (~0.1s), not when this module is imported.
+requests = lazy_import("requests")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class BackendError(RuntimeError):
+    """The backend could not produce a response"""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class BackendClient:
+    """Thread-safe, pooled client for one OpenAI-compatible endpoint."""
+    def __init__(self, base_url: str, api_key: Optional[str] = None, model: Optional[str] = None,
+                 connect_timeout: float = 3.05, read_timeout: float = 120.0,
+                 max_connections: int = 16, max_concurrency: int = 8,
+                 max_retries: int = 3, backoff: float = 0.25, max_backoff: float = 8.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _delay(self, attempt: int, response=None) -> float:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(self.max_backoff, float(retry_after)))
+            except ValueError:
+                pass
+        return delay
+
+    def _request(self, method: str, path: str, stream: bool = False, **kwargs) -> "requests.Response":
+        """Send with retries; the caller must hold a concurrency slot"""
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, url, timeout=self.timeout,
+                                                stream=stream, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise BackendError(f"{method} {url} failed: {e}") from e
+                time.sleep(self._delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                response.close()
+                time.sleep(self._delay(attempt, response))
+                continue
+            if response.status_code >= 400:
+                body = response.text[:200]
+                response.close()
+                raise BackendError(f"{method} {url} returned {response.status_code}: {body}",
+                                   status=response.status_code)
+            return response
+
+    @staticmethod
+    def _json(response) -> Dict:
+        """Decoded body; a malformed one is a BackendError like any other failure"""
+        try:
+            return response.json()
+        except ValueError as e:
+            raise BackendError(f"{response.url} returned a malformed body: {e}",
+                               status=response.status_code) from e
+
+    def _payload(self, messages: List[Dict], model: Optional[str], params: Dict) -> Dict:
+        payload = {"messages": messages, **params}
+        if model or self.model:
+            payload["model"] = model or self.model
+        return payload
+
+    def chat_completion(self, messages: List[Dict], model: Optional[str] = None, **params) -> Dict:
+        """POST /v1/chat/completions and return the decoded JSON body"""
+        with self._slots:
+            response = self._request("POST", "/v1/chat/completions",
+                                     json=self._payload(messages, model, params))
+            return self._json(response)
+
+    def complete(self, messages: List[Dict], model: Optional[str] = None, **params) -> str:
+        """Just the assistant's reply text"""
+        body = self.chat_completion(messages, model, **params)
+        try:
+            return body["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            raise BackendError(f"unexpected chat completion body: {str(body)[:200]}") from e
+
+    def complete_batch(self, prompts: List[str], model: Optional[str] = None, **params) -> List[str]:
+        """POST several raw prompts to /v1/completions in one request; texts in prompt order"""
+        payload = {"prompt": list(prompts), **params}
+        if model or self.model:
+            payload["model"] = model or self.model
+        with self._slots:
+            body = self._json(self._request("POST", "/v1/completions", json=payload))
+        try:
+            choices = sorted(body.get("choices", []), key=lambda choice: choice.get("index", 0))
+            texts = [choice.get("text", "").strip() for choice in choices]
+        except (TypeError, AttributeError) as e:
+            raise BackendError(f"unexpected completions body: {str(body)[:200]}") from e
+        if len(texts) != len(prompts):
+            raise BackendError(f"expected {len(prompts)} completions, got {len(texts)}")
+        return texts
+
+    def stream_chat_completion(self, messages: List[Dict], model: Optional[str] = None,
+                               **params) -> Iterator[str]:
+        """Yield content deltas from a server-sent-events completion"""
+        with self._slots:
+            payload = self._payload(messages, model, {**params, "stream": True})
+            response = self._request("POST", "/v1/chat/completions", stream=True, json=payload)
+            with response:
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data).get("choices") or [{}]
+                    except (ValueError, AttributeError) as e:
+                        raise BackendError(f"malformed stream event: {data[:200]}") from e
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+    def list_models(self) -> List[str]:
+        with self._slots:
+            response = self._request("GET", "/v1/models")
+            try:
+                return [model["id"] for model in self._json(response).get("data", [])]
+            except (KeyError, TypeError, AttributeError) as e:
+                raise BackendError(f"unexpected model list from {self.base_url}") from e
+
+    def is_ready(self) -> bool:
+        """True when the server answers /v1/models"""
+        try:
+            self.list_models()
+            return True
+        except BackendError:
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncBackendClient:
+    """Coroutine front end for a BackendClient.
+
+    Blocking HTTP calls run on a private thread pool sized to the client's
+    concurrency limit, so the event loop never waits on the network.
+    """
+    def __init__(self, client: BackendClient):
+        self.client = client
+        self._executor = ThreadPoolExecutor(
+            max_workers=client.max_concurrency, thread_name_prefix="jarvis-backend"
+        )
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, metrics.bind(lambda: fn(*args, **kwargs)))
+
+    async def chat_completion(self, messages: List[Dict], model: Optional[str] = None, **params) -> Dict:
+        return await self._call(self.client.chat_completion, messages, model, **params)
+
+    async def complete(self, messages: List[Dict], model: Optional[str] = None, **params) -> str:
+        return await self._call(self.client.complete, messages, model, **params)
+
+    async def stream_chat_completion(self, messages: List[Dict], model: Optional[str] = None, **params):
+        chunks = self.client.stream_chat_completion(messages, model, **params)
+        pending = None
+        try:
+            while True:
+                pending = self._executor.submit(metrics.bind(next), chunks, None)
+                chunk = await asyncio.wrap_future(pending)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            if pending is not None and not pending.done():
+                # Cancelled mid-read: a generator can't be closed while next() is
+                # still running on its thread, so close it there once that returns.
+                pending.add_done_callback(lambda _: chunks.close())
+            else:
+                await self._call(chunks.close)
+
+    async def is_ready(self) -> bool:
+        return await self._call(self.client.is_ready)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_clients: Dict[str, BackendClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: str, **kwargs) -> BackendClient:
+    """Process-wide shared client for `base_url` (options apply on first use)"""
+    key = base_url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = BackendClient(key, **kwargs)
+        return client
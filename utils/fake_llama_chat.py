@@ -0,0 +1,59 @@
+"""
+Stand-in for `llama_worker.py --serve` that needs no model weights.
+
+Speaks the same JSON-lines protocol and echoes the prompt back, so the
+worker protocol, streaming and restart logic can be exercised offline:
+
+    python utils/fake_llama_chat.py -m fake.gguf --load-delay 0.5 --crash-after 3
+    python utils/fake_llama_chat.py -m fake.gguf --echo-history
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake resident llama worker")
+    parser.add_argument("-m", "--model", default="fake.gguf")
+    parser.add_argument("--serve", action="store_true", help="accepted for command-line compatibility")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="seconds spent 'loading' the model")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--crash-after", type=int, default=0,
+                        help="exit abruptly while handling this request number (0 = never)")
+    parser.add_argument("--crash-marker", default="",
+                        help="crash only once: skip crashing when this file exists, create it otherwise")
+    parser.add_argument("--echo-history", action="store_true",
+                        help="end each reply with the history it was sent, as JSON")
+    args = parser.parse_args()
+
+    time.sleep(args.load_delay)
+    print(json.dumps({"ready": True, "model": args.model, "pid": os.getpid()}), flush=True)
+
+    handled = 0
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        handled += 1
+        if args.crash_after and handled == args.crash_after:
+            if not args.crash_marker or not os.path.exists(args.crash_marker):
+                if args.crash_marker:
+                    open(args.crash_marker, "w").close()
+                os._exit(1)
+
+        reply = f"Fake Jarvis reply to: {request['prompt']}"
+        if args.echo_history:
+            reply += f" history={json.dumps(request.get('history') or [], separators=(',', ':'))}"
+        words = reply.split(" ")
+        tokens = [word if i == 0 else " " + word for i, word in enumerate(words)]
+        for token in tokens:
+            time.sleep(args.token_delay)
+            if request.get("stream"):
+                print(json.dumps({"id": request["id"], "delta": token}), flush=True)
+        print(json.dumps({"id": request["id"], "text": "".join(tokens), "done": True}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Cold-start import report scoped to this project.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+attributes the time to project modules, listing for each one the heavy
+third-party imports it pulls in directly. Results can be saved as a
+baseline and later compared against it to catch start-up regressions:
+
+    python utils/importtime.py chat voice
+    python utils/importtime.py chat voice --save-baseline importtime.json
+    python utils/importtime.py chat voice --baseline importtime.json --tolerance 0.25
+
+The committed baseline for DEFAULT_TARGETS is benchmarks/importtime.json;
+tests/test_importtime.py checks against it.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TARGETS = ("chat", "voice", "config_store", "core.jarvis_core")
+BASELINE = PROJECT_ROOT / "benchmarks" / "importtime.json"
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def project_modules(root: Path = PROJECT_ROOT) -> Set[str]:
+    """Top-level module and package names that belong to the project"""
+    names = {path.stem for path in root.glob("*.py")}
+    names.update(path.parent.name for path in root.glob("*/__init__.py"))
+    return names
+
+
+def measure(module: str, root: Path = PROJECT_ROOT) -> List[Dict]:
+    """One cold import of `module`: a list of {name, self_us, cumulative_us, depth}"""
+    env = dict(os.environ, PYTHONPATH=str(root), PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=root, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({"name": name, "self_us": int(self_us),
+                            "cumulative_us": int(cumulative_us), "depth": len(indent) // 2})
+    return entries
+
+
+def summarize(entries: List[Dict], project: Set[str]) -> Dict:
+    """Per project module: its own time, cumulative time and direct third-party imports"""
+    modules = {}
+    stack = []  # (depth, name, is_project) of the enclosing imports
+    # -X importtime prints children before their parent, so walk it backwards.
+    for entry in reversed(entries):
+        while stack and stack[-1][0] >= entry["depth"]:
+            stack.pop()
+        is_project = entry["name"].split(".")[0] in project
+        if is_project:
+            modules[entry["name"]] = {"self_ms": entry["self_us"] / 1000.0,
+                                      "cumulative_ms": entry["cumulative_us"] / 1000.0,
+                                      "imports": {}}
+        elif stack and stack[-1][2]:
+            modules[stack[-1][1]]["imports"][entry["name"]] = entry["cumulative_us"] / 1000.0
+        stack.append((entry["depth"], entry["name"], is_project))
+    return modules
+
+
+def cold_import(module: str, runs: int = 3) -> Tuple[float, List[Dict]]:
+    """Median cumulative import time of `module` in ms, and the entries of that run"""
+    samples = [measure(module) for _ in range(runs)]
+    totals = []
+    for entries in samples:
+        top_level = [e for e in entries if e["name"] == module]
+        totals.append(top_level[-1]["cumulative_us"] / 1000.0 if top_level else 0.0)
+    median = statistics.median_low(totals)
+    return median, samples[totals.index(median)]
+
+
+def compare(timings: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float = 0.25, slack_ms: float = 5.0) -> List[Dict]:
+    """Check each timing against the baseline: {module, ms, baseline_ms, limit_ms, ok}
+
+    Modules missing from the baseline are skipped.
+    """
+    results = []
+    for module, ms in timings.items():
+        if module not in baseline:
+            continue
+        limit = baseline[module] * (1 + tolerance) + slack_ms
+        results.append({"module": module, "ms": ms, "baseline_ms": baseline[module],
+                        "limit_ms": limit, "ok": ms <= limit})
+    return results
+
+
+def report(module: str, runs: int = 3, top: int = 10) -> float:
+    """Print the breakdown for `module`; returns its median cumulative import time in ms"""
+    median, entries = cold_import(module, runs)
+    modules = summarize(entries, project_modules())
+
+    print(f"\n📦 import {module}: {median:.1f} ms (median of {runs})")
+    ranked = sorted(modules.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    for name, info in ranked[:top]:
+        print(f"  {info['cumulative_ms']:8.1f} ms  {name} (self {info['self_ms']:.1f} ms)")
+        heavy = sorted(info["imports"].items(), key=lambda item: item[1], reverse=True)[:3]
+        for dependency, ms in heavy:
+            if ms >= 1.0:
+                print(f"  {'':11}  └─ {dependency} {ms:.1f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project-scoped import-time report")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_TARGETS))
+    parser.add_argument("--runs", type=int, default=3, help="cold imports per module")
+    parser.add_argument("--top", type=int, default=10, help="project modules listed per target")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the timings as a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if slower than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown over the baseline (fraction)")
+    parser.add_argument("--slack-ms", type=float, default=5.0,
+                        help="absolute slowdown always allowed (absorbs timer noise)")
+    args = parser.parse_args()
+
+    timings = {module: report(module, args.runs, args.top) for module in args.modules}
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(timings, indent=2) + "\n")
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        results = compare(timings, baseline, args.tolerance, args.slack_ms)
+        print()
+        for result in results:
+            print(f"{'✅' if result['ok'] else '❌'} {result['module']}: {result['ms']:.1f} ms "
+                  f"(baseline {result['baseline_ms']:.1f} ms, limit {result['limit_ms']:.1f} ms)")
+        if not all(result["ok"] for result in results):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
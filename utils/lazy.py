@@ -0,0 +1,54 @@
+"""
+Deferred imports for heavy optional backends.
+
+    openai = lazy_import("openai")   # nothing imported yet
+    openai.api_key = key             # imports openai here, once per process
+
+Streamlit re-executes its scripts on every interaction, so modules they
+import should not pay for libraries that the current run never touches.
+"""
+import importlib
+import sys
+import threading
+
+
+class LazyModule:
+    """Module proxy that performs the real import on first attribute access."""
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            with object.__getattribute__(self, "_lock"):
+                module = object.__getattribute__(self, "_module")
+                if module is None:
+                    module = importlib.import_module(object.__getattribute__(self, "_name"))
+                    object.__setattr__(self, "_module", module)
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the module has been imported (by this proxy or anyone else)"""
+        return (object.__getattribute__(self, "_module") is not None
+                or object.__getattribute__(self, "_name") in sys.modules)
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{object.__getattribute__(self, '_name')}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Proxy for module `name`; the import (and any ImportError) happens on first use"""
+    return LazyModule(name)
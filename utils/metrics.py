@@ -0,0 +1,513 @@
+"""
+Per-turn tracing and metrics.
+
+    from utils import metrics
+
+    with metrics.span("chat.turn", model="openai") as turn:
+        with metrics.span("context.build"):
+            ...
+        turn.set(tokens_out=42)
+    metrics.incr("jarvis_response_cache_total", result="hit")
+    metrics.observe("jarvis_db_seconds", 0.002, worker="jarvis-db-writer")
+
+Spans nest per thread / asyncio task, and metrics.bind(fn) carries the
+current span into work handed to another thread; when the outermost span
+(the turn) ends, the whole tree can be written to a JSONL trace log. Counters, gauges
+and histograms are exported in the Prometheus text format, to a file or
+over HTTP (GET /metrics on jarvis_server). An optional sampling profiler
+records the stacks of turns slower than a threshold.
+
+Everything is off unless JARVIS_METRICS=1 is set or configure(enabled=True)
+is called; disabled, span() hands out one shared no-op object and the
+record functions return immediately. With JARVIS_METRICS=1 the exporters
+can also come from the environment: JARVIS_TRACE_LOG (JSONL path),
+JARVIS_METRICS_FILE (Prometheus text path) and JARVIS_PROFILE_THRESHOLD
+(seconds).
+"""
+import contextvars
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_enabled = False
+_current: contextvars.ContextVar = contextvars.ContextVar("jarvis_span", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Counters, gauges and histograms keyed by name and label set."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple] = {}
+        self.counters: Dict[str, Dict[Tuple, float]] = {}
+        self.gauges: Dict[str, Dict[Tuple, float]] = {}
+        self.histograms: Dict[str, Dict[Tuple, _Histogram]] = {}
+
+    def describe(self, name: str, help_text: str, buckets: Optional[Tuple] = None):
+        """HELP text (and histogram buckets) for a metric; call before first use"""
+        with self._lock:
+            self._help[name] = help_text
+            if buckets is not None:
+                self._buckets[name] = tuple(buckets)
+
+    def incr(self, name: str, value: float, labels: Dict):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Dict):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: Dict):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self._buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """Plain-dict copy: {"counters": ..., "gauges": ..., "histograms": ...}"""
+        def labelled(series, value):
+            return [{"labels": dict(key), **value(item)} for key, item in series.items()]
+        with self._lock:
+            return {
+                "counters": {name: labelled(series, lambda v: {"value": v})
+                             for name, series in self.counters.items()},
+                "gauges": {name: labelled(series, lambda v: {"value": v})
+                           for name, series in self.gauges.items()},
+                "histograms": {name: labelled(series, lambda h: {"count": h.count, "sum": h.sum})
+                               for name, series in self.histograms.items()},
+            }
+
+    def prometheus_text(self) -> str:
+        """Everything in the Prometheus text exposition format"""
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                       for k, v in pairs)
+            return "{" + ",".join(escaped) + "}"
+
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted(metrics):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(metrics[name].items()):
+                        lines.append(f"{name}{fmt(labels)} {value:g}")
+            for name in sorted(self.histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', f'{bound:g}')])} {cumulative}")
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{fmt(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """One timed stage of a turn; use via metrics.span()."""
+    __slots__ = ("name", "attrs", "parent", "children", "started", "wall_started",
+                 "duration", "error", "trace_id", "_token", "_sampling")
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.children: List["Span"] = []
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        self.parent = _current.get()
+        if self.parent is None:
+            self.trace_id = f"{random.getrandbits(64):016x}"
+        else:
+            self.trace_id = self.parent.trace_id
+            self.parent.children.append(self)
+        self._token = _current.set(self)
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        self._sampling = _attach(self.trace_id, begin=self.parent is None)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Ended in another context (e.g. a generator finished by another task).
+            _current.set(self.parent)
+        _detach(self.trace_id, self._sampling)
+        registry.observe("jarvis_span_seconds", self.duration, {"span": self.name})
+        if self.parent is None:
+            _finish_trace(self)
+        return False
+
+    def as_dict(self) -> Dict:
+        record = {"name": self.name, "duration_ms": round(1000 * (self.duration or 0.0), 3)}
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.error:
+            record["error"] = self.error
+        if self.children:
+            record["children"] = [child.as_dict() for child in self.children]
+        return record
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class SlowTurnProfiler:
+    """Samples the stacks of the threads working on a turn; keeps them for slow turns.
+
+    Samples are kept per trace. A thread works on a trace while one of the
+    trace's spans is open on it or while it runs a call handed over with
+    bind(). A thread shared by several turns, such as an event loop, only
+    counts for the turn whose task it is running at that moment. While at
+    least one turn is running, a daemon thread wakes every `interval`
+    seconds and folds each such thread's stack into a "outer;inner;leaf"
+    string. Turns that end within `threshold` seconds discard their
+    samples.
+    """
+    def __init__(self, threshold: float, interval: float = 0.005, top: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self.top = top
+        self._samples: Dict[str, Counter] = {}
+        self._workers: Dict[str, Counter] = {}  # trace id -> (thread ident, task) -> open count
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="jarvis-profiler", daemon=True)
+        self._thread.start()
+
+    def begin(self, trace_id: str):
+        with self._lock:
+            self._samples[trace_id] = Counter()
+            self._workers[trace_id] = Counter()
+
+    def attach(self, trace_id: str) -> Optional[Tuple]:
+        """Sample the calling thread (and task) for `trace_id` until detach()"""
+        worker = (threading.get_ident(), _running_task())
+        with self._lock:
+            workers = self._workers.get(trace_id)
+            if workers is None:
+                return None
+            workers[worker] += 1
+        self._wake.set()
+        return worker
+
+    def detach(self, trace_id: str, worker: Tuple):
+        with self._lock:
+            workers = self._workers.get(trace_id)
+            if workers is not None:
+                workers[worker] -= 1
+                if workers[worker] <= 0:
+                    del workers[worker]
+
+    def end(self, trace_id: str, duration: float) -> Optional[List[Dict]]:
+        with self._lock:
+            self._workers.pop(trace_id, None)
+            samples = self._samples.pop(trace_id, None)
+        if not samples or duration < self.threshold:
+            return None
+        return [{"stack": stack, "samples": count} for stack, count in samples.most_common(self.top)]
+
+    def stop(self):
+        """End the sampling thread; the profiler records nothing afterwards"""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=1)
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                active = {trace_id: list(workers) for trace_id, workers in self._workers.items() if workers}
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            stacks: Dict[int, str] = {}
+            sampled = set()
+            for trace_id, workers in active.items():
+                for ident, task in workers:
+                    if ident not in frames or (task is not None and not _is_running(task)):
+                        continue
+                    if ident not in stacks:
+                        stacks[ident] = self._fold(frames[ident])
+                    sampled.add((trace_id, stacks[ident]))
+            del frames
+            with self._lock:
+                for trace_id, stack in sampled:
+                    if trace_id in self._samples:
+                        self._samples[trace_id][stack] += 1
+            self._stopped.wait(self.interval)
+
+
+def _running_task():
+    """The asyncio task running on this thread, if any"""
+    asyncio = sys.modules.get("asyncio")  # no loop can be running before it's imported
+    if asyncio is None:
+        return None
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+def _is_running(task) -> bool:
+    """True while `task` (not another task on its loop) holds its thread"""
+    try:
+        return sys.modules["asyncio"].current_task(task.get_loop()) is task
+    except Exception:
+        return False
+
+
+registry = Registry()
+_trace_log: Optional[Path] = None
+_trace_lock = threading.Lock()
+_prometheus_file: Optional[Path] = None
+_prometheus_interval = 5.0
+_prometheus_written = 0.0
+_profiler: Optional[SlowTurnProfiler] = None
+_slow_turn_hooks: List[Callable[[Dict], None]] = []
+
+
+def configure(enabled: bool = True, trace_log: Optional[str] = None,
+              prometheus_file: Optional[str] = None, prometheus_interval: float = 5.0,
+              profile_threshold: Optional[float] = None, profile_interval: float = 0.005):
+    """Turn instrumentation on or off and choose the exporters.
+
+    `trace_log` receives one JSON line per finished turn, `prometheus_file`
+    is rewritten at most every `prometheus_interval` seconds, and with
+    `profile_threshold` the stacks of slower turns are sampled and attached
+    to their trace.
+    """
+    global _enabled, _trace_log, _prometheus_file, _prometheus_interval, _profiler
+    _enabled = enabled
+    _trace_log = Path(trace_log) if trace_log else None
+    _prometheus_file = Path(prometheus_file) if prometheus_file else None
+    _prometheus_interval = prometheus_interval
+    old = _profiler
+    if profile_threshold is None:
+        _profiler = None
+    elif old is None or (old.threshold, old.interval) != (profile_threshold, profile_interval):
+        _profiler = SlowTurnProfiler(profile_threshold, profile_interval)
+    if old is not None and old is not _profiler:
+        old.stop()
+
+
+def _attach(trace_id: str, begin: bool = False) -> Optional[Tuple]:
+    profiler = _profiler
+    if profiler is None:
+        return None
+    if begin:
+        profiler.begin(trace_id)
+    worker = profiler.attach(trace_id)
+    return None if worker is None else (profiler, worker)
+
+
+def _detach(trace_id: str, sampling: Optional[Tuple]):
+    if sampling is not None:
+        profiler, worker = sampling
+        profiler.detach(trace_id, worker)
+
+
+def bind(fn: Callable) -> Callable:
+    """`fn` wrapped to run in the current span's context on another thread
+
+    Spans opened by `fn` join the caller's turn, and the profiler samples
+    the thread running it as part of that turn. Returns `fn` unchanged when
+    there is no open span.
+    """
+    parent = _current.get() if _enabled else None
+    if parent is None:
+        return fn
+    context = contextvars.copy_context()
+    trace_id = parent.trace_id
+
+    def call(*args, **kwargs):
+        sampling = _attach(trace_id)
+        try:
+            return context.copy().run(fn, *args, **kwargs)  # a Context can't be entered twice at once
+        finally:
+            _detach(trace_id, sampling)
+    return call
+
+
+def on_slow_turn(callback: Callable[[Dict], None]):
+    """Call `callback(trace)` for every turn the profiler flagged as slow"""
+    _slow_turn_hooks.append(callback)
+
+
+def span(name: str, **attrs):
+    """Context manager timing one stage; the outermost span is the turn"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current_span():
+    """The innermost open span (a no-op object when there is none)"""
+    return (_current.get() if _enabled else None) or _NOOP
+
+
+def incr(name: str, value: float = 1, **labels):
+    if _enabled:
+        registry.incr(name, value, labels)
+
+
+def gauge(name: str, value: float, **labels):
+    if _enabled:
+        registry.set_gauge(name, value, labels)
+
+
+def observe(name: str, value: float, **labels):
+    if _enabled:
+        registry.observe(name, value, labels)
+
+
+def describe(name: str, help_text: str, buckets: Optional[Tuple] = None):
+    registry.describe(name, help_text, buckets)
+
+
+def prometheus_text() -> str:
+    return registry.prometheus_text()
+
+
+def write_prometheus(path) -> Path:
+    """Atomically write the Prometheus text to `path` (for node_exporter's textfile collector)"""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def _finish_trace(root: Span):
+    global _prometheus_written
+    registry.incr("jarvis_turns_total", 1, {"span": root.name})
+    profile = _profiler.end(root.trace_id, root.duration) if _profiler is not None else None
+    if _trace_log is None and profile is None and _prometheus_file is None:
+        return
+    trace = {"trace_id": root.trace_id, "timestamp": root.wall_started, **root.as_dict()}
+    if profile is not None:
+        trace["profile"] = profile
+        for callback in list(_slow_turn_hooks):
+            try:
+                callback(trace)
+            except Exception as e:
+                print(f"Error in slow-turn hook: {e}")
+    try:
+        if _trace_log is not None:
+            line = json.dumps(trace, default=str) + "\n"
+            with _trace_lock, open(_trace_log, "a", encoding="utf-8") as f:
+                f.write(line)
+        if _prometheus_file is not None:
+            now = time.monotonic()
+            if now - _prometheus_written >= _prometheus_interval:
+                _prometheus_written = now
+                write_prometheus(_prometheus_file)
+    except OSError as e:
+        print(f"Error exporting metrics: {e}")
+
+
+def configure_from_env():
+    """Apply the JARVIS_METRICS* environment variables (done once at import)"""
+    if os.getenv("JARVIS_METRICS", "").lower() not in ("1", "true", "yes", "on"):
+        return
+    threshold = os.getenv("JARVIS_PROFILE_THRESHOLD")
+    configure(True, trace_log=os.getenv("JARVIS_TRACE_LOG"),
+              prometheus_file=os.getenv("JARVIS_METRICS_FILE"),
+              profile_threshold=float(threshold) if threshold else None)
+
+
+configure_from_env()
+describe("jarvis_span_seconds", "Duration of each traced stage")
+describe("jarvis_turns_total", "Finished top-level spans (turns)")
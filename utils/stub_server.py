@@ -0,0 +1,203 @@
+"""
+Local stand-in for an OpenAI-compatible server (LM Studio / OpenAI).
+
+Serves GET /v1/models, POST /v1/chat/completions (plain or streamed as
+server-sent events) and batched POST /v1/completions over HTTP/1.1
+keep-alive, with configurable latency and injectable errors, so clients
+can be exercised without a model:
+
+    python utils/stub_server.py --port 1234 --latency 0.2 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubServer:
+    """Threaded OpenAI-compatible stub that runs in the background.
+
+    `latency` is the delay before the first byte, `token_delay` the gap
+    between streamed tokens, and a fraction `error_rate` of completions
+    fail with `error_status`. `fail_next(n)` forces the next n to fail.
+    With `serialize` the stub handles one completion at a time, like a
+    single local model, so batching several prompts per request pays off.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 token_delay: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 reply: str = "Stub reply from Jarvis.", model: str = "stub-model",
+                 serialize: bool = False):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self.model = model
+        self.requests = 0
+        self.connections = 0
+        self.errors = 0
+        self.batch_sizes = []
+        self._forced_failures = 0
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock() if serialize else None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, count: int = 1):
+        with self._lock:
+            self._forced_failures += count
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            if self._forced_failures > 0:
+                self._forced_failures -= 1
+                self.errors += 1
+                return True
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                return True
+            return False
+
+    def reply_for(self, body: dict) -> str:
+        """Reply text for a request; override for custom behaviour"""
+        return self.reply
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/v1/models":
+                    self._send_json(200, {"object": "list", "data": [{"id": stub.model, "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                if path not in ("/v1/chat/completions", "/v1/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                if stub._model_lock is not None:
+                    with stub._model_lock:
+                        self._respond(path, body)
+                else:
+                    self._respond(path, body)
+
+            def _respond(self, path, body):
+                time.sleep(stub.latency)
+                if stub._should_fail():
+                    self._send_json(stub.error_status, {"error": {"message": "injected failure"}})
+                    return
+
+                if path == "/v1/completions":
+                    prompts = body.get("prompt", "")
+                    prompts = prompts if isinstance(prompts, list) else [prompts]
+                    with stub._lock:
+                        stub.batch_sizes.append(len(prompts))
+                    self._send_json(200, {
+                        "id": f"cmpl-stub-{stub.requests}",
+                        "object": "text_completion",
+                        "model": body.get("model", stub.model),
+                        "choices": [{"index": i, "finish_reason": "stop",
+                                     "text": " " + stub.reply_for({**body, "prompt": prompt})}
+                                    for i, prompt in enumerate(prompts)],
+                    })
+                    return
+
+                text = stub.reply_for(body)
+                if not body.get("stream"):
+                    self._send_json(200, {
+                        "id": f"chatcmpl-stub-{stub.requests}",
+                        "object": "chat.completion",
+                        "model": body.get("model", stub.model),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": text}}],
+                        "usage": {"completion_tokens": len(text.split())},
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(stub.token_delay)
+                    delta = {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+                    self._send_chunk(f"data: {json.dumps(delta)}\n\n".encode("utf-8"))
+                self._send_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="jarvis-stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--serialize", action="store_true",
+                        help="handle one completion at a time, like a single local model")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency, args.token_delay,
+                        args.error_rate, args.error_status, serialize=args.serialize)
+    print(f"🧪 Stub server listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,30 +1,584 @@
-import speech_recognition as sr
-import pyttsx3
+import math
+import queue
+import re
+import struct
+import threading
+import time
+import wave
+from array import array
+from collections import deque
+from pathlib import Path
 
-# Initialize the TTS engine
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)  # Speaking speed
+from utils import metrics
+from utils.lazy import lazy_import
 
-def text_to_speech(text):
-    """Convert text to speech."""
-    engine.say(text)
-    engine.runAndWait()
+# Heavy audio backends load on first use; pyttsx3 is imported by Pyttsx3Engine.
+sr = lazy_import("speech_recognition")
 
-def recognize_speech():
-    """Listen for a voice command and return it as text."""
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("🎙️ Listening...")
-        recognizer.adjust_for_ambient_noise(source)
-        audio = recognizer.listen(source)
+SPEECH_RATE = 150  # Speaking speed (words per minute)
+# A sentence ends at . ! ? (optionally followed by quotes/brackets) and whitespace, or at a blank line.
+SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+
+metrics.describe("jarvis_tts_wait_seconds", "Time a sentence waited in the speech queue")
+metrics.describe("jarvis_tts_seconds", "Time spent saying each sentence")
+metrics.describe("jarvis_tts_queue_depth", "Sentences waiting to be spoken")
+metrics.describe("jarvis_stt_seconds", "Time to transcribe each speech segment")
+
+
+class SentenceChunker:
+    """Turns streamed text into whole sentences as soon as each one ends."""
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text):
+        """Add text; returns the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        while True:
+            match = SENTENCE_END.search(self._buffer)
+            if match is None:
+                return sentences
+            sentence = self._buffer[:match.end()].strip()
+            self._buffer = self._buffer[match.end():]
+            if sentence:
+                sentences.append(sentence)
+
+    def flush(self):
+        """Whatever is left once the stream ends"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def split_sentences(text):
+    chunker = SentenceChunker()
+    return chunker.feed(text) + chunker.flush()
+
+
+class Pyttsx3Engine:
+    """System TTS via pyttsx3, created on the speech thread on first use."""
+    def __init__(self, rate=SPEECH_RATE):
+        self.rate = rate
+        self._engine = None
+
+    def say(self, text):
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._engine.setProperty('rate', self.rate)
+        self._engine.say(text)
+        self._engine.runAndWait()
+
+    def stop(self):
+        if self._engine is not None:
+            self._engine.stop()
+
+
+class NullEngine:
+    """Speaks nothing; keeps what it was asked to say (for tests and headless runs)."""
+    def __init__(self):
+        self.spoken = []
+
+    def say(self, text):
+        self.spoken.append(text)
+
+    def stop(self):
+        pass
+
+
+class WavEngine:
+    """Writes each sentence to a numbered WAV file instead of the speakers.
+
+    The audio is a placeholder tone lasting as long as the sentence would
+    take to speak at `rate`; with `realtime` the engine also takes that long,
+    so interruption can be exercised without a sound card.
+    """
+    def __init__(self, directory, rate=SPEECH_RATE, sample_rate=16000, realtime=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rate = rate
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.files = []
+        self._stopped = threading.Event()
+
+    def duration(self, text):
+        return max(1, len(text.split())) * 60.0 / self.rate
+
+    def say(self, text):
+        self._stopped.clear()
+        seconds = self.duration(text)
+        path = self.directory / f"speech_{len(self.files):04d}.wav"
+        frames = int(seconds * self.sample_rate)
+        with wave.open(str(path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b"".join(
+                struct.pack("<h", int(3000 * math.sin(2 * math.pi * 440 * i / self.sample_rate)))
+                for i in range(frames)
+            ))
+        self.files.append((path, text))
+        if self.realtime:
+            self._stopped.wait(seconds)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class Speaker:
+    """Background speech: a worker thread says queued sentences in order.
+
+    `speak` and `speak_stream` return immediately; `interrupt` drops
+    everything queued and cuts off the current sentence, e.g. when a new
+    message arrives.
+    """
+    def __init__(self, engine=None):
+        self.engine = engine or Pyttsx3Engine()
+        self._queue = queue.Queue()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="jarvis-tts", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                generation, sentence, queued_at = item
+                if generation == self._generation:
+                    started = time.perf_counter()
+                    metrics.observe("jarvis_tts_wait_seconds", started - queued_at)
+                    self.engine.say(sentence)
+                    metrics.observe("jarvis_tts_seconds", time.perf_counter() - started)
+            except Exception as e:
+                print(f"Error speaking: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _enqueue(self, sentences, generation):
+        for sentence in sentences:
+            self._queue.put((generation, sentence, time.perf_counter()))
+        metrics.gauge("jarvis_tts_queue_depth", self._queue.qsize())
+
+    def speak(self, text):
+        """Queue a whole reply, sentence by sentence"""
+        self._enqueue(split_sentences(text), self._generation)
+
+    def speak_stream(self, chunks):
+        """Pass `chunks` through, queueing each sentence as soon as it completes"""
+        generation = self._generation
+        chunker = SentenceChunker()
+        for chunk in chunks:
+            self._enqueue(chunker.feed(chunk), generation)
+            yield chunk
+        self._enqueue(chunker.flush(), generation)
+
+    def interrupt(self):
+        """Stop talking and forget everything queued so far"""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        self.engine.stop()
+
+    def wait(self):
+        """Block until everything queued has been spoken"""
+        self._queue.join()
+
+    def close(self):
+        self.interrupt()
+        self._queue.put(None)
+        self._thread.join()
+
+
+_speaker = None
+_speaker_lock = threading.Lock()
+
+
+def get_speaker():
+    """Process-wide speaker shared by the UIs"""
+    global _speaker
+    with _speaker_lock:
+        if _speaker is None:
+            _speaker = Speaker()
+        return _speaker
+
+
+def text_to_speech(text, block=False):
+    """Speak text in the background (or wait for it with block=True)."""
+    speaker = get_speaker()
+    speaker.speak(text)
+    if block:
+        speaker.wait()
+
+
+def frame_energy(frame):
+    """RMS energy of a frame of 16-bit little-endian mono PCM"""
+    samples = array("h", frame[:len(frame) - len(frame) % 2])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+class PCMSource:
+    """Raw 16-bit mono PCM from a bytes object, file-like object or iterable of chunks."""
+    def __init__(self, data, sample_rate=16000, frame_ms=30, key="pcm"):
+        self.data = data
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.key = key
+
+    @property
+    def frame_bytes(self):
+        return int(self.sample_rate * self.frame_ms / 1000) * 2
+
+    def _chunks(self):
+        if isinstance(self.data, (bytes, bytearray)):
+            yield bytes(self.data)
+        elif hasattr(self.data, "read"):
+            while True:
+                chunk = self.data.read(self.frame_bytes)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            yield from self.data
+
+    def frames(self):
+        pending = b""
+        for chunk in self._chunks():
+            pending += chunk
+            while len(pending) >= self.frame_bytes:
+                yield pending[:self.frame_bytes]
+                pending = pending[self.frame_bytes:]
+        if pending:
+            yield pending
+
+    def close(self):
+        pass
+
+
+class WavSource(PCMSource):
+    """Frames from a 16-bit mono WAV file."""
+    def __init__(self, path, frame_ms=30):
+        self._wav = wave.open(str(path), "rb")
+        if self._wav.getnchannels() != 1 or self._wav.getsampwidth() != 2:
+            self._wav.close()
+            raise ValueError("WavSource needs 16-bit mono audio")
+        super().__init__(self, self._wav.getframerate(), frame_ms, key=f"wav:{path}")
+
+    def read(self, size):
+        return self._wav.readframes(size // 2)
+
+    def close(self):
+        self._wav.close()
 
+
+class MicrophoneSource(PCMSource):
+    """Live frames from the default (or given) microphone."""
+    def __init__(self, device_index=None, sample_rate=16000, frame_ms=30):
+        super().__init__(None, sample_rate, frame_ms, key=f"microphone:{device_index}")
+        self.live = True  # closed by a paused Listener, reopened on resume
+        self.device_index = device_index
+        self._stopped = threading.Event()
+
+    def frames(self):
+        self._stopped.clear()
+        microphone = sr.Microphone(device_index=self.device_index, sample_rate=self.sample_rate,
+                                   chunk_size=self.frame_bytes // 2)
+        with microphone as source:
+            while not self._stopped.is_set():
+                yield source.stream.read(source.CHUNK)
+
+    def close(self):
+        self._stopped.set()
+
+
+class GoogleRecognizer:
+    """Google Web Speech API through speech_recognition (needs network)."""
+    def transcribe(self, pcm, sample_rate):
+        try:
+            return sr.Recognizer().recognize_google(sr.AudioData(pcm, sample_rate, 2))
+        except sr.UnknownValueError:
+            return ""
+
+
+class SphinxRecognizer:
+    """Offline CMU Sphinx recognition (pip install pocketsphinx)."""
+    def transcribe(self, pcm, sample_rate):
+        try:
+            return sr.Recognizer().recognize_sphinx(sr.AudioData(pcm, sample_rate, 2))
+        except sr.UnknownValueError:
+            return ""
+
+
+class Segmenter:
+    """Splits a frame stream into utterances by energy.
+
+    Speech starts after `min_speech_ms` of frames above `threshold` (with
+    `pre_roll_ms` of audio kept from before that) and ends after
+    `silence_ms` below it, or at `max_segment_s`.
+    """
+    def __init__(self, threshold, frame_ms=30, min_speech_ms=90, silence_ms=500,
+                 pre_roll_ms=200, max_segment_s=15.0):
+        self.threshold = threshold
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.max_frames = int(max_segment_s * 1000 / frame_ms)
+        self._pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self._frames = []
+        self._voiced = 0
+        self._silent = 0
+
+    def feed(self, frame):
+        """Add a frame; returns a finished segment's PCM or None"""
+        loud = frame_energy(frame) > self.threshold
+        if not self._frames:
+            self._pre_roll.append(frame)
+            self._voiced = self._voiced + 1 if loud else 0
+            if self._voiced >= self.min_speech_frames:
+                self._frames = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._silent = 0
+            return None
+        self._frames.append(frame)
+        self._silent = 0 if loud else self._silent + 1
+        if self._silent >= self.silence_frames or len(self._frames) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self):
+        segment = b"".join(self._frames) if self._frames else None
+        self._frames = []
+        self._voiced = 0
+        self._silent = 0
+        return segment
+
+
+_calibrations = {}
+
+
+def calibrate(frames, frame_ms=30, duration_ms=500, dynamic_ratio=1.5, min_threshold=300.0):
+    """Energy threshold from the ambient noise in the first `duration_ms` of frames"""
+    energies = [frame_energy(frame) for _, frame in zip(range(max(1, duration_ms // frame_ms)), frames)]
+    noise = sum(energies) / len(energies) if energies else 0.0
+    return max(min_threshold, noise * dynamic_ratio)
+
+
+class _RecognitionError:
+    """Carries a recognizer exception through the transcript queue"""
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class Listener:
+    """Long-lived capture loop that transcribes each utterance as it closes.
+
+    Capture and segmentation run on one thread, recognition on another, so
+    a slow recognizer never drops audio. Ambient-noise calibration happens
+    once per source (and is reused by later listeners on the same source)
+    unless `threshold` is given. Transcripts go to `on_text` and to
+    `get()`; a recognizer failure is raised from `get()`.
+
+    While paused nothing is captured or recognized: a live source such as
+    the microphone is closed, and audio or transcripts from before the
+    pause are discarded.
+    """
+    def __init__(self, source=None, recognizer=None, threshold=None, on_text=None,
+                 paused=False, **segmenter_options):
+        self.source = source or MicrophoneSource()
+        self.recognizer = recognizer or GoogleRecognizer()
+        self.threshold = threshold
+        self.on_text = on_text
+        self.segmenter_options = segmenter_options
+        self._segments = queue.Queue()
+        self._texts = queue.Queue()
+        self._threads = []
+        self._running = False
+        self._active = threading.Event()
+        self._epoch = 0  # bumped on every pause, so stale segments and texts are dropped
+        if not paused:
+            self._active.set()
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._capture, name="jarvis-listen", daemon=True),
+            threading.Thread(target=self._transcribe, name="jarvis-transcribe", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    @property
+    def alive(self):
+        """False once the capture or recognition thread has exited"""
+        return self._running and all(thread.is_alive() for thread in self._threads)
+
+    def pause(self):
+        """Stop capturing and recognizing until `resume`"""
+        self._active.clear()
+        self._epoch += 1
+        self._drain(self._segments)
+        self.clear()
+
+    def resume(self):
+        self._active.set()
+
+    def _capture(self):
+        frames = None
+        try:
+            while self._running:
+                if not self._active.wait(0.1):
+                    continue
+                if frames is None:
+                    frames = iter(self.source.frames())
+                threshold = self.threshold
+                if threshold is None:
+                    threshold = _calibrations.get(self.source.key)
+                    if threshold is None:
+                        print("🎙️ Calibrating for ambient noise...")
+                        threshold = _calibrations[self.source.key] = calibrate(frames, self.source.frame_ms)
+                self.threshold = threshold
+                segmenter = Segmenter(threshold, self.source.frame_ms, **self.segmenter_options)
+                epoch = self._epoch
+                exhausted = True
+                for frame in frames:
+                    if not self._running or epoch != self._epoch:
+                        exhausted = False
+                        break
+                    segment = segmenter.feed(frame)
+                    if segment:
+                        self._segments.put((epoch, segment))
+                if exhausted:
+                    segment = segmenter.flush()
+                    if segment:
+                        self._segments.put((epoch, segment))
+                    return
+                if getattr(self.source, "live", False):
+                    frames.close()  # releases the device until the next resume
+                    frames = None
+        except Exception as e:
+            print(f"Error capturing audio: {e}")
+        finally:
+            if frames is not None and hasattr(frames, "close"):
+                frames.close()
+            self._segments.put(None)
+
+    def _transcribe(self):
+        while True:
+            item = self._segments.get()
+            if item is None:
+                self._texts.put(None)
+                return
+            epoch, segment = item
+            if epoch != self._epoch:
+                continue  # captured before a pause
+            started = time.perf_counter()
+            try:
+                text = self.recognizer.transcribe(segment, self.source.sample_rate)
+            except Exception as e:
+                if epoch == self._epoch:
+                    self._texts.put(_RecognitionError(e))
+                continue
+            finally:
+                metrics.observe("jarvis_stt_seconds", time.perf_counter() - started,
+                                recognizer=type(self.recognizer).__name__)
+            if text and epoch == self._epoch:
+                if self.on_text is not None:
+                    self.on_text(text)
+                self._texts.put(text)
+
+    def get(self, timeout=None):
+        """Next transcript; None once the source is exhausted (or on timeout)
+
+        Raises the recognizer's exception (e.g. sr.RequestError) if it failed.
+        """
+        try:
+            text = self._texts.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if isinstance(text, _RecognitionError):
+            raise text.error
+        return text
+
+    @staticmethod
+    def _drain(items):
+        while True:
+            try:
+                if items.get_nowait() is None:
+                    items.put(None)
+                    return
+            except queue.Empty:
+                return
+
+    def clear(self):
+        """Discard transcripts that nobody collected"""
+        self._drain(self._texts)
+
+    def __iter__(self):
+        while True:
+            text = self.get()
+            if text is None:
+                return
+            yield text
+
+    def stop(self):
+        self._running = False
+        self._active.set()
+        self.source.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_listener():
+    """Process-wide microphone listener, paused between `recognize_speech` calls
+
+    A listener whose threads died (microphone unplugged, stream error) is
+    replaced by a new one.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None and not _listener.alive:
+            _listener.stop()
+            _listener = None
+        if _listener is None:
+            _listener = Listener(paused=True).start()
+        return _listener
+
+
+def recognize_speech(timeout=15.0):
+    """Listen for a voice command and return it as text."""
+    listener = get_listener()
+    listener.resume()
+    print("🎙️ Listening...")
     try:
-        command = recognizer.recognize_google(audio)
-        print(f"🗣️ You said: {command}")
-        return command
-    except sr.UnknownValueError:
-        text_to_speech("Sorry, I didn't catch that.")
-        return ""
+        command = listener.get(timeout)
     except sr.RequestError:
         text_to_speech("Speech recognition service is currently unavailable.")
         return ""
+    except Exception as e:
+        print(f"Error recognizing speech: {e}")
+        text_to_speech("Speech recognition service is currently unavailable.")
+        return ""
+    finally:
+        listener.pause()
+    if not command:
+        text_to_speech("Sorry, I didn't catch that.")
+        return ""
+    print(f"🗣️ You said: {command}")
+    return command